@@ -0,0 +1,50 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.12;
+
+/**
+ * @author  . MEBARKIA Abdenour
+ * @title   . AddressesProvider
+ * @dev     . Registry of the protocol contracts . It is deployed first with the addresses the contracts
+ *            will be deployed at (predicted from the deployer nonce), then each contract reads its peers
+ *            from it once in its constructor and keeps them as immutables . The contracts must be
+ *            deployed right after it by the same account, in this order :
+ *               . Pool
+ *               . PoolConfiguration
+ *               . PoolLogic
+ *               . ReservesManager
+ */
+
+contract AddressesProvider {
+    address internal immutable pool;
+    address internal immutable poolConfiguration;
+    address internal immutable poolLogic;
+    address internal immutable reservesManager;
+
+    constructor(
+        address _pool,
+        address _poolConfiguration,
+        address _poolLogic,
+        address _reservesManager
+    ) {
+        pool = _pool;
+        poolConfiguration = _poolConfiguration;
+        poolLogic = _poolLogic;
+        reservesManager = _reservesManager;
+    }
+
+    function getPool() external view returns (address) {
+        return pool;
+    }
+
+    function getPoolConfiguration() external view returns (address) {
+        return poolConfiguration;
+    }
+
+    function getPoolLogic() external view returns (address) {
+        return poolLogic;
+    }
+
+    function getReservesManager() external view returns (address) {
+        return reservesManager;
+    }
+}
@@ -0,0 +1,78 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.12;
+
+import "../interfaces/IInterestRateStrategy.sol";
+import "@ds-math/src/math.sol";
+
+/**
+ * @author  . MEBARKIA Abdenour
+ * @title   . DefaultInterestRateStrategy
+ * @dev     . Implements a two slopes (kinked) variable borrow rate curve :
+ *            - below the optimal utilization rate : base + U / Uoptimal * slope1
+ *            - above it : base + slope1 + (U - Uoptimal) / (1 - Uoptimal) * slope2
+ *            a steep slope2 makes borrowing expensive before the reserve is fully used, so that
+ *            suppliers can always withdraw . All the parameters are immutable, the ratios are
+ *            precomputed in the constructor so the calculation does not read storage
+ */
+
+contract DefaultInterestRateStrategy is IInterestRateStrategy, DSMath {
+    uint256 public immutable optimalUtilizationRate;
+    uint256 public immutable baseVariableBorrowRate;
+    uint256 public immutable variableRateSlope1;
+    uint256 public immutable variableRateSlope2;
+
+    // slope1 / Uoptimal
+    uint256 internal immutable slope1PerUtilization;
+    // slope2 / (1 - Uoptimal)
+    uint256 internal immutable slope2PerExcessUtilization;
+
+    constructor(
+        uint256 _optimalUtilizationRate,
+        uint256 _baseVariableBorrowRate,
+        uint256 _variableRateSlope1,
+        uint256 _variableRateSlope2
+    ) {
+        require(
+            _optimalUtilizationRate > 0 && _optimalUtilizationRate < WAD,
+            "invalid optimal utilization rate"
+        );
+        optimalUtilizationRate = _optimalUtilizationRate;
+        baseVariableBorrowRate = _baseVariableBorrowRate;
+        variableRateSlope1 = _variableRateSlope1;
+        variableRateSlope2 = _variableRateSlope2;
+
+        slope1PerUtilization = wdiv(
+            _variableRateSlope1,
+            _optimalUtilizationRate
+        );
+        slope2PerExcessUtilization = wdiv(
+            _variableRateSlope2,
+            WAD - _optimalUtilizationRate
+        );
+    }
+
+    /**
+     * @dev     . calculates the variable borrow rate of a reserve for a given utilization rate
+     * @param   _utilizationRate  . utilization rate of the reserve
+     * @return  uint256  . the variable borrow rate
+     */
+    function calculateVariableBorrowRate(uint256 _utilizationRate)
+        external
+        view
+        returns (uint256)
+    {
+        if (_utilizationRate <= optimalUtilizationRate) {
+            return
+                baseVariableBorrowRate +
+                wmul(_utilizationRate, slope1PerUtilization);
+        }
+
+        return
+            baseVariableBorrowRate +
+            variableRateSlope1 +
+            wmul(
+                _utilizationRate - optimalUtilizationRate,
+                slope2PerExcessUtilization
+            );
+    }
+}
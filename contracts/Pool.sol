@@ -4,10 +4,16 @@ pragma solidity ^0.8.12;
 import "./PoolLogic.sol";
 import "./PoolConfiguration.sol";
 import "./ReservesManager.sol";
-import "@openzeppelin/contracts/access/Ownable.sol";
+import "./AddressesProvider.sol";
+import "@openzeppelin/contracts/utils/Multicall.sol";
 import "../interfaces/IXToken.sol";
 import "../interfaces/IDebtToken.sol";
 import "@openzeppelin/contracts/token/ERC20/IERC20.sol";
+import "@openzeppelin/contracts/token/ERC20/extensions/draft-IERC20Permit.sol";
+import "@openzeppelin/contracts/utils/math/SafeCast.sol";
+
+import {DataTypes} from "./libraries/DataTypes.sol";
+import {UserConfiguration} from "./libraries/UserConfiguration.sol";
 
 /**
  * @author  . MEBARKIA Abdenour
@@ -18,35 +24,160 @@ import "@openzeppelin/contracts/token/ERC20/IERC20.sol";
  *               . withdraw
  *               . repay
  *               . liquidate undercollateralized user
+ *          . several of these actions can be batched atomically in one transaction with `multicall`
+ *          . the reserves a user supplied or borrowed are flagged in a configuration word, so the account
+ *            wide calculations of PoolLogic only read the reserves the user uses
+ *          . the supplied balances of a user are the collateral of all its borrows, they stay in its xTokens
+ *          . `supplyWithPermit` and `repayWithPermit` take an EIP-2612 permit instead of a prior approve transaction
  */
 
-contract Pool is Ownable {
-    PoolConfiguration public poolConfiguration;
-    PoolLogic public poolLogic;
-    ReservesManager public reservesManager;
+contract Pool is Multicall {
+    using SafeCast for uint256;
+    using UserConfiguration for uint256;
 
-    mapping(address => mapping(address => address))
-        public userToBorrowedAssetToCollateral;
+    PoolConfiguration public immutable poolConfiguration;
+    PoolLogic public immutable poolLogic;
+    ReservesManager public immutable reservesManager;
 
-    mapping(address => mapping(address => uint256))
-        public userToCollateralToAmount;
+    mapping(address => DataTypes.ReserveComponents)
+        public underlyingAssetToReserveComponents;
+    // the underlying asset of each reserve id, to walk the user configurations
+    mapping(uint256 => address) public reserveIdToUnderlyingAsset;
 
-    function setPoolConfigurationAddress(address _poolConfigurationAddress)
-        external
-        onlyOwner
-    {
-        poolConfiguration = PoolConfiguration(_poolConfigurationAddress);
+    // 2 bits per reserve id : borrowed | supplied, see UserConfiguration
+    mapping(address => uint256) public userConfigurations;
+
+    event Supply(address indexed user, address indexed asset, uint256 amount);
+    event Borrow(address indexed user, address indexed asset, uint256 amount);
+    event Withdraw(address indexed user, address indexed asset, uint256 amount);
+    event Repay(address indexed user, address indexed asset, uint256 amount);
+    event LiquidationCall(
+        address indexed liquidator,
+        address indexed user,
+        address indexed asset,
+        uint256 amount,
+        address collateral
+    );
+
+    modifier onlyPoolConfiguration() {
+        require(
+            msg.sender == address(poolConfiguration),
+            "caller must be pool configuration"
+        );
+        _;
+    }
+
+    /**
+     * @dev     . reads the protocol contracts from the registry once, they are kept as immutables
+     * @param   _addressesProviderAddress  . the address of the AddressesProvider
+     */
+    constructor(address _addressesProviderAddress) {
+        AddressesProvider addressesProvider = AddressesProvider(
+            _addressesProviderAddress
+        );
+        require(
+            addressesProvider.getPool() == address(this),
+            "unexpected deployment address"
+        );
+
+        poolConfiguration = PoolConfiguration(
+            addressesProvider.getPoolConfiguration()
+        );
+        poolLogic = PoolLogic(addressesProvider.getPoolLogic());
+        reservesManager = ReservesManager(
+            addressesProvider.getReservesManager()
+        );
     }
 
-    function setPoolLogicAddress(address _poolLogicAddress) external onlyOwner {
-        poolLogic = PoolLogic(_poolLogicAddress);
+    /**
+     * @dev     . caches the contracts of a new reserve, this can only be called by PoolConfiguration when adding a token
+     * @param   _underlyingAsset  . the address of the underlying asset of the new reserve
+     * @param   _reserveId  . the index of the new reserve in the PoolConfiguration tokens
+     * @param   _xToken  . address of xToken of the new reserve
+     * @param   _debtToken  . address of debtToken of the new reserve
+     * @param   _decimalsScale  . 10 ** (18 - token decimals) of the new reserve
+     * @param   _priceOracle  . address of the price oracle of the new reserve
+     */
+    function initReserveComponents(
+        address _underlyingAsset,
+        uint256 _reserveId,
+        address _xToken,
+        address _debtToken,
+        uint256 _decimalsScale,
+        address _priceOracle
+    ) external onlyPoolConfiguration {
+        underlyingAssetToReserveComponents[_underlyingAsset] = DataTypes
+            .ReserveComponents(
+                _xToken,
+                true,
+                _reserveId.toUint16(),
+                _debtToken,
+                _decimalsScale.toUint96(),
+                _priceOracle
+            );
+        reserveIdToUnderlyingAsset[_reserveId] = _underlyingAsset;
     }
 
-    function setReservesManagerAddress(address _reservesManagerAddress)
+    /**
+     * @dev     . the cached contracts of a reserve, PoolLogic reads them in a single call
+     * @param   _underlyingAsset  . the address of the underlying asset of the reserve
+     * @return  DataTypes.ReserveComponents  . the components of the reserve, all empty when it is not listed
+     */
+    function getReserveComponents(address _underlyingAsset)
         external
-        onlyOwner
+        view
+        returns (DataTypes.ReserveComponents memory)
     {
-        reservesManager = ReservesManager(_reservesManagerAddress);
+        return underlyingAssetToReserveComponents[_underlyingAsset];
+    }
+
+    /**
+     * @dev     . the cached contracts of a reserve from its id, PoolLogic reads them in a single call for every
+     * reserve flagged in a user configuration
+     * @param   _reserveId  . the id of the reserve
+     * @return  DataTypes.ReserveComponents  . the components of the reserve
+     */
+    function getReserveComponentsById(uint256 _reserveId)
+        external
+        view
+        returns (DataTypes.ReserveComponents memory)
+    {
+        return
+            underlyingAssetToReserveComponents[
+                reserveIdToUnderlyingAsset[_reserveId]
+            ];
+    }
+
+    /**
+     * @dev     . validates an xToken transfer against the debts of the sender, then flags the reserve as supplied
+     * by the recipient and clears it for the sender once its balance is empty, called by the xToken after the
+     * balances moved
+     * @param   _asset  . the underlying asset of the xToken
+     * @param   _from  . the sender of the transfer
+     * @param   _to  . the recipient of the transfer
+     * @param   _amount  . the amount transferred
+     */
+    function finalizeTransfer(
+        address _asset,
+        address _from,
+        address _to,
+        uint256 _amount
+    ) external {
+        DataTypes.ReserveComponents
+            storage reserve = underlyingAssetToReserveComponents[_asset];
+        address xtoken = reserve.xToken;
+        require(msg.sender == xtoken, "caller must be xToken");
+        require(
+            poolLogic.validateTransfer(_from),
+            "transfer would leave debt uncovered"
+        );
+
+        if (IXToken(xtoken).scaledBalanceOf(_from) == 0) {
+            setUsingAsCollateral(_from, reserve.id, false);
+        }
+        if (_amount > 0) {
+            setUsingAsCollateral(_to, reserve.id, true);
+        }
     }
 
     /**
@@ -57,54 +188,67 @@ contract Pool is Ownable {
      */
     function supply(address _asset, uint256 _amount) public {
         require(_amount > 0, "insufficient amount");
-        require(poolConfiguration.isAvailable(_asset), "token not available");
-        address xtoken = poolConfiguration.underlyingAssetToXtoken(_asset);
+        DataTypes.ReserveComponents
+            storage reserve = underlyingAssetToReserveComponents[_asset];
+        require(reserve.isActive, "token not available");
+        address xtoken = reserve.xToken;
         IERC20(_asset).transferFrom(msg.sender, xtoken, _amount);
         IXToken(xtoken).mint(msg.sender, _amount);
-        reservesManager.updateState(_asset, _amount, 0);
-        userToCollateralToAmount[msg.sender][_asset] =
-            userToCollateralToAmount[msg.sender][_asset] +
-            _amount;
+        reservesManager.updateState(_asset);
+        setUsingAsCollateral(msg.sender, reserve.id, true);
+
+        emit Supply(msg.sender, _asset, _amount);
+    }
+
+    /**
+     * @notice  . Supplies with an EIP-2612 permit of the caller allowing the Pool to spend `amount`, so that no
+     * approve transaction is needed
+     * @param   _asset  . The address of the underlying asset to deposit, it must implement EIP-2612
+     * @param   _amount  . The amount to be deposited
+     * @param   _deadline  . The deadline of the permit
+     * @param   _v  . The v of the permit signature
+     * @param   _r  . The r of the permit signature
+     * @param   _s  . The s of the permit signature
+     */
+    function supplyWithPermit(
+        address _asset,
+        uint256 _amount,
+        uint256 _deadline,
+        uint8 _v,
+        bytes32 _r,
+        bytes32 _s
+    ) external {
+        permit(_asset, _amount, _deadline, _v, _r, _s);
+        supply(_asset, _amount);
     }
 
     /**
      * @notice  . Allows users to borrow a specific `amount` of the reserve underlying asset, provided that the borrower
-     * already deposited enough collateral receiving in return debt Tokens .
+     * already supplied enough collateral, receiving in return debt Tokens . All the supplied balances of the borrower
+     * back its debts, they are not moved .
      * @param   _asset  . The address of the underlying asset to borrow
      * @param   _amount  . The amount to be borrowed
-     * @param   _collateral  . The address of the underlying asset to set as collateral (user should have already supplied enough amount of collateral )
      * @return  uint256  . the amount borrowed if the borrow function successfully executed otherwise it returns 0
      */
-    function borrow(
-        address _asset,
-        uint256 _amount,
-        address _collateral
-    ) public returns (uint256) {
-        address xtoken = poolConfiguration.underlyingAssetToXtoken(_asset);
-        address debtToken = poolConfiguration.underlyingAssetToDebtToken(
-            _asset
-        );
-        address collateralXToken = poolConfiguration.underlyingAssetToXtoken(
-            _collateral
-        );
+    function borrow(address _asset, uint256 _amount) public returns (uint256) {
+        DataTypes.ReserveComponents
+            storage reserve = underlyingAssetToReserveComponents[_asset];
 
-        (bool isValid, uint256 amountOfCollateral) = poolLogic.validateBorrow(
-            msg.sender,
-            _asset,
-            _amount,
-            _collateral
-        );
+        bool isValid = poolLogic.validateBorrow(msg.sender, _asset, _amount);
 
         if (!isValid) {
             return 0;
         } else {
-            IXToken(xtoken).transferUnderlyingAssetTo(msg.sender, _amount);
-            IXToken(collateralXToken).burn(msg.sender, amountOfCollateral);
+            IXToken(reserve.xToken).transferUnderlyingAssetTo(
+                msg.sender,
+                _amount
+            );
+            IDebtToken(reserve.debtToken).mint(msg.sender, _amount);
 
-            IDebtToken(debtToken).mint(msg.sender, _amount);
+            reservesManager.updateState(_asset);
+            setBorrowing(msg.sender, reserve.id, true);
 
-            reservesManager.updateState(_asset, _amount, 1);
-            userToBorrowedAssetToCollateral[msg.sender][_asset] = _collateral;
+            emit Borrow(msg.sender, _asset, _amount);
             return _amount;
         }
     }
@@ -120,7 +264,9 @@ contract Pool is Ownable {
         public
         returns (uint256)
     {
-        address xtoken = poolConfiguration.underlyingAssetToXtoken(_asset);
+        DataTypes.ReserveComponents
+            storage reserve = underlyingAssetToReserveComponents[_asset];
+        address xtoken = reserve.xToken;
 
         bool isValid = poolLogic.validateWithdraw(msg.sender, _asset, _amount);
 
@@ -129,11 +275,12 @@ contract Pool is Ownable {
         } else {
             IXToken(xtoken).transferUnderlyingAssetTo(msg.sender, _amount);
             IXToken(xtoken).burn(msg.sender, _amount);
-            reservesManager.updateState(_asset, _amount, 2);
-            userToCollateralToAmount[msg.sender][_asset] =
-                userToCollateralToAmount[msg.sender][_asset] -
-                _amount;
+            reservesManager.updateState(_asset);
+            if (IXToken(xtoken).scaledBalanceOf(msg.sender) == 0) {
+                setUsingAsCollateral(msg.sender, reserve.id, false);
+            }
 
+            emit Withdraw(msg.sender, _asset, _amount);
             return _amount;
         }
     }
@@ -145,10 +292,10 @@ contract Pool is Ownable {
      */
     function repay(address _asset, uint256 _amount) public {
         require(_amount > 0, "insufficient amount");
-        require(poolConfiguration.isAvailable(_asset), "token not available");
-        address debtToken = poolConfiguration.underlyingAssetToDebtToken(
-            _asset
-        );
+        DataTypes.ReserveComponents
+            storage reserve = underlyingAssetToReserveComponents[_asset];
+        require(reserve.isActive, "token not available");
+        address debtToken = reserve.debtToken;
         require(
             IERC20(debtToken).balanceOf(msg.sender) > 0,
             "doesnt have a debt to pay"
@@ -159,31 +306,46 @@ contract Pool is Ownable {
             "the amount exceeds the debt"
         );
 
-        address collateral = userToBorrowedAssetToCollateral[msg.sender][
-            _asset
-        ];
-
-        address asset_xtoken = poolConfiguration.underlyingAssetToXtoken(
-            _asset
-        );
-        address collateral_xtoken = poolConfiguration.underlyingAssetToXtoken(
-            collateral
-        );
-        IERC20(_asset).transferFrom(msg.sender, asset_xtoken, _amount);
-        IXToken(collateral_xtoken).mint(
-            msg.sender,
-            poolLogic.getCollateralAmountToMint(_asset, _amount, collateral)
-        );
+        IERC20(_asset).transferFrom(msg.sender, reserve.xToken, _amount);
         IDebtToken(debtToken).burn(msg.sender, _amount);
-        reservesManager.updateState(_asset, _amount, 3);
+        reservesManager.updateState(_asset);
+        if (IDebtToken(debtToken).scaledBalanceOf(msg.sender) == 0) {
+            setBorrowing(msg.sender, reserve.id, false);
+        }
+
+        emit Repay(msg.sender, _asset, _amount);
+    }
+
+    /**
+     * @notice  . Repays with an EIP-2612 permit of the caller allowing the Pool to spend `amount`, so that no
+     * approve transaction is needed
+     * @param   _asset  . The address of the borrowed underlying asset, it must implement EIP-2612
+     * @param   _amount  . The amount to repay
+     * @param   _deadline  . The deadline of the permit
+     * @param   _v  . The v of the permit signature
+     * @param   _r  . The r of the permit signature
+     * @param   _s  . The s of the permit signature
+     */
+    function repayWithPermit(
+        address _asset,
+        uint256 _amount,
+        uint256 _deadline,
+        uint8 _v,
+        bytes32 _r,
+        bytes32 _s
+    ) external {
+        permit(_asset, _amount, _deadline, _v, _r, _s);
+        repay(_asset, _amount);
     }
 
     /**
-     * @notice  . Function to liquidate a non-healthy position collateral-wise
-     * @param   _user  . The address of the borrower getting liquidated
+     * @notice  . Function to liquidate a non-healthy position : the liquidator repays `amount` of the user debt in
+     * `asset` and receives the same value of the user `collateral` supply plus the liquidation bonus of PoolLogic, in
+     * underlying asset
+     * @param   _user  . The address of the borrower getting liquidated, its health factor must be below 1e18
      * @param   _asset  . The address of the underlying borrowed asset to be repaid with the liquidation
      * @param   _amount  . The debt amount of borrowed `asset` the liquidator wants to cover
-     * @param   _collateral  . The address of the underlying asset used as collateral, to receive as result of the liquidation
+     * @param   _collateral  . The address of the underlying asset supplied by the user, to receive as result of the liquidation
      * @return  bool  . succes boolian .
      */
     function liquidationCall(
@@ -193,39 +355,124 @@ contract Pool is Ownable {
         address _collateral
     ) public returns (bool) {
         require(_amount > 0, "insufficient amount");
-        require(poolConfiguration.isAvailable(_asset), "token not available");
-        require(
-            poolConfiguration.isAvailable(_collateral),
-            "token not available"
-        );
-        (bool isValid, uint256 undercollateralizedAmount) = poolLogic
-            .validateLiquidation(
-                _user,
-                _asset,
-                _collateral,
-                userToCollateralToAmount[_user][_collateral]
-            );
+        DataTypes.ReserveComponents
+            storage reserve = underlyingAssetToReserveComponents[_asset];
+        DataTypes.ReserveComponents
+            storage collateralReserve = underlyingAssetToReserveComponents[
+                _collateral
+            ];
+        require(reserve.isActive, "token not available");
+        require(collateralReserve.isActive, "token not available");
+        (bool isValid, uint256 collateralAmount) = poolLogic
+            .validateLiquidation(_user, _asset, _amount, _collateral);
 
         if (!isValid) {
             return false;
         } else {
             require(
-                _amount <= undercollateralizedAmount,
-                "amount exceeds undercollateralized amount"
+                _amount <= IERC20(reserve.debtToken).balanceOf(_user),
+                "amount exceeds debt"
             );
-            address asset_xtoken = poolConfiguration.underlyingAssetToXtoken(
-                _asset
+            require(
+                collateralAmount <=
+                    IERC20(collateralReserve.xToken).balanceOf(_user),
+                "amount exceeds collateral"
             );
-            address collateral_xtoken = poolConfiguration
-                .underlyingAssetToXtoken(_collateral);
-            address debtToken = poolConfiguration.underlyingAssetToDebtToken(
-                _collateral
+
+            IERC20(_asset).transferFrom(msg.sender, reserve.xToken, _amount);
+            IDebtToken(reserve.debtToken).burn(_user, _amount);
+            IXToken(collateralReserve.xToken).burn(_user, collateralAmount);
+            IXToken(collateralReserve.xToken).transferUnderlyingAssetTo(
+                msg.sender,
+                collateralAmount
             );
-            IERC20(_asset).transferFrom(msg.sender, asset_xtoken, _amount);
-            IXToken(collateral_xtoken).mint(msg.sender, _amount);
-            IDebtToken(debtToken).mint(_user, _amount);
 
+            reservesManager.updateState(_asset);
+            if (_collateral != _asset) {
+                reservesManager.updateState(_collateral);
+            }
+            // the flags of the user are cleared when the liquidation closes its positions
+            if (IDebtToken(reserve.debtToken).scaledBalanceOf(_user) == 0) {
+                setBorrowing(_user, reserve.id, false);
+            }
+            if (
+                IXToken(collateralReserve.xToken).scaledBalanceOf(_user) == 0
+            ) {
+                setUsingAsCollateral(_user, collateralReserve.id, false);
+            }
+
+            emit LiquidationCall(
+                msg.sender,
+                _user,
+                _asset,
+                _amount,
+                _collateral
+            );
             return true;
         }
     }
+
+    /**
+     * @dev     . submits the permit of the caller allowing the Pool to spend `_amount` of `_asset` . A failed permit
+     *            is ignored : a permit already submitted by someone else from the mempool leaves the allowance
+     *            set, and without allowance the transfer of the action reverts anyway
+     */
+    function permit(
+        address _asset,
+        uint256 _amount,
+        uint256 _deadline,
+        uint8 _v,
+        bytes32 _r,
+        bytes32 _s
+    ) internal {
+        try
+            IERC20Permit(_asset).permit(
+                msg.sender,
+                address(this),
+                _amount,
+                _deadline,
+                _v,
+                _r,
+                _s
+            )
+        {} catch {}
+    }
+
+    /**
+     * @dev     . sets or clears the collateral bit of a reserve in the configuration of a user, the
+     *            configuration is only written when it changes
+     */
+    function setUsingAsCollateral(
+        address _user,
+        uint256 _reserveId,
+        bool _usingAsCollateral
+    ) internal {
+        uint256 userConfiguration = userConfigurations[_user];
+        uint256 updatedUserConfiguration = userConfiguration
+            .setUsingAsCollateral(_reserveId, _usingAsCollateral);
+
+        if (updatedUserConfiguration != userConfiguration) {
+            userConfigurations[_user] = updatedUserConfiguration;
+        }
+    }
+
+    /**
+     * @dev     . sets or clears the borrowing bit of a reserve in the configuration of a user, the
+     *            configuration is only written when it changes
+     */
+    function setBorrowing(
+        address _user,
+        uint256 _reserveId,
+        bool _borrowing
+    ) internal {
+        uint256 userConfiguration = userConfigurations[_user];
+        uint256 updatedUserConfiguration = userConfiguration.setBorrowing(
+            _reserveId,
+            _borrowing
+        );
+
+        if (updatedUserConfiguration != userConfiguration) {
+            userConfigurations[_user] = updatedUserConfiguration;
+        }
+    }
 }
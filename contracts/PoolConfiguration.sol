@@ -4,54 +4,86 @@ pragma solidity ^0.8.12;
 import "./tokenization/XToken.sol";
 import "./tokenization/DebtToken.sol";
 import "@openzeppelin/contracts/access/Ownable.sol";
+import "@openzeppelin/contracts/proxy/Clones.sol";
 import "./PriceOracle.sol";
 
 import "./ReservesManager.sol";
+import "./Pool.sol";
+import "./AddressesProvider.sol";
 
 import {DataTypes} from "./libraries/DataTypes.sol";
+import {UserConfiguration} from "./libraries/UserConfiguration.sol";
 
 /**
  * @author  . MEBARKIA Abdenour
  * @title   . PoolConfiguration
- * @dev     . To add new token and all the related configuration
+ * @dev     . To add new token and all the related configuration . The xToken, debtToken and priceOracle of a
+ *            reserve are EIP-1167 minimal proxies of implementations deployed with the PoolConfiguration,
+ *            created with CREATE2 and the underlying asset as salt so their addresses are known before listing
  */
 
 contract PoolConfiguration is Ownable {
-    address public poolAddress;
-    ReservesManager public reservesManager;
-    XToken internal xtoken;
-    DebtToken internal debtToken;
-    PriceOracle internal priceOracle;
+    address public immutable poolAddress;
+    ReservesManager public immutable reservesManager;
+    address public immutable xTokenImplementation;
+    address public immutable debtTokenImplementation;
+    address public immutable priceOracleImplementation;
 
     mapping(address => address) public underlyingAssetToXtoken;
     mapping(address => address) public underlyingAssetToDebtToken;
     mapping(address => bool) public isAvailable;
     mapping(address => address) public underlyingAssetToPriceOracle;
+    // 10 ** (18 - token decimals), scales an amount of the token to 18 decimals
+    mapping(address => uint256) public underlyingAssetToDecimalsScale;
 
     address[] public tokens;
 
-    constructor(address _poolAddress) {
-        poolAddress = _poolAddress;
-    }
+    event TokenAdded(
+        address indexed underlyingAsset,
+        address xToken,
+        address debtToken,
+        address priceOracle
+    );
 
-    function setReserveManagerContract(address _reserveManagerAddress)
-        external
-        onlyOwner
-    {
-        reservesManager = ReservesManager(_reserveManagerAddress);
+    /**
+     * @dev     . reads the protocol contracts from the registry once, they are kept as immutables with the
+     *            implementations cloned by every listing
+     * @param   _addressesProviderAddress  . the address of the AddressesProvider
+     */
+    constructor(address _addressesProviderAddress) {
+        AddressesProvider addressesProvider = AddressesProvider(
+            _addressesProviderAddress
+        );
+        require(
+            addressesProvider.getPoolConfiguration() == address(this),
+            "unexpected deployment address"
+        );
+
+        // immutables can not be read before the end of the constructor
+        address pool = addressesProvider.getPool();
+        address reservesManagerAddress = addressesProvider.getReservesManager();
+        poolAddress = pool;
+        reservesManager = ReservesManager(reservesManagerAddress);
+
+        xTokenImplementation = address(
+            new XToken(pool, reservesManagerAddress)
+        );
+        debtTokenImplementation = address(
+            new DebtToken(pool, reservesManagerAddress)
+        );
+        priceOracleImplementation = address(new PriceOracle());
     }
 
     /**
-     * @dev     . Add new token to the protocol utilisation panel
+     * @dev     . Add new token to the protocol utilisation panel, the token contracts are also cached by the Pool
      * @param   _name  . the name of the underlying asset to be added
      * @param   _symbol  .  the symbol of the underlying asset to be added
      * @param   _underlyingAsset  .  the address of the underlying asset to be added
      * @param   _priceFeedAddress  . the address of the underlying asset's price feed contract
-     * @param   _decimals  .  the name of the underlying asset to be added
-     * @param   _baseVariableBorrowRate  . base variable borrow rate to calculate the interests/debts
-     * @param   _interestRateSlope  . interest rate slope to calculate the interests/debts
+     * @param   _decimals  .  the decimals of the underlying asset to be added, at most 18
+     * @param   _interestRateStrategy  . address of the strategy calculating the variable borrow rate of the reserve
      * @return  address  . the xToken address of the underlying asset
-     * @return  address  . the dentToken address of the underlying asset
+     * @return  address  . the debtToken address of the underlying asset
      * @return  address  . the priceOracle address
      */
     function addToken(
@@ -60,8 +92,7 @@ contract PoolConfiguration is Ownable {
         address _underlyingAsset,
         address _priceFeedAddress,
         uint256 _decimals,
-        uint256 _baseVariableBorrowRate,
-        uint256 _interestRateSlope
+        address _interestRateStrategy
     )
         external
         virtual
@@ -72,43 +103,198 @@ contract PoolConfiguration is Ownable {
             address
         )
     {
-        xtoken = new XToken(
-            string.concat("x", _name),
-            string.concat("x", _symbol),
-            _underlyingAsset,
-            poolAddress,
-            address(reservesManager)
+        return
+            listReserve(
+                DataTypes.ReserveConfig(
+                    _name,
+                    _symbol,
+                    _underlyingAsset,
+                    _priceFeedAddress,
+                    _decimals,
+                    _interestRateStrategy
+                )
+            );
+    }
+
+    /**
+     * @dev     . Add several tokens in one transaction, each of them as addToken does
+     * @param   _reserveConfigs  . the parameters of addToken for every token to be added
+     */
+    function addTokens(DataTypes.ReserveConfig[] calldata _reserveConfigs)
+        external
+        virtual
+        onlyOwner
+    {
+        for (uint256 i = 0; i < _reserveConfigs.length; i++) {
+            listReserve(_reserveConfigs[i]);
+        }
+    }
+
+    function getTokens() public view returns (address[] memory) {
+        return tokens;
+    }
+
+    /**
+     * @dev     . the addresses of the clones of a reserve, whether it is already listed or not
+     * @param   _underlyingAsset  . the address of the underlying asset
+     * @return  address  . the xToken address of the underlying asset
+     * @return  address  . the debtToken address of the underlying asset
+     * @return  address  . the priceOracle address
+     */
+    function predictReserveAddresses(address _underlyingAsset)
+        external
+        view
+        returns (
+            address,
+            address,
+            address
+        )
+    {
+        bytes32 salt = getSalt(_underlyingAsset);
+
+        return (
+            Clones.predictDeterministicAddress(xTokenImplementation, salt),
+            Clones.predictDeterministicAddress(debtTokenImplementation, salt),
+            Clones.predictDeterministicAddress(priceOracleImplementation, salt)
         );
+    }
 
-        debtToken = new DebtToken(
-            string.concat("debt", _name),
-            string.concat("debt", _symbol),
-            _underlyingAsset,
-            poolAddress,
-            address(reservesManager)
+    /**
+     * @dev     . the price oracle and the decimals scale of a token, read together to price an amount of it
+     * @param   _underlyingAsset  . the address of the underlying asset
+     * @return  address  . the priceOracle address
+     * @return  uint256  . 10 ** (18 - token decimals)
+     */
+    function getPriceOracleAndDecimalsScale(address _underlyingAsset)
+        external
+        view
+        returns (address, uint256)
+    {
+        return (
+            underlyingAssetToPriceOracle[_underlyingAsset],
+            underlyingAssetToDecimalsScale[_underlyingAsset]
+        );
+    }
+
+    /**
+     * @dev     . clones and initializes the contracts of a token, then registers them, see addToken . The
+     *            parameters are kept in memory to keep the function within the stack limit
+     */
+    function listReserve(DataTypes.ReserveConfig memory _reserveConfig)
+        internal
+        returns (
+            address,
+            address,
+            address
+        )
+    {
+        address underlyingAsset = _reserveConfig.underlyingAsset;
+        require(_reserveConfig.decimals <= 18, "token decimals above 18");
+        require(!isAvailable[underlyingAsset], "token already added");
+        // the id of the reserve is its index in tokens, the user configurations track at most 128 reserves
+        uint256 reserveId = tokens.length;
+        require(
+            reserveId < UserConfiguration.MAX_RESERVES_COUNT,
+            "reserves count limit reached"
+        );
+
+        address xToken = cloneXToken(
+            _reserveConfig.name,
+            _reserveConfig.symbol,
+            underlyingAsset
+        );
+        address debtToken = cloneDebtToken(
+            _reserveConfig.name,
+            _reserveConfig.symbol,
+            underlyingAsset
         );
 
         reservesManager.initReserve(
-            _underlyingAsset,
-            _baseVariableBorrowRate,
-            _interestRateSlope,
-            address(xtoken),
-            address(debtToken)
+            underlyingAsset,
+            _reserveConfig.interestRateStrategy,
+            xToken,
+            debtToken
         );
 
-        underlyingAssetToXtoken[_underlyingAsset] = address(xtoken);
-        underlyingAssetToDebtToken[_underlyingAsset] = address(debtToken);
-        isAvailable[_underlyingAsset] = true;
+        address priceOracle = clonePriceOracle(
+            underlyingAsset,
+            _reserveConfig.priceFeedAddress
+        );
 
-        priceOracle = new PriceOracle(_priceFeedAddress);
+        underlyingAssetToXtoken[underlyingAsset] = xToken;
+        underlyingAssetToDebtToken[underlyingAsset] = debtToken;
+        isAvailable[underlyingAsset] = true;
+        uint256 decimalsScale = 10**(18 - _reserveConfig.decimals);
+        underlyingAssetToPriceOracle[underlyingAsset] = priceOracle;
+        underlyingAssetToDecimalsScale[underlyingAsset] = decimalsScale;
+        tokens.push(underlyingAsset);
 
-        underlyingAssetToPriceOracle[_underlyingAsset] = address(priceOracle);
-        tokens.push(_underlyingAsset);
+        Pool(poolAddress).initReserveComponents(
+            underlyingAsset,
+            reserveId,
+            xToken,
+            debtToken,
+            decimalsScale,
+            priceOracle
+        );
+
+        emit TokenAdded(underlyingAsset, xToken, debtToken, priceOracle);
 
-        return (address(xtoken), address(debtToken), address(priceOracle));
+        return (xToken, debtToken, priceOracle);
     }
 
-    function getTokens() public view returns (address[] memory) {
-        return tokens;
+    function cloneXToken(
+        string memory _name,
+        string memory _symbol,
+        address _underlyingAsset
+    ) internal returns (address) {
+        address xToken = Clones.cloneDeterministic(
+            xTokenImplementation,
+            getSalt(_underlyingAsset)
+        );
+        XToken(xToken).initialize(
+            string.concat("x", _name),
+            string.concat("x", _symbol),
+            _underlyingAsset
+        );
+
+        return xToken;
+    }
+
+    function cloneDebtToken(
+        string memory _name,
+        string memory _symbol,
+        address _underlyingAsset
+    ) internal returns (address) {
+        address debtToken = Clones.cloneDeterministic(
+            debtTokenImplementation,
+            getSalt(_underlyingAsset)
+        );
+        DebtToken(debtToken).initialize(
+            string.concat("debt", _name),
+            string.concat("debt", _symbol),
+            _underlyingAsset
+        );
+
+        return debtToken;
+    }
+
+    function clonePriceOracle(
+        address _underlyingAsset,
+        address _priceFeedAddress
+    ) internal returns (address) {
+        address priceOracle = Clones.cloneDeterministic(
+            priceOracleImplementation,
+            getSalt(_underlyingAsset)
+        );
+        // the heartbeat and the fallback feed are set by the owner of the protocol
+        PriceOracle(priceOracle).initialize(_priceFeedAddress, owner());
+
+        return priceOracle;
+    }
+
+    // one reserve per underlying asset, its address is enough to make the clone addresses unique
+    function getSalt(address _underlyingAsset) internal pure returns (bytes32) {
+        return bytes32(uint256(uint160(_underlyingAsset)));
     }
 }
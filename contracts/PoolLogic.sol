@@ -3,22 +3,53 @@ pragma solidity ^0.8.12;
 
 import "../interfaces/IXToken.sol";
 import "../interfaces/IDebtToken.sol";
+import "../interfaces/IPool.sol";
 import "./PriceOracle.sol";
-import "./PoolConfiguration.sol";
+import "./AddressesProvider.sol";
 import "@ds-math/src/math.sol";
 
+import {DataTypes} from "./libraries/DataTypes.sol";
+import {UserConfiguration} from "./libraries/UserConfiguration.sol";
+
 /**
  * @author  . MEBARKIA Abdenour
  * @title   . PoolLogic
- * @dev     . validate some end-user functions in the Pool contract
+ * @dev     . validate some end-user functions in the Pool contract . Amounts are priced with the unit price
+ *            of their token : the oracle price (in wad) times the decimals scale of the token, so that
+ *            `wmul(amount, unitPrice)` is the USD value in wad whatever the token decimals and
+ *            `wdiv(amountInUSD, unitPrice)` the amount back . Borrowing power is portfolio based : the
+ *            debts of a user across all its reserves are checked against all its supplied balances, so is
+ *            the liquidation threshold
  */
 
 contract PoolLogic is DSMath {
+    using UserConfiguration for uint256;
+
     uint256 public constant maxAmountRate = 7500; //in basis points
-    PoolConfiguration public poolConfiguration;
+    // a borrow can not take the utilization rate of its reserve above it, some liquidity is kept for withdrawals
+    uint256 public constant maxUtilizationRate = 9500; //in basis points
+    // a user can be liquidated once its debts exceed this share of its supplied balances, between the
+    // borrowing power and the balances themselves so that the debts stay covered while it is liquidated
+    uint256 public constant liquidationThreshold = 8500; //in basis points
+    // the collateral received by a liquidator is worth the repaid debt plus 5%
+    uint256 public constant liquidationBonus = 10500; //in basis points
+    IPool public immutable pool;
+
+    /**
+     * @dev     . reads the Pool from the registry once, it is kept as immutable . The contracts of every reserve
+     *            are read from the components cached by the Pool, in a single call per reserve
+     * @param   _addressesProviderAddress  . the address of the AddressesProvider
+     */
+    constructor(address _addressesProviderAddress) {
+        AddressesProvider addressesProvider = AddressesProvider(
+            _addressesProviderAddress
+        );
+        require(
+            addressesProvider.getPoolLogic() == address(this),
+            "unexpected deployment address"
+        );
 
-    constructor(address _poolConfigurationAddress) {
-        poolConfiguration = PoolConfiguration(_poolConfigurationAddress);
+        pool = IPool(addressesProvider.getPool());
     }
 
     /**
@@ -32,18 +63,12 @@ contract PoolLogic is DSMath {
         view
         returns (uint256)
     {
-        address xToken = poolConfiguration.underlyingAssetToXtoken(
+        DataTypes.ReserveComponents memory reserve = pool.getReserveComponents(
             _underlyingAsset
         );
-        uint256 userBalance = IXToken(xToken).balanceOf(_account);
+        uint256 userBalance = IXToken(reserve.xToken).balanceOf(_account);
 
-        address priceOracleAddress = poolConfiguration
-            .underlyingAssetToPriceOracle(_underlyingAsset);
-        PriceOracle priceOracle = PriceOracle(priceOracleAddress);
-
-        uint256 assetPrice = priceOracle.getLatestPrice();
-
-        uint256 userBalanceInUSD = userBalance * assetPrice;
+        uint256 userBalanceInUSD = wmul(userBalance, getAssetPrice(reserve));
         return userBalanceInUSD;
     }
 
@@ -58,18 +83,12 @@ contract PoolLogic is DSMath {
         view
         returns (uint256)
     {
-        address debtToken = poolConfiguration.underlyingAssetToDebtToken(
+        DataTypes.ReserveComponents memory reserve = pool.getReserveComponents(
             _underlyingAsset
         );
-        uint256 userDebt = IDebtToken(debtToken).balanceOf(_account);
-
-        address priceOracleAddress = poolConfiguration
-            .underlyingAssetToPriceOracle(_underlyingAsset);
-        PriceOracle priceOracle = PriceOracle(priceOracleAddress);
-
-        uint256 assetPrice = priceOracle.getLatestPrice();
+        uint256 userDebt = IDebtToken(reserve.debtToken).balanceOf(_account);
 
-        uint256 userDebtInUSD = userDebt * assetPrice;
+        uint256 userDebtInUSD = wmul(userDebt, getAssetPrice(reserve));
         return userDebtInUSD;
     }
 
@@ -84,60 +103,275 @@ contract PoolLogic is DSMath {
         view
         returns (uint256)
     {
-        address priceOracleAddress = poolConfiguration
-            .underlyingAssetToPriceOracle(_underlyingAsset);
-        PriceOracle priceOracle = PriceOracle(priceOracleAddress);
+        uint256 amountInUSD = wmul(
+            _amount,
+            getAssetPrice(pool.getReserveComponents(_underlyingAsset))
+        );
 
-        uint256 assetPrice = priceOracle.getLatestPrice();
+        return amountInUSD;
+    }
 
-        uint256 amountInUSD = _amount * assetPrice;
+    /**
+     * @dev     . get the latest unit price of the underlying asset of a reserve from its price oracle, scaled by
+     * the token decimals recorded when the token was added
+     * @param   _reserve  . the components of the reserve cached by the Pool
+     * @return  uint256  . the latest unit price of the underlying asset
+     */
+    function getAssetPrice(DataTypes.ReserveComponents memory _reserve)
+        internal
+        view
+        returns (uint256)
+    {
+        return
+            PriceOracle(_reserve.priceOracle).getLatestPrice() *
+            _reserve.decimalsScale;
+    }
 
-        return amountInUSD;
+    /**
+     * @dev     . get a snapshot of the user position across all the tokens of the protocol in a single call .
+     * Only the reserves flagged in the user configuration are read, the price oracle of each of them at most once
+     * @param   _account  . the user's address
+     * @return  uint256  . total collateral (xToken balances) in USD
+     * @return  uint256  . total debt (debtToken balances) in USD
+     * @return  uint256  . amount in USD the user can still borrow, based on `maxAmountRate`
+     * @return  uint256  . health factor in wad (total collateral at the liquidation threshold / total debt), the
+     * user can be liquidated below 1e18 . It is the max uint256 when the user has no debt
+     */
+    function getUserAccountData(address _account)
+        public
+        view
+        returns (
+            uint256,
+            uint256,
+            uint256,
+            uint256
+        )
+    {
+        DataTypes.ReserveComponents memory none;
+        DataTypes.AccountData memory accountData = calculateAccountData(
+            _account,
+            pool.userConfigurations(_account),
+            none,
+            none
+        );
+        uint256 totalCollateralInUSD = accountData.totalCollateralInUSD;
+        uint256 totalDebtInUSD = accountData.totalDebtInUSD;
+
+        uint256 maxAmountInUSD = getMaxAmountInUSD(totalCollateralInUSD);
+
+        uint256 availableBorrowsInUSD;
+        if (maxAmountInUSD > totalDebtInUSD) {
+            availableBorrowsInUSD = maxAmountInUSD - totalDebtInUSD;
+        }
+
+        uint256 healthFactor;
+        if (totalDebtInUSD == 0) {
+            healthFactor = type(uint256).max;
+        } else {
+            healthFactor = wdiv(
+                getLiquidationThresholdInUSD(totalCollateralInUSD),
+                totalDebtInUSD
+            );
+        }
+
+        return (
+            totalCollateralInUSD,
+            totalDebtInUSD,
+            availableBorrowsInUSD,
+            healthFactor
+        );
+    }
+
+    /**
+     * @dev     . sums the balances and debts in USD of a user over the reserves flagged in its configuration .
+     * The components of each reserve are read from the Pool in one call and its price oracle at most once, the
+     * prices of `_asset` and `_collateral` are kept for the caller and only read after the loop when the user
+     * has no position in them
+     * @param   _account  . the user's address
+     * @param   _userConfiguration  . the configuration of the user in the Pool
+     * @param   _asset  . the reserve of the action being validated, an empty one when there is none
+     * @param   _collateral  . the collateral reserve of the action being validated, an empty one when there is none
+     * @return  DataTypes.AccountData  . the totals of the user and the prices of the asset and the collateral
+     */
+    function calculateAccountData(
+        address _account,
+        uint256 _userConfiguration,
+        DataTypes.ReserveComponents memory _asset,
+        DataTypes.ReserveComponents memory _collateral
+    ) internal view returns (DataTypes.AccountData memory) {
+        DataTypes.AccountData memory accountData;
+
+        // the configuration is shifted by one reserve per iteration, the loop ends after the last flagged one
+        for (
+            uint256 reserveId = 0;
+            _userConfiguration != 0;
+            reserveId++
+        ) {
+            if ((_userConfiguration & UserConfiguration.RESERVE_MASK) != 0) {
+                DataTypes.ReserveComponents memory reserve = pool
+                    .getReserveComponentsById(reserveId);
+                (
+                    uint256 userBalance,
+                    uint256 userDebt
+                ) = getUserBalanceAndDebt(
+                        _account,
+                        reserve,
+                        _userConfiguration
+                    );
+
+                if (userBalance != 0 || userDebt != 0) {
+                    uint256 assetPrice = getAssetPrice(reserve);
+
+                    accountData.totalCollateralInUSD =
+                        accountData.totalCollateralInUSD +
+                        wmul(userBalance, assetPrice);
+                    accountData.totalDebtInUSD =
+                        accountData.totalDebtInUSD +
+                        wmul(userDebt, assetPrice);
+
+                    // a reserve is identified by its xToken, the empty reserve has none
+                    if (reserve.xToken == _asset.xToken) {
+                        accountData.assetPrice = assetPrice;
+                    }
+                    if (reserve.xToken == _collateral.xToken) {
+                        accountData.collateralPrice = assetPrice;
+                    }
+                }
+            }
+
+            _userConfiguration = _userConfiguration >> 2;
+        }
+
+        if (_asset.xToken != address(0) && accountData.assetPrice == 0) {
+            accountData.assetPrice = getAssetPrice(_asset);
+        }
+        if (
+            _collateral.xToken != address(0) &&
+            accountData.collateralPrice == 0
+        ) {
+            accountData.collateralPrice = _collateral.xToken == _asset.xToken
+                ? accountData.assetPrice
+                : getAssetPrice(_collateral);
+        }
+
+        return accountData;
+    }
+
+    /**
+     * @dev     . get the balance and the debt of a user in a reserve, only the ones flagged are read
+     * @param   _account  . the user's address
+     * @param   _reserve  . the components of the reserve cached by the Pool
+     * @param   _reserveConfiguration  . the user configuration shifted to the reserve, its 2 lowest bits are read
+     * @return  uint256  . the xToken balance of the user
+     * @return  uint256  . the debtToken balance of the user
+     */
+    function getUserBalanceAndDebt(
+        address _account,
+        DataTypes.ReserveComponents memory _reserve,
+        uint256 _reserveConfiguration
+    ) internal view returns (uint256, uint256) {
+        uint256 userBalance;
+        uint256 userDebt;
+        if (_reserveConfiguration.isUsingAsCollateral(0)) {
+            userBalance = IXToken(_reserve.xToken).balanceOf(_account);
+        }
+        if (_reserveConfiguration.isBorrowing(0)) {
+            userDebt = IDebtToken(_reserve.debtToken).balanceOf(_account);
+        }
+
+        return (userBalance, userDebt);
     }
 
     /**
-     * @dev     . tells if user is legitimate to borrow
+     * @dev     . the maximum debt in USD a collateral allows, based on `maxAmountRate`
+     * @param   _collateralInUSD  . the collateral in USD
+     * @return  uint256  . the maximum debt in USD
+     */
+    function getMaxAmountInUSD(uint256 _collateralInUSD)
+        internal
+        pure
+        returns (uint256)
+    {
+        return (_collateralInUSD / 10000) * maxAmountRate;
+    }
+
+    /**
+     * @dev     . the debt in USD above which a collateral can be liquidated, based on `liquidationThreshold`
+     * @param   _collateralInUSD  . the collateral in USD
+     * @return  uint256  . the debt in USD at the liquidation threshold
+     */
+    function getLiquidationThresholdInUSD(uint256 _collateralInUSD)
+        internal
+        pure
+        returns (uint256)
+    {
+        return (_collateralInUSD / 10000) * liquidationThreshold;
+    }
+
+    /**
+     * @dev     . tells if a borrow keeps the utilization rate of its reserve within `maxUtilizationRate` : the
+     * borrowed amount moves from the available liquidity to the total borrowed, the total deposited is unchanged
+     * @param   _asset  . the address of the underlying asset to borrow
+     * @param   _reserve  . the components of the reserve cached by the Pool
+     * @param   _amount  . the amount to be borrowed
+     * @return  bool  . true if the utilization rate after the borrow is within `maxUtilizationRate`
+     */
+    function isWithinMaxUtilizationRate(
+        address _asset,
+        DataTypes.ReserveComponents memory _reserve,
+        uint256 _amount
+    ) internal view returns (bool) {
+        uint256 totalBorrowed = IDebtToken(_reserve.debtToken).totalSupply();
+        uint256 totalDeposited = IERC20(_asset).balanceOf(_reserve.xToken) +
+            totalBorrowed;
+
+        return
+            (totalBorrowed + _amount) * 10000 <=
+            totalDeposited * maxUtilizationRate;
+    }
+
+    /**
+     * @dev     . tells if user is legitimate to borrow : its debts across all its reserves, the new borrow
+     * included, must stay within the borrowing power of all its supplied balances, and the reserve must
+     * stay within `maxUtilizationRate`
      * @param   _account  . the address of the user who wants to borrow
      * @param   _asset  . The address of the underlying asset to borrow
      * @param   _amount  . The amount to be borrowed
-     * @param   _collateral  . he address of the underlying asset to set as collateral
      * @return  bool  . success boolian
-     * @return  uint256  . the amount borrowed if the user is legitimate to borrow otherwise it returns 0
      */
     function validateBorrow(
         address _account,
         address _asset,
-        uint256 _amount,
-        address _collateral
-    ) public view returns (bool, uint256) {
+        uint256 _amount
+    ) public view returns (bool) {
         require(_amount > 0, "Amount must be greater than 0");
-        require(
-            poolConfiguration.isAvailable(_collateral),
-            "token not available"
+        DataTypes.ReserveComponents memory reserve = pool.getReserveComponents(
+            _asset
         );
-        address priceOracleAddress = poolConfiguration
-            .underlyingAssetToPriceOracle(_collateral);
-        PriceOracle priceOracle = PriceOracle(priceOracleAddress);
+        require(reserve.isActive, "token not available");
 
-        uint256 collateralPrice = priceOracle.getLatestPrice();
-
-        uint256 userBalanceInUSD = getUserBalanceInUSD(_account, _collateral);
-
-        uint256 amountInUSD = getAmountInUSD(_amount, _asset);
+        if (!isWithinMaxUtilizationRate(_asset, reserve, _amount)) {
+            return false;
+        }
 
-        uint256 amountOfCollateral = amountInUSD / collateralPrice;
+        DataTypes.ReserveComponents memory none;
+        DataTypes.AccountData memory accountData = calculateAccountData(
+            _account,
+            pool.userConfigurations(_account),
+            reserve,
+            none
+        );
 
-        uint256 maxAmountInUSD = (userBalanceInUSD / 10000) * maxAmountRate;
+        uint256 amountInUSD = wmul(_amount, accountData.assetPrice);
 
-        if (amountInUSD <= maxAmountInUSD) {
-            return (true, amountOfCollateral);
-        } else {
-            return (false, 0);
-        }
+        return
+            accountData.totalDebtInUSD + amountInUSD <=
+            getMaxAmountInUSD(accountData.totalCollateralInUSD);
     }
 
     /**
-     * @dev     . tells if user is legitimate to withdraw
+     * @dev     . tells if user is legitimate to withdraw : the amount must not exceed its balance and, when the
+     * user has debts, the remaining supplied balances must still cover them
      * @param   _account  . the address of the user who wants to withdraw
      * @param   _underlyingAsset  . The address of the underlying asset to withdraw
      * @param   _amount  . The amount to be withdrawn
@@ -149,79 +383,107 @@ contract PoolLogic is DSMath {
         uint256 _amount
     ) public view returns (bool) {
         require(_amount > 0, "Amount must be greater than 0");
-        require(
-            poolConfiguration.isAvailable(_underlyingAsset),
-            "token not available"
-        );
-
-        address xtoken = poolConfiguration.underlyingAssetToXtoken(
+        DataTypes.ReserveComponents memory reserve = pool.getReserveComponents(
             _underlyingAsset
         );
-        uint256 userBalance = IXToken(xtoken).balanceOf(_account);
+        require(reserve.isActive, "token not available");
+
+        uint256 userBalance = IXToken(reserve.xToken).balanceOf(_account);
 
         if (_amount > userBalance) {
             return false;
-        } else {
+        }
+
+        // a user without debt withdraws without reading its other reserves
+        uint256 userConfiguration = pool.userConfigurations(_account);
+        if (!userConfiguration.isBorrowingAny()) {
             return true;
         }
+
+        DataTypes.ReserveComponents memory none;
+        DataTypes.AccountData memory accountData = calculateAccountData(
+            _account,
+            userConfiguration,
+            reserve,
+            none
+        );
+
+        uint256 amountInUSD = wmul(_amount, accountData.assetPrice);
+        uint256 collateralInUSDAfterWithdraw;
+        if (accountData.totalCollateralInUSD > amountInUSD) {
+            collateralInUSDAfterWithdraw =
+                accountData.totalCollateralInUSD -
+                amountInUSD;
+        }
+
+        return
+            accountData.totalDebtInUSD <=
+            getMaxAmountInUSD(collateralInUSDAfterWithdraw);
     }
 
     /**
-     * @dev     . get the collateral amount to mint depending on an amount of asset
-     * @param   _asset  . address of the asset
-     * @param   _amount  . the amount of the asset
-     * @param   _collateral  . the address of the collateral to mint
-     * @return  uint256  . collateral amount
+     * @dev     . tells if the sender of an xToken transfer is still legitimate once the balances moved : when the
+     * user has debts, its remaining supplied balances must still cover them, as for a withdraw
+     * @param   _account  . the address of the sender of the transfer
+     * @return  bool  . legitimacy boolian
      */
-    function getCollateralAmountToMint(
-        address _asset,
-        uint256 _amount,
-        address _collateral
-    ) public view returns (uint256) {
-        address priceOracleAddress = poolConfiguration
-            .underlyingAssetToPriceOracle(_collateral);
-        PriceOracle priceOracle = PriceOracle(priceOracleAddress);
+    function validateTransfer(address _account) public view returns (bool) {
+        // a user without debt transfers without reading its reserves
+        uint256 userConfiguration = pool.userConfigurations(_account);
+        if (!userConfiguration.isBorrowingAny()) {
+            return true;
+        }
 
-        uint256 collateralPrice = priceOracle.getLatestPrice();
-        uint256 amountOfAssetInUSD = getAmountInUSD(_amount, _asset);
+        DataTypes.ReserveComponents memory none;
+        DataTypes.AccountData memory accountData = calculateAccountData(
+            _account,
+            userConfiguration,
+            none,
+            none
+        );
 
-        return amountOfAssetInUSD / collateralPrice;
+        return
+            accountData.totalDebtInUSD <=
+            getMaxAmountInUSD(accountData.totalCollateralInUSD);
     }
 
     /**
-     * @dev     . tells if user is legitimate to liquidate a non-healthy position collateral-wise
+     * @dev     . tells if a user can be liquidated : its debts across all its reserves exceed its supplied balances
+     * at the liquidation threshold, i.e. its health factor is below 1e18
      * @param   _user  . The address of the borrower getting liquidated
      * @param   _asset  . The address of the underlying borrowed asset to be repaid with the liquidation
+     * @param   _amount  . The debt amount of borrowed `asset` the liquidator wants to cover
      * @param   _collateral  . The address of the underlying asset used as collateral, to receive as result of the liquidation
-     * @param   _collateralAmount  . the amount of collateral borrower hass
      * @return  bool  . legitimacy boolian
-     * @return  uint256  . the amount undercollateralized
+     * @return  uint256  . the amount of collateral worth `_amount` of asset plus the liquidation bonus, seized by
+     * the liquidator
      */
     function validateLiquidation(
         address _user,
         address _asset,
-        address _collateral,
-        uint256 _collateralAmount
+        uint256 _amount,
+        address _collateral
     ) public view returns (bool, uint256) {
-        uint256 collateralInUSD = getAmountInUSD(
-            _collateralAmount,
-            _collateral
+        DataTypes.AccountData memory accountData = calculateAccountData(
+            _user,
+            pool.userConfigurations(_user),
+            pool.getReserveComponents(_asset),
+            pool.getReserveComponents(_collateral)
         );
-        uint256 debtInUSD = getUserDebtInUSD(_user, _asset);
 
-        if (collateralInUSD >= debtInUSD) {
+        if (
+            accountData.totalDebtInUSD <=
+            getLiquidationThresholdInUSD(accountData.totalCollateralInUSD)
+        ) {
             return (false, 0);
         } else {
-            uint256 undercollateralizedAmountInUSD = debtInUSD -
-                collateralInUSD;
-
-            address priceOracleAddress = poolConfiguration
-                .underlyingAssetToPriceOracle(_collateral);
-            PriceOracle priceOracle = PriceOracle(priceOracleAddress);
-
-            uint256 assetPrice = priceOracle.getLatestPrice();
+            uint256 amountInUSD = wmul(_amount, accountData.assetPrice);
 
-            return (true, undercollateralizedAmountInUSD / assetPrice);
+            return (
+                true,
+                (wdiv(amountInUSD, accountData.collateralPrice) *
+                    liquidationBonus) / 10000
+            );
         }
     }
 }
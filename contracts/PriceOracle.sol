@@ -2,33 +2,162 @@
 pragma solidity ^0.8.12;
 
 import "@chainlink/contracts/src/v0.8/interfaces/AggregatorV3Interface.sol";
+import "@openzeppelin/contracts/access/Ownable.sol";
+import "@openzeppelin/contracts/proxy/utils/Initializable.sol";
 
 /**
  * @author  . Mebarkia Abdenour
  * @title   . PriceOracle
- * @dev     . get a price of specified pair - e.g (dai / usd )
+ * @dev     . get a price of specified pair - e.g (dai / usd ), normalized to 18 decimals whatever
+ *            the decimals of the price feed . A round is only used when its answer is positive, it is
+ *            complete and it was updated within the heartbeat of the feed . When the primary feed
+ *            fails these checks or reverts the price is read from the fallback feed, so the common
+ *            path stays a single call to the primary feed . Every reserve uses a clone of a shared
+ *            implementation, initialized with its price feed
  */
 
-contract PriceOracle {
+contract PriceOracle is Ownable, Initializable {
+    uint64 public constant DEFAULT_HEARTBEAT = 1 days;
+
+    // each feed shares its slot with its heartbeat, the primary one also with its decimals
     AggregatorV3Interface public priceFeed;
+    uint64 public heartbeat;
+    uint8 public priceFeedDecimals;
+
+    AggregatorV3Interface public fallbackPriceFeed;
+    uint64 public fallbackHeartbeat;
+
+    // 10 ** (18 - fallback price feed decimals), read when the fallback feed is set
+    uint256 public fallbackPriceScale;
 
-    constructor(address _priceFeedAddress) {
+    event HeartbeatUpdated(uint256 heartbeat);
+    event FallbackPriceFeedUpdated(
+        address fallbackPriceFeed,
+        uint256 fallbackHeartbeat
+    );
+
+    constructor() {
+        _disableInitializers();
+    }
+
+    /**
+     * @dev     . initializes a clone of the implementation, the feed decimals are read once here
+     * @param   _priceFeedAddress  . the address of the price feed
+     * @param   _owner  . the account allowed to set the heartbeat and the fallback feed
+     */
+    function initialize(address _priceFeedAddress, address _owner)
+        external
+        initializer
+    {
         priceFeed = AggregatorV3Interface(_priceFeedAddress);
+        heartbeat = DEFAULT_HEARTBEAT;
+        priceFeedDecimals = getPriceFeedDecimals(priceFeed);
+
+        _transferOwnership(_owner);
+    }
+
+    /**
+     * @dev     . sets the maximum age of a primary feed round
+     * @param   _heartbeat  . the heartbeat of the price feed in seconds
+     */
+    function setHeartbeat(uint64 _heartbeat) external onlyOwner {
+        heartbeat = _heartbeat;
+
+        emit HeartbeatUpdated(_heartbeat);
+    }
+
+    /**
+     * @dev     . sets the feed read when the primary feed is stale or invalid, the zero address removes it
+     * @param   _fallbackPriceFeedAddress  . the address of the fallback price feed
+     * @param   _fallbackHeartbeat  . the heartbeat of the fallback price feed in seconds
+     */
+    function setFallbackPriceFeed(
+        address _fallbackPriceFeedAddress,
+        uint64 _fallbackHeartbeat
+    ) external onlyOwner {
+        fallbackPriceFeed = AggregatorV3Interface(_fallbackPriceFeedAddress);
+        fallbackHeartbeat = _fallbackHeartbeat;
+
+        if (_fallbackPriceFeedAddress != address(0)) {
+            fallbackPriceScale =
+                10**(18 - getPriceFeedDecimals(fallbackPriceFeed));
+        } else {
+            fallbackPriceScale = 0;
+        }
+
+        emit FallbackPriceFeedUpdated(
+            _fallbackPriceFeedAddress,
+            _fallbackHeartbeat
+        );
     }
 
     /**
      * @dev     .  get the latest price of an asset
-     * @return  uint256  . the latest price of an asset
+     * @return  uint256  . the latest price of an asset in wad (1e18 is 1 USD)
      */
     function getLatestPrice() public view virtual returns (uint256) {
-        (
-            ,
-            /*uint80 roundID*/
-            int256 price, /*uint startedAt*/ /*uint timeStamp*/ /*uint80 answeredInRound*/
-            ,
-            ,
-
-        ) = priceFeed.latestRoundData();
-        return uint256(price);
+        (bool isValid, uint256 price) = readPriceFeed(priceFeed, heartbeat);
+        if (isValid) {
+            return price * 10**(18 - priceFeedDecimals);
+        }
+
+        AggregatorV3Interface fallbackFeed = fallbackPriceFeed;
+        if (address(fallbackFeed) != address(0)) {
+            (isValid, price) = readPriceFeed(fallbackFeed, fallbackHeartbeat);
+            if (isValid) {
+                return price * fallbackPriceScale;
+            }
+        }
+
+        revert("no valid price");
+    }
+
+    /**
+     * @dev     . reads the latest round of a feed and checks it, a feed reverting the read is invalid
+     * @param   _priceFeed  . the price feed
+     * @param   _heartbeat  . the maximum age of the round in seconds
+     * @return  bool  . true when the answer is positive, the round complete and not stale
+     * @return  uint256  . the answer of the round, in the decimals of the feed
+     */
+    function readPriceFeed(AggregatorV3Interface _priceFeed, uint256 _heartbeat)
+        internal
+        view
+        returns (bool, uint256)
+    {
+        try _priceFeed.latestRoundData() returns (
+            uint80 roundId,
+            int256 price,
+            uint256,
+            uint256 updatedAt,
+            uint80 answeredInRound
+        ) {
+            bool isValid = price > 0 &&
+                updatedAt != 0 &&
+                answeredInRound >= roundId &&
+                updatedAt + _heartbeat >= block.timestamp;
+
+            return (isValid, uint256(price));
+        } catch {
+            return (false, 0);
+        }
+    }
+
+    /**
+     * @dev     . 10 ** (18 - price feed decimals), scales a price of the primary feed to wad
+     * @return  uint256  . the scale of the primary feed
+     */
+    function priceScale() external view returns (uint256) {
+        return 10**(18 - priceFeedDecimals);
+    }
+
+    function getPriceFeedDecimals(AggregatorV3Interface _priceFeed)
+        internal
+        view
+        returns (uint8)
+    {
+        uint8 decimals = _priceFeed.decimals();
+        require(decimals <= 18, "price feed decimals above 18");
+
+        return decimals;
     }
 }
@@ -4,7 +4,10 @@ pragma solidity ^0.8.12;
 import "@openzeppelin/contracts/token/ERC20/IERC20.sol";
 import "../interfaces/IXToken.sol";
 import "../interfaces/IDebtToken.sol";
+import "../interfaces/IInterestRateStrategy.sol";
 import "./PoolConfiguration.sol";
+import "./AddressesProvider.sol";
+import "@openzeppelin/contracts/utils/math/SafeCast.sol";
 import "@ds-math/src/math.sol";
 
 import {DataTypes} from "./libraries/DataTypes.sol";
@@ -16,13 +19,28 @@ import {DataTypes} from "./libraries/DataTypes.sol";
  */
 
 contract ReservesManager is DSMath {
-    address public poolConfigurationAddress;
-    address public poolAddress;
+    using SafeCast for uint256;
+
+    address public immutable poolConfigurationAddress;
+    address public immutable poolAddress;
 
     uint256 public constant SECONDS_PER_YEAR = 365 days;
+    // largest rate * years, in wad, compounded in one step by `updateCompoundedIndex`
+    uint256 public constant MAX_COMPOUNDING_STEP = WAD / 8;
+    // largest rate * years, in wad, accrued by one update of the variable borrow index (a growth of ~9e6)
+    uint256 public constant MAX_COMPOUNDED_ACCRUAL = 16 * WAD;
 
     mapping(address => DataTypes.Reserve) public underlyingAssetToReserve;
 
+    event ReserveDataUpdated(
+        address indexed underlyingAsset,
+        uint256 utilizationRate,
+        uint256 liquidityRate,
+        uint256 variableBorrowRate,
+        uint256 supplyIndex,
+        uint256 variableBorrowIndex
+    );
+
     modifier onlyPool() {
         require(msg.sender == poolAddress, "caller must be pool");
         _;
@@ -36,9 +54,21 @@ contract ReservesManager is DSMath {
         _;
     }
 
-    constructor(address _poolConfigurationAddress, address _poolAddress) {
-        poolConfigurationAddress = _poolConfigurationAddress;
-        poolAddress = _poolAddress;
+    /**
+     * @dev     . reads the protocol contracts from the registry once, they are kept as immutables
+     * @param   _addressesProviderAddress  . the address of the AddressesProvider
+     */
+    constructor(address _addressesProviderAddress) {
+        AddressesProvider addressesProvider = AddressesProvider(
+            _addressesProviderAddress
+        );
+        require(
+            addressesProvider.getReservesManager() == address(this),
+            "unexpected deployment address"
+        );
+
+        poolConfigurationAddress = addressesProvider.getPoolConfiguration();
+        poolAddress = addressesProvider.getPool();
     }
 
     function getReserve(address _underlyingAsset)
@@ -71,28 +101,7 @@ contract ReservesManager is DSMath {
     }
 
     /**
-     * @dev     . calculates the variable borrow rate of a reserve based on utilization rate, base variable borrow rate
-     * & intereste rate slope of a reserve
-     * @param   _utilizationRate  .  utilization rate of a reserve
-     * @param   _baseVariableBorrowRate  . base variable borrow rate of a reserve
-     * @param   _interestRateSlope  . intereste rate slope of a reserve
-     * @return  uint256  . the variable borrow value
-     */
-    function updateVariableBorrowRate(
-        uint256 _utilizationRate,
-        uint256 _baseVariableBorrowRate,
-        uint256 _interestRateSlope
-    ) internal pure returns (uint256) {
-        uint256 variableBorrowRate = add(
-            _baseVariableBorrowRate,
-            (wmul(_utilizationRate, _interestRateSlope))
-        );
-
-        return variableBorrowRate;
-    }
-
-    /**
-     * @dev     . calculates the index of debt or interest of all users
+     * @dev     . calculates the index of interest of all suppliers, accruing linearly
      * @param   _latestIndex  . latest index
      * @param   _rate  . variable borrow rate / liquidity rate , dependes of the index we want to calculate
      * @param   _secondsSinceLastupdate  . number of seconds since latest update of a reserve
@@ -113,74 +122,217 @@ contract ReservesManager is DSMath {
         return index;
     }
 
+    /**
+     * @dev     . calculates the variable borrow index compounded every second, `(1 + rate / year) ^ seconds`
+     * being approximated by the first five terms of its binomial expansion . The expansion only holds while
+     * rate * years is small : longer accruals are split in equal steps of at most MAX_COMPOUNDING_STEP, each
+     * step factor being raised to the number of steps with rpow . The index never reverts : an accrual is
+     * capped at MAX_COMPOUNDED_ACCRUAL, so that the ray factors can not overflow, and the index saturates at
+     * the max uint128 it is stored in
+     * @param   _latestIndex  . latest variable borrow index
+     * @param   _rate  . variable borrow rate
+     * @param   _secondsSinceLastupdate  . number of seconds since latest update of a reserve
+     * @return  uint256  . the index value
+     */
+    function updateCompoundedIndex(
+        uint256 _latestIndex,
+        uint256 _rate,
+        uint256 _secondsSinceLastupdate
+    ) internal pure returns (uint256) {
+        if (_secondsSinceLastupdate == 0) {
+            return _latestIndex;
+        }
+
+        // the interest above the cap is not accrued, the reserve stays usable
+        if (
+            _rate * _secondsSinceLastupdate >
+            MAX_COMPOUNDED_ACCRUAL * SECONDS_PER_YEAR
+        ) {
+            _secondsSinceLastupdate =
+                (MAX_COMPOUNDED_ACCRUAL * SECONDS_PER_YEAR) /
+                _rate;
+        }
+
+        uint256 ratePerSecond = (_rate * (RAY / WAD)) / SECONDS_PER_YEAR;
+        uint256 steps = (_rate * _secondsSinceLastupdate) /
+            (MAX_COMPOUNDING_STEP * SECONDS_PER_YEAR) +
+            1;
+        uint256 secondsPerStep = _secondsSinceLastupdate / steps;
+
+        uint256 compoundedInterest = rmul(
+            rpow(calculateCompoundedInterest(ratePerSecond, secondsPerStep), steps),
+            calculateCompoundedInterest(
+                ratePerSecond,
+                _secondsSinceLastupdate - secondsPerStep * steps
+            )
+        );
+
+        return
+            min(
+                wmul(_latestIndex, compoundedInterest / (RAY / WAD)),
+                type(uint128).max
+            );
+    }
+
+    /**
+     * @dev     . calculates `(1 + ratePerSecond) ^ seconds` in ray with the first five terms of its binomial
+     * expansion, within 3e-7 of the exact value while ratePerSecond * seconds <= MAX_COMPOUNDING_STEP
+     * @param   _ratePerSecond  . rate per second, in ray
+     * @param   _seconds  . number of seconds compounded
+     * @return  uint256  . the compounded interest factor, in ray
+     */
+    function calculateCompoundedInterest(
+        uint256 _ratePerSecond,
+        uint256 _seconds
+    ) internal pure returns (uint256) {
+        if (_seconds == 0) {
+            return RAY;
+        }
+
+        uint256 expMinusOne = _seconds - 1;
+        uint256 expMinusTwo = _seconds > 2 ? _seconds - 2 : 0;
+        uint256 expMinusThree = _seconds > 3 ? _seconds - 3 : 0;
+
+        // r * t, r^2 * t * (t - 1) / 2, r^3 * t * (t - 1) * (t - 2) / 6 and r^4 * t * ... * (t - 3) / 24,
+        // each term derived from the previous one so that the products are rounded once they are large
+        uint256 firstTerm = _ratePerSecond * _seconds;
+        uint256 secondTerm = rmul(firstTerm, _ratePerSecond * expMinusOne) / 2;
+        uint256 thirdTerm = rmul(secondTerm, _ratePerSecond * expMinusTwo) / 3;
+        uint256 fourthTerm = rmul(thirdTerm, _ratePerSecond * expMinusThree) / 4;
+
+        return RAY + firstTerm + secondTerm + thirdTerm + fourthTerm;
+    }
+
     /**
      * @dev     . update all the variable properties of a reserve, this function is called
-     * whenever a user call this functions : supply, borrow, withdraw, repay
+     * whenever a user call this functions : supply, borrow, withdraw, repay, once the tokens are moved .
+     * The totals are read from the tokens : the debt is the debtToken supply and the deposits are the
+     * available liquidity held by the xToken plus the debt
      * @param   _underlyingAsset  . The address of the underlying asset of the reserve
-     * @param   _amount  . the amount user passed on one of the function quoted above
-     * @param   _operation  . an integer that represents which function the user called
-     *                           operation : value
-     *                           supply : 0
-     *                           borrow : 1
-     *                           withdraw : 2
-     *                           repay : 3
      */
-    function updateState(
-        address _underlyingAsset,
-        uint256 _amount,
-        uint256 _operation
-    ) public onlyPool {
-        DataTypes.Reserve memory reserve;
-        reserve = underlyingAssetToReserve[_underlyingAsset];
+    function updateState(address _underlyingAsset) public onlyPool {
+        DataTypes.Reserve storage reserve = underlyingAssetToReserve[
+            _underlyingAsset
+        ];
+        DataTypes.Reserve memory updatedReserve = readReserveState(reserve);
 
         uint256 secondsSinceLastupdate = block.timestamp -
-            reserve.lastUpdateTime;
-
-        if (_operation == 0) {
-            reserve.totalDeposited = reserve.totalDeposited + _amount;
-        }
-        if (_operation == 1) {
-            reserve.totalBorrowed = reserve.totalBorrowed + _amount;
-        }
-        if (_operation == 2) {
-            reserve.totalDeposited = reserve.totalDeposited - _amount;
-        }
-        if (_operation == 3) {
-            reserve.totalBorrowed = reserve.totalBorrowed - _amount;
+            updatedReserve.lastUpdateTime;
+
+        uint256 variableBorrowIndex = updatedReserve.variableBorrowIndex;
+        uint256 supplyIndex = updatedReserve.supplyIndex;
+
+        // interests accrued since the last update at the rates in effect until now, the same
+        // indexes the xToken / debtToken scaled their mint and burn amounts with . Debt compounds,
+        // supply accrues linearly . Within the block of the last update nothing accrued, the
+        // stored indexes are kept and only the utilization and the rates are updated
+        if (secondsSinceLastupdate != 0) {
+            variableBorrowIndex = updateCompoundedIndex(
+                variableBorrowIndex,
+                updatedReserve.variableBorrowRate,
+                secondsSinceLastupdate
+            );
+            supplyIndex = updateIndex(
+                supplyIndex,
+                updatedReserve.liquidityRate,
+                secondsSinceLastupdate
+            );
         }
 
-        uint256 utilizationRate = updateUtilizationRate(
-            reserve.totalDeposited,
-            reserve.totalBorrowed
+        // same value as `debtToken.totalSupply()`, without calling back this contract for the index
+        uint256 totalBorrowed = wmul(
+            IDebtToken(reserve.debtToken).scaledTotalSupply(),
+            variableBorrowIndex
         );
-        uint256 variableBorrowRate = updateVariableBorrowRate(
-            utilizationRate,
-            reserve.baseVariableBorrowRate,
-            reserve.interestRateSlope
+        uint256 totalDeposited = IERC20(_underlyingAsset).balanceOf(
+            reserve.xToken
+        ) + totalBorrowed;
+
+        uint256 utilizationRate = updateUtilizationRate(
+            totalDeposited,
+            totalBorrowed
         );
+        uint256 variableBorrowRate = IInterestRateStrategy(
+            updatedReserve.interestRateStrategy
+        ).calculateVariableBorrowRate(utilizationRate);
 
         uint256 liquidityRate = wmul(variableBorrowRate, utilizationRate);
 
-        uint256 variableBorrowIndex = updateIndex(
-            reserve.variableBorrowIndex,
-            variableBorrowRate,
-            secondsSinceLastupdate
-        );
+        updatedReserve.utilizationRate = utilizationRate.toUint128();
+        updatedReserve.variableBorrowRate = variableBorrowRate.toUint128();
+        updatedReserve.variableBorrowIndex = variableBorrowIndex.toUint128();
+        updatedReserve.liquidityRate = liquidityRate.toUint128();
+        updatedReserve.supplyIndex = supplyIndex.toUint128();
+        updatedReserve.lastUpdateTime = block.timestamp.toUint40();
 
-        uint256 supplyIndex = updateIndex(
-            reserve.supplyIndex,
+        writeReserveState(reserve, updatedReserve);
+
+        emit ReserveDataUpdated(
+            _underlyingAsset,
+            utilizationRate,
             liquidityRate,
-            secondsSinceLastupdate
+            variableBorrowRate,
+            supplyIndex,
+            variableBorrowIndex
         );
+    }
 
-        reserve.utilizationRate = utilizationRate;
-        reserve.variableBorrowRate = variableBorrowRate;
-        reserve.variableBorrowIndex = variableBorrowIndex;
-        reserve.liquidityRate = liquidityRate;
-        reserve.supplyIndex = supplyIndex;
-        reserve.lastUpdateTime = block.timestamp;
+    /**
+     * @dev     . copies the variable properties of a reserve (storage slots 0 to 3) to memory,
+     * the token addresses are never updated so they are not read
+     * @param   _reserve  . the reserve in storage
+     * @return  DataTypes.Reserve  . the reserve in memory, without its token addresses
+     */
+    function readReserveState(DataTypes.Reserve storage _reserve)
+        internal
+        view
+        returns (DataTypes.Reserve memory)
+    {
+        DataTypes.Reserve memory reserve;
 
-        underlyingAssetToReserve[_underlyingAsset] = reserve;
+        reserve.utilizationRate = _reserve.utilizationRate;
+        reserve.variableBorrowRate = _reserve.variableBorrowRate;
+        reserve.interestRateStrategy = _reserve.interestRateStrategy;
+        reserve.variableBorrowIndex = _reserve.variableBorrowIndex;
+        reserve.liquidityRate = _reserve.liquidityRate;
+        reserve.supplyIndex = _reserve.supplyIndex;
+        reserve.lastUpdateTime = _reserve.lastUpdateTime;
+
+        return reserve;
+    }
+
+    /**
+     * @dev     . writes back the variable properties of a reserve, a storage slot is only written
+     * when one of the fields it packs has changed
+     * @param   _reserve  . the reserve in storage
+     * @param   _updatedReserve  . the updated reserve in memory
+     */
+    function writeReserveState(
+        DataTypes.Reserve storage _reserve,
+        DataTypes.Reserve memory _updatedReserve
+    ) internal {
+        if (
+            _reserve.utilizationRate != _updatedReserve.utilizationRate ||
+            _reserve.variableBorrowRate != _updatedReserve.variableBorrowRate
+        ) {
+            _reserve.utilizationRate = _updatedReserve.utilizationRate;
+            _reserve.variableBorrowRate = _updatedReserve.variableBorrowRate;
+        }
+        if (
+            _reserve.variableBorrowIndex !=
+            _updatedReserve.variableBorrowIndex ||
+            _reserve.liquidityRate != _updatedReserve.liquidityRate
+        ) {
+            _reserve.variableBorrowIndex = _updatedReserve.variableBorrowIndex;
+            _reserve.liquidityRate = _updatedReserve.liquidityRate;
+        }
+        if (
+            _reserve.supplyIndex != _updatedReserve.supplyIndex ||
+            _reserve.lastUpdateTime != _updatedReserve.lastUpdateTime
+        ) {
+            _reserve.supplyIndex = _updatedReserve.supplyIndex;
+            _reserve.lastUpdateTime = _updatedReserve.lastUpdateTime;
+        }
     }
 
     /**
@@ -193,13 +345,18 @@ contract ReservesManager is DSMath {
         view
         returns (uint256)
     {
-        DataTypes.Reserve memory reserve;
-        reserve = underlyingAssetToReserve[_underlyingAsset];
+        DataTypes.Reserve storage reserve = underlyingAssetToReserve[
+            _underlyingAsset
+        ];
 
         uint256 secondsSinceLastupdate = block.timestamp -
             reserve.lastUpdateTime;
 
-        uint256 variableBorrowIndex = updateIndex(
+        if (secondsSinceLastupdate == 0) {
+            return reserve.variableBorrowIndex;
+        }
+
+        uint256 variableBorrowIndex = updateCompoundedIndex(
             reserve.variableBorrowIndex,
             reserve.variableBorrowRate,
             secondsSinceLastupdate
@@ -218,12 +375,17 @@ contract ReservesManager is DSMath {
         view
         returns (uint256)
     {
-        DataTypes.Reserve memory reserve;
-        reserve = underlyingAssetToReserve[_underlyingAsset];
+        DataTypes.Reserve storage reserve = underlyingAssetToReserve[
+            _underlyingAsset
+        ];
 
         uint256 secondsSinceLastupdate = block.timestamp -
             reserve.lastUpdateTime;
 
+        if (secondsSinceLastupdate == 0) {
+            return reserve.supplyIndex;
+        }
+
         uint256 supplyIndex = updateIndex(
             reserve.supplyIndex,
             reserve.liquidityRate,
@@ -236,15 +398,13 @@ contract ReservesManager is DSMath {
     /**
      * @dev     . init a new reserve when adding new available token, this can only be called by PoolConfiguration
      * @param   _underlyingAsset  . the address of the underlying asset of the new reserve
-     * @param   _baseVariableBorrowRate  . base variable borrow rate of the new reserve
-     * @param   _interestRateSlope  . interest rate slope of the new reserve
+     * @param   _interestRateStrategy  . address of the interest rate strategy of the new reserve
      * @param   _xToken  . address of xToken of the new reserve
      * @param   _debtToken  . address of debtToken of the new reserve
      */
     function initReserve(
         address _underlyingAsset,
-        uint256 _baseVariableBorrowRate,
-        uint256 _interestRateSlope,
+        address _interestRateStrategy,
         address _xToken,
         address _debtToken
     ) public onlyPoolConfiguration {
@@ -253,14 +413,11 @@ contract ReservesManager is DSMath {
         reserve = DataTypes.Reserve(
             0,
             0,
-            0,
-            0,
-            _baseVariableBorrowRate,
-            _interestRateSlope,
+            _interestRateStrategy,
             1000000000000000000,
             0,
             1000000000000000000,
-            block.timestamp,
+            block.timestamp.toUint40(),
             _xToken,
             _debtToken
         );
@@ -269,20 +426,35 @@ contract ReservesManager is DSMath {
 
     // Reseve getters
 
+    /**
+     * @dev     . the total deposited in a reserve, interests included : the available liquidity plus the total borrowed
+     * @param   _underlyingAsset  . the address of the underlying asset of the reserve
+     * @return  uint256  . the total deposited
+     */
     function getTotalDeposited(address _underlyingAsset)
         public
         view
         returns (uint256)
     {
-        return underlyingAssetToReserve[_underlyingAsset].totalDeposited;
+        return
+            IERC20(_underlyingAsset).balanceOf(
+                underlyingAssetToReserve[_underlyingAsset].xToken
+            ) + getTotalBorrowed(_underlyingAsset);
     }
 
+    /**
+     * @dev     . the total borrowed from a reserve, interests included
+     * @param   _underlyingAsset  . the address of the underlying asset of the reserve
+     * @return  uint256  . the debtToken total supply
+     */
     function getTotalBorrowed(address _underlyingAsset)
         public
         view
         returns (uint256)
     {
-        return underlyingAssetToReserve[_underlyingAsset].totalBorrowed;
+        return
+            IERC20(underlyingAssetToReserve[_underlyingAsset].debtToken)
+                .totalSupply();
     }
 
     function getUtilizationRate(address _underlyingAsset)
@@ -301,21 +473,12 @@ contract ReservesManager is DSMath {
         return underlyingAssetToReserve[_underlyingAsset].variableBorrowRate;
     }
 
-    function getBaseVariableBorrowRate(address _underlyingAsset)
-        public
-        view
-        returns (uint256)
-    {
-        return
-            underlyingAssetToReserve[_underlyingAsset].baseVariableBorrowRate;
-    }
-
-    function getInterestRateSlope(address _underlyingAsset)
+    function getInterestRateStrategy(address _underlyingAsset)
         public
         view
-        returns (uint256)
+        returns (address)
     {
-        return underlyingAssetToReserve[_underlyingAsset].interestRateSlope;
+        return underlyingAssetToReserve[_underlyingAsset].interestRateStrategy;
     }
 
     function getVariableBorrowIndex(address _underlyingAsset)
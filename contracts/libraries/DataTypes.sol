@@ -4,22 +4,75 @@ pragma solidity ^0.8.12;
 /**
  * @author  . MEBARKIA Abdenour
  * @title   . DataTypes
- * @dev     . Library containing a Reserve struct wich defines reserve properties .
+ * @dev     . Library containing a Reserve struct wich defines reserve properties, a ReserveComponents
+ *            struct wich defines the contracts of a reserve cached by the Pool, a ReserveConfig struct
+ *            wich defines a token to add to the protocol and an AccountData struct wich defines the
+ *            position of a user across all its reserves .
  */
 
 library DataTypes {
+    /**
+     * @dev     . the fields are narrowed and ordered so that they pack in 6 storage slots instead of 10 :
+     *               slot 0 : utilizationRate | variableBorrowRate
+     *               slot 1 : interestRateStrategy
+     *               slot 2 : variableBorrowIndex | liquidityRate
+     *               slot 3 : supplyIndex | lastUpdateTime
+     *               slot 4 : xToken
+     *               slot 5 : debtToken
+     *            the totals deposited / borrowed are not stored, they are derived from the
+     *            xToken / debtToken supplies
+     */
     struct Reserve {
-        uint256 totalDeposited;
-        uint256 totalBorrowed;
-        uint256 utilizationRate;
-        uint256 variableBorrowRate;
-        uint256 baseVariableBorrowRate;
-        uint256 interestRateSlope;
-        uint256 variableBorrowIndex;
-        uint256 liquidityRate;
-        uint256 supplyIndex;
-        uint256 lastUpdateTime;
+        uint128 utilizationRate;
+        uint128 variableBorrowRate;
+        address interestRateStrategy;
+        uint128 variableBorrowIndex;
+        uint128 liquidityRate;
+        uint128 supplyIndex;
+        uint40 lastUpdateTime;
         address xToken;
         address debtToken;
     }
+
+    /**
+     * @dev     . the contracts of a reserve, cached by the Pool when the token is added and read by PoolLogic
+     *            in a single call . They pack in 3 storage slots :
+     *               slot 0 : xToken | isActive | id
+     *               slot 1 : debtToken | decimalsScale
+     *               slot 2 : priceOracle
+     *            so supply/withdraw read a single slot, the id is the index of the reserve in the
+     *            PoolConfiguration tokens and in the user configurations, the decimals scale is
+     *            10 ** (18 - token decimals)
+     */
+    struct ReserveComponents {
+        address xToken;
+        bool isActive;
+        uint16 id;
+        address debtToken;
+        uint96 decimalsScale;
+        address priceOracle;
+    }
+
+    /**
+     * @dev     . the parameters of PoolConfiguration.addToken, to add several tokens in one transaction
+     */
+    struct ReserveConfig {
+        string name;
+        string symbol;
+        address underlyingAsset;
+        address priceFeedAddress;
+        uint256 decimals;
+        address interestRateStrategy;
+    }
+
+    /**
+     * @dev     . the totals of a user position across its reserves in USD, with the unit prices of the asset
+     *            and the collateral of the action being validated, read while summing them
+     */
+    struct AccountData {
+        uint256 totalCollateralInUSD;
+        uint256 totalDebtInUSD;
+        uint256 assetPrice;
+        uint256 collateralPrice;
+    }
 }
@@ -0,0 +1,83 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.12;
+
+/**
+ * @author  . MEBARKIA Abdenour
+ * @title   . UserConfiguration
+ * @dev     . Library reading and writing the configuration of a user : a single word with 2 bits per reserve,
+ *            indexed by the reserve id . The bit 2 * id is set when the user borrowed the reserve and the
+ *            bit 2 * id + 1 when the user supplied it, so a word tracks up to 128 reserves
+ */
+
+library UserConfiguration {
+    uint256 internal constant MAX_RESERVES_COUNT = 128;
+
+    uint256 internal constant BORROWING_MASK = 1;
+    uint256 internal constant COLLATERAL_MASK = 2;
+    uint256 internal constant RESERVE_MASK = 3;
+    // the borrowing bit of every reserve
+    uint256 internal constant BORROWING_ANY_MASK =
+        0x5555555555555555555555555555555555555555555555555555555555555555;
+
+    /**
+     * @dev     . sets or clears the borrowing bit of a reserve
+     * @param   _userConfiguration  . the configuration of the user
+     * @param   _reserveId  . the id of the reserve
+     * @param   _borrowing  . true to set the bit, false to clear it
+     * @return  uint256  . the updated configuration
+     */
+    function setBorrowing(
+        uint256 _userConfiguration,
+        uint256 _reserveId,
+        bool _borrowing
+    ) internal pure returns (uint256) {
+        uint256 bit = BORROWING_MASK << (_reserveId << 1);
+
+        return _borrowing ? _userConfiguration | bit : _userConfiguration & ~bit;
+    }
+
+    /**
+     * @dev     . sets or clears the collateral bit of a reserve
+     * @param   _userConfiguration  . the configuration of the user
+     * @param   _reserveId  . the id of the reserve
+     * @param   _usingAsCollateral  . true to set the bit, false to clear it
+     * @return  uint256  . the updated configuration
+     */
+    function setUsingAsCollateral(
+        uint256 _userConfiguration,
+        uint256 _reserveId,
+        bool _usingAsCollateral
+    ) internal pure returns (uint256) {
+        uint256 bit = COLLATERAL_MASK << (_reserveId << 1);
+
+        return
+            _usingAsCollateral
+                ? _userConfiguration | bit
+                : _userConfiguration & ~bit;
+    }
+
+    function isBorrowing(uint256 _userConfiguration, uint256 _reserveId)
+        internal
+        pure
+        returns (bool)
+    {
+        return ((_userConfiguration >> (_reserveId << 1)) & BORROWING_MASK) != 0;
+    }
+
+    function isUsingAsCollateral(uint256 _userConfiguration, uint256 _reserveId)
+        internal
+        pure
+        returns (bool)
+    {
+        return
+            ((_userConfiguration >> (_reserveId << 1)) & COLLATERAL_MASK) != 0;
+    }
+
+    function isBorrowingAny(uint256 _userConfiguration)
+        internal
+        pure
+        returns (bool)
+    {
+        return (_userConfiguration & BORROWING_ANY_MASK) != 0;
+    }
+}
@@ -0,0 +1,11 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.12;
+
+import "@openzeppelin/contracts/proxy/Clones.sol";
+
+// creates clones of the implementations outside of a listing, to test them on their own
+contract ClonesMock {
+    function clone(address _implementation) external returns (address) {
+        return Clones.clone(_implementation);
+    }
+}
@@ -4,8 +4,8 @@ pragma solidity ^0.8.12;
 import "./../PoolLogic.sol";
 
 contract PoolLogicMock is PoolLogic {
-    constructor(address _poolConfigurationAddress)
-        PoolLogic(_poolConfigurationAddress)
+    constructor(address _addressesProviderAddress)
+        PoolLogic(_addressesProviderAddress)
     {}
 
     function _getUserBalanceInUSD(address _account, address _underlyingAsset)
@@ -4,8 +4,26 @@ pragma solidity ^0.8.12;
 import "./../ReservesManager.sol";
 
 contract ReservesManagerMock is ReservesManager {
-    constructor(address _poolConfigurationAddress, address _poolAddress)
-        ReservesManager(_poolConfigurationAddress, _poolAddress)
+    // the reserve layout before it was packed : one slot per field and the totals stored, kept to
+    // measure the gas of updateState against it
+    struct UnpackedReserve {
+        uint256 totalDeposited;
+        uint256 totalBorrowed;
+        uint256 utilizationRate;
+        uint256 variableBorrowRate;
+        address interestRateStrategy;
+        uint256 variableBorrowIndex;
+        uint256 liquidityRate;
+        uint256 supplyIndex;
+        uint256 lastUpdateTime;
+        address xToken;
+        address debtToken;
+    }
+
+    mapping(address => UnpackedReserve) internal unpackedReserves;
+
+    constructor(address _addressesProviderAddress)
+        ReservesManager(_addressesProviderAddress)
     {}
 
     function _updateUtilizationRate(
@@ -15,24 +33,103 @@ contract ReservesManagerMock is ReservesManager {
         return super.updateUtilizationRate(_totalDeposited, _totalBorrowed);
     }
 
-    function _updateVariableBorrowRate(
-        uint256 _utilizationRate,
-        uint256 _baseVariableBorrowRate,
-        uint256 _interestRateSlope
+    function _updateIndex(
+        uint256 _latestIndex,
+        uint256 _rate,
+        uint256 _secondsSinceLastupdate
     ) public pure returns (uint256) {
-        return
-            super.updateVariableBorrowRate(
-                _utilizationRate,
-                _baseVariableBorrowRate,
-                _interestRateSlope
-            );
+        return super.updateIndex(_latestIndex, _rate, _secondsSinceLastupdate);
     }
 
-    function _updateIndex(
+    function _updateCompoundedIndex(
         uint256 _latestIndex,
         uint256 _rate,
         uint256 _secondsSinceLastupdate
     ) public pure returns (uint256) {
-        return super.updateIndex(_latestIndex, _rate, _secondsSinceLastupdate);
+        return
+            super.updateCompoundedIndex(
+                _latestIndex,
+                _rate,
+                _secondsSinceLastupdate
+            );
+    }
+
+    function _initUnpackedReserve(address _underlyingAsset) public {
+        DataTypes.Reserve memory reserve = underlyingAssetToReserve[
+            _underlyingAsset
+        ];
+
+        unpackedReserves[_underlyingAsset] = UnpackedReserve(
+            0,
+            0,
+            reserve.utilizationRate,
+            reserve.variableBorrowRate,
+            reserve.interestRateStrategy,
+            reserve.variableBorrowIndex,
+            reserve.liquidityRate,
+            reserve.supplyIndex,
+            reserve.lastUpdateTime,
+            reserve.xToken,
+            reserve.debtToken
+        );
+    }
+
+    // the same calculations as updateState, with the former storage pattern : the whole reserve is
+    // copied to memory and written back
+    function _updateStateUnpacked(address _underlyingAsset) public onlyPool {
+        UnpackedReserve memory reserve = unpackedReserves[_underlyingAsset];
+
+        uint256 secondsSinceLastupdate = block.timestamp -
+            reserve.lastUpdateTime;
+
+        if (secondsSinceLastupdate != 0) {
+            reserve.variableBorrowIndex = updateCompoundedIndex(
+                reserve.variableBorrowIndex,
+                reserve.variableBorrowRate,
+                secondsSinceLastupdate
+            );
+            reserve.supplyIndex = updateIndex(
+                reserve.supplyIndex,
+                reserve.liquidityRate,
+                secondsSinceLastupdate
+            );
+        }
+
+        reserve.totalBorrowed = wmul(
+            IDebtToken(reserve.debtToken).scaledTotalSupply(),
+            reserve.variableBorrowIndex
+        );
+        reserve.totalDeposited =
+            IERC20(_underlyingAsset).balanceOf(reserve.xToken) +
+            reserve.totalBorrowed;
+        reserve.utilizationRate = updateUtilizationRate(
+            reserve.totalDeposited,
+            reserve.totalBorrowed
+        );
+        reserve.variableBorrowRate = IInterestRateStrategy(
+            reserve.interestRateStrategy
+        ).calculateVariableBorrowRate(reserve.utilizationRate);
+        reserve.liquidityRate = wmul(
+            reserve.variableBorrowRate,
+            reserve.utilizationRate
+        );
+        reserve.lastUpdateTime = block.timestamp;
+
+        unpackedReserves[_underlyingAsset] = reserve;
+
+        emit ReserveDataUpdated(
+            _underlyingAsset,
+            reserve.utilizationRate,
+            reserve.liquidityRate,
+            reserve.variableBorrowRate,
+            reserve.supplyIndex,
+            reserve.variableBorrowIndex
+        );
+    }
+
+    // runs two updates in the same block, the second one takes the same block fast path
+    function _updateStateTwice(address _underlyingAsset) public {
+        updateState(_underlyingAsset);
+        updateState(_underlyingAsset);
     }
 }
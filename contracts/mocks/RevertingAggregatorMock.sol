@@ -0,0 +1,21 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.12;
+
+contract RevertingAggregatorMock {
+    uint8 public constant decimals = 8;
+
+    // a paused or deprecated feed, its rounds can not be read
+    function latestRoundData()
+        external
+        pure
+        returns (
+            uint80,
+            int256,
+            uint256,
+            uint256,
+            uint80
+        )
+    {
+        revert("feed unavailable");
+    }
+}
@@ -0,0 +1,11 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.12;
+
+import "@openzeppelin/contracts/token/ERC20/IERC20.sol";
+
+contract XTokenHolderMock {
+    // the balance is read and transferred in the same transaction, so at the same supply index
+    function transferWholeBalance(address _xToken, address _to) external {
+        IERC20(_xToken).transfer(_to, IERC20(_xToken).balanceOf(address(this)));
+    }
+}
@@ -1,9 +1,10 @@
 pragma solidity ^0.8.12;
 
 import "@openzeppelin/contracts/token/ERC20/ERC20.sol";
+import "@openzeppelin/contracts/token/ERC20/extensions/draft-ERC20Permit.sol";
 
-contract MockDai is ERC20 {
-    constructor() public ERC20("Mock DAI", "DAI") {
+contract MockDai is ERC20, ERC20Permit {
+    constructor() public ERC20("Mock DAI", "DAI") ERC20Permit("Mock DAI") {
         _mint(msg.sender, 100000 * 10**18);
     }
 }
@@ -0,0 +1,13 @@
+pragma solidity ^0.8.12;
+
+import "@openzeppelin/contracts/token/ERC20/ERC20.sol";
+
+contract MockUSDC is ERC20 {
+    constructor() public ERC20("Mock USDC", "USDC") {
+        _mint(msg.sender, 100000 * 10**6);
+    }
+
+    function decimals() public pure override returns (uint8) {
+        return 6;
+    }
+}
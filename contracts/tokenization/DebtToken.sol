@@ -2,6 +2,7 @@
 pragma solidity ^0.8.12;
 import "@openzeppelin/contracts/token/ERC20/ERC20.sol";
 import "@openzeppelin/contracts/token/ERC20/IERC20.sol";
+import "@openzeppelin/contracts/proxy/utils/Initializable.sol";
 
 import "./../ReservesManager.sol";
 
@@ -13,47 +14,98 @@ import "@ds-math/src/math.sol";
  * @dev     . Implements a debt token to track the borrowing positions of users
  */
 
-contract DebtToken is ERC20, DSMath {
-    address public poolAddress;
-    address public underlyingAsset;
+contract DebtToken is ERC20, DSMath, Initializable {
+    // shared by every clone of the implementation, they are part of its code
+    address public immutable poolAddress;
+    ReservesManager public immutable reservesManager;
 
-    ReservesManager public reservesManager;
+    address public underlyingAsset;
+    string internal tokenName;
+    string internal tokenSymbol;
 
     modifier onlyPool() {
         require(_msgSender() == poolAddress, "caller must be pool");
         _;
     }
 
-    constructor(
+    /**
+     * @dev     . deploys the implementation cloned by the PoolConfiguration for every reserve, it can not be initialized itself
+     * @param   _poolAddress  . the address of the Pool
+     * @param   _reservesManagerAddress  . the address of the ReservesManager
+     */
+    constructor(address _poolAddress, address _reservesManagerAddress)
+        ERC20("", "")
+    {
+        poolAddress = _poolAddress;
+        reservesManager = ReservesManager(_reservesManagerAddress);
+
+        _disableInitializers();
+    }
+
+    /**
+     * @dev     . initializes a clone of the implementation for a reserve, called once by the PoolConfiguration
+     * @param   _name  . the name of the token
+     * @param   _symbol  . the symbol of the token
+     * @param   _underlyingAsset  . the address of the underlying asset of the reserve
+     */
+    function initialize(
         string memory _name,
         string memory _symbol,
-        address _underlyingAsset,
-        address _poolAddress,
-        address _reservesManagerAddress
-    ) ERC20(_name, _symbol) {
-        poolAddress = _poolAddress;
+        address _underlyingAsset
+    ) external initializer {
+        tokenName = _name;
+        tokenSymbol = _symbol;
         underlyingAsset = _underlyingAsset;
-        reservesManager = ReservesManager(_reservesManagerAddress);
+    }
+
+    function name() public view virtual override returns (string memory) {
+        return tokenName;
+    }
+
+    function symbol() public view virtual override returns (string memory) {
+        return tokenSymbol;
     }
 
     /**
-     * @dev     . Mints debt token to the borrower address
+     * @dev     . Mints debt token to the borrower address, the balance is stored scaled by the variable borrow index
      * -  Only callable by the Pool
      * @param   _account  . borrower address
      * @param   _amount  . amount to mint
      */
     function mint(address _account, uint256 _amount) external onlyPool {
-        super._mint(_account, _amount);
+        super._mint(
+            _account,
+            wdiv(
+                _amount,
+                reservesManager.getVariableBorrowIndexSinceLastUpdate(
+                    underlyingAsset
+                )
+            )
+        );
     }
 
     /**
-     * @dev     . Burns user variable debt
+     * @dev     . Burns user variable debt, the amount is scaled by the variable borrow index
      * - Only callable by the Pool
      * @param   _account  . The user whose debt is getting burned
      * @param   _amount  . The amount getting burned
      */
     function burn(address _account, uint256 _amount) external onlyPool {
-        super._burn(_account, _amount);
+        uint256 index = reservesManager.getVariableBorrowIndexSinceLastUpdate(
+            underlyingAsset
+        );
+        uint256 scaledBalance = super.balanceOf(_account);
+        uint256 amountScaled = wdiv(_amount, index);
+
+        // rounding can make the scaled amount of a whole debt exceed it by 1 wei
+        if (
+            amountScaled > scaledBalance &&
+            _amount <= wmul(scaledBalance, index)
+        ) {
+            amountScaled = scaledBalance;
+        }
+
+        super._burn(_account, amountScaled);
     }
 
     /**
@@ -153,4 +205,56 @@ contract DebtToken is ERC20, DSMath {
                 )
             );
     }
+
+    /**
+     * @dev     . Calculates the total supply : the scaled total supply multiplied by the variable borrow index
+     * @return  uint256  . The total supply, interests included
+     */
+    function totalSupply() public view virtual override returns (uint256) {
+        uint256 scaledSupply = super.totalSupply();
+
+        if (scaledSupply == 0) {
+            return 0;
+        }
+
+        return
+            wmul(
+                scaledSupply,
+                reservesManager.getVariableBorrowIndexSinceLastUpdate(
+                    underlyingAsset
+                )
+            );
+    }
+
+    /**
+     * @dev     . Returns the scaled debt of the user : the principal divided by the variable borrow index
+     * at the time of each mint / burn
+     * @param   _user  . The user whose scaled debt is returned
+     * @return  uint256  . The scaled debt of the user
+     */
+    function scaledBalanceOf(address _user) external view returns (uint256) {
+        return super.balanceOf(_user);
+    }
+
+    /**
+     * @dev     . Returns the sum of all the scaled debts
+     * @return  uint256  . The scaled total supply
+     */
+    function scaledTotalSupply() public view returns (uint256) {
+        return super.totalSupply();
+    }
+
+    /**
+     * @dev     . Returns the scaled debt of the user and the scaled total supply
+     * @param   _user  . The address of the user
+     * @return  uint256  . The scaled debt of the user
+     * @return  uint256  . The scaled total supply
+     */
+    function getScaledUserBalanceAndSupply(address _user)
+        external
+        view
+        returns (uint256, uint256)
+    {
+        return (super.balanceOf(_user), super.totalSupply());
+    }
 }
@@ -2,8 +2,10 @@
 pragma solidity ^0.8.12;
 import "@openzeppelin/contracts/token/ERC20/ERC20.sol";
 import "@openzeppelin/contracts/token/ERC20/IERC20.sol";
+import "@openzeppelin/contracts/proxy/utils/Initializable.sol";
 
 import "./../ReservesManager.sol";
+import "../../interfaces/IPool.sol";
 
 import "@ds-math/src/math.sol";
 
@@ -13,47 +15,110 @@ import "@ds-math/src/math.sol";
  * @dev     . Implements a x token to track the supplying positions of users
  */
 
-contract XToken is ERC20, DSMath {
-    address public poolAddress;
-    address public underlyingAsset;
+contract XToken is ERC20, DSMath, Initializable {
+    // shared by every clone of the implementation, they are part of its code
+    address public immutable poolAddress;
+    ReservesManager public immutable reservesManager;
 
-    ReservesManager public reservesManager;
+    address public underlyingAsset;
+    string internal tokenName;
+    string internal tokenSymbol;
 
     modifier onlyPool() {
         require(_msgSender() == poolAddress, "caller must be pool");
         _;
     }
 
-    constructor(
+    /**
+     * @dev     . deploys the implementation cloned by the PoolConfiguration for every reserve, it can not be initialized itself
+     * @param   _poolAddress  . the address of the Pool
+     * @param   _reservesManagerAddress  . the address of the ReservesManager
+     */
+    constructor(address _poolAddress, address _reservesManagerAddress)
+        ERC20("", "")
+    {
+        poolAddress = _poolAddress;
+        reservesManager = ReservesManager(_reservesManagerAddress);
+
+        _disableInitializers();
+    }
+
+    /**
+     * @dev     . initializes a clone of the implementation for a reserve, called once by the PoolConfiguration
+     * @param   _name  . the name of the token
+     * @param   _symbol  . the symbol of the token
+     * @param   _underlyingAsset  . the address of the underlying asset of the reserve
+     */
+    function initialize(
         string memory _name,
         string memory _symbol,
-        address _underlyingAsset,
-        address _poolAddress,
-        address _reservesManagerAddress
-    ) ERC20(_name, _symbol) {
-        poolAddress = _poolAddress;
+        address _underlyingAsset
+    ) external initializer {
+        tokenName = _name;
+        tokenSymbol = _symbol;
         underlyingAsset = _underlyingAsset;
-        reservesManager = ReservesManager(_reservesManagerAddress);
+    }
+
+    function name() public view virtual override returns (string memory) {
+        return tokenName;
+    }
+
+    function symbol() public view virtual override returns (string memory) {
+        return tokenSymbol;
     }
 
     /**
-     * @dev     . Mints `amount` xTokens to `user`
+     * @dev     . Mints `amount` xTokens to `user`, the balance is stored scaled by the supply index
      * - Only callable by the Pool
      * @param   _account  . The address receiving the minted tokens
      * @param   _amount  . The amount of tokens getting minted
      */
     function mint(address _account, uint256 _amount) external onlyPool {
-        super._mint(_account, _amount);
+        super._mint(
+            _account,
+            wdiv(
+                _amount,
+                reservesManager.getSupplyIndexSinceLastUpdate(underlyingAsset)
+            )
+        );
     }
 
     /**
-     * @dev     . Burns xTokens from `user`
+     * @dev     . Burns xTokens from `user`, the amount is scaled by the supply index
      * -  Only callable by the Pool
      * @param   _account  . The owner of the xTokens, getting them burned
      * @param   _amount  . The amount being burned
      */
     function burn(address _account, uint256 _amount) external onlyPool {
-        super._burn(_account, _amount);
+        super._burn(_account, getScaledAmount(_account, _amount));
+    }
+
+    /**
+     * @dev     . scales an amount taken from the balance of `_account` by the supply index
+     * @param   _account  . The owner of the xTokens
+     * @param   _amount  . The amount taken from its balance
+     * @return  uint256  . The scaled amount
+     */
+    function getScaledAmount(address _account, uint256 _amount)
+        internal
+        view
+        returns (uint256)
+    {
+        uint256 index = reservesManager.getSupplyIndexSinceLastUpdate(
+            underlyingAsset
+        );
+        uint256 scaledBalance = super.balanceOf(_account);
+        uint256 amountScaled = wdiv(_amount, index);
+
+        // rounding can make the scaled amount of a whole balance exceed it by 1 wei
+        if (
+            amountScaled > scaledBalance &&
+            _amount <= wmul(scaledBalance, index)
+        ) {
+            amountScaled = scaledBalance;
+        }
+
+        return amountScaled;
     }
 
     function transferUnderlyingAssetTo(address _account, uint256 _amount)
@@ -87,4 +152,77 @@ contract XToken is ERC20, DSMath {
                 reservesManager.getSupplyIndexSinceLastUpdate(underlyingAsset)
             );
     }
+
+    /**
+     * @dev     . Calculates the total supply : the scaled total supply multiplied by the supply index
+     * @return  uint256  . The total supply, interests included
+     */
+    function totalSupply() public view virtual override returns (uint256) {
+        uint256 scaledSupply = super.totalSupply();
+
+        if (scaledSupply == 0) {
+            return 0;
+        }
+
+        return
+            wmul(
+                scaledSupply,
+                reservesManager.getSupplyIndexSinceLastUpdate(underlyingAsset)
+            );
+    }
+
+    /**
+     * @dev     . Returns the scaled balance of the user : the principal divided by the supply index
+     * at the time of each mint / burn
+     * @param   _user  . The user whose scaled balance is returned
+     * @return  uint256  . The scaled balance of the user
+     */
+    function scaledBalanceOf(address _user) external view returns (uint256) {
+        return super.balanceOf(_user);
+    }
+
+    /**
+     * @dev     . Returns the sum of all the scaled balances
+     * @return  uint256  . The scaled total supply
+     */
+    function scaledTotalSupply() public view returns (uint256) {
+        return super.totalSupply();
+    }
+
+    /**
+     * @dev     . Returns the scaled balance of the user and the scaled total supply
+     * @param   _user  . The address of the user
+     * @return  uint256  . The scaled balance of the user
+     * @return  uint256  . The scaled total supply
+     */
+    function getScaledUserBalanceAndSupply(address _user)
+        external
+        view
+        returns (uint256, uint256)
+    {
+        return (super.balanceOf(_user), super.totalSupply());
+    }
+
+    /**
+     * @dev     . Moves `amount` xTokens, the amount is scaled by the supply index . The Pool flags the reserve
+     *            as supplied by the recipient so its account wide calculations count the received balance, clears
+     *            it for the sender once its balance is empty, and reverts if the sender's debts are left uncovered
+     * @param   _from  . The source address
+     * @param   _to  . The destination address
+     * @param   _amount  . The amount getting transferred
+     */
+    function _transfer(
+        address _from,
+        address _to,
+        uint256 _amount
+    ) internal virtual override {
+        super._transfer(_from, _to, getScaledAmount(_from, _amount));
+
+        IPool(poolAddress).finalizeTransfer(
+            underlyingAsset,
+            _from,
+            _to,
+            _amount
+        );
+    }
 }
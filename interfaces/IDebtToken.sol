@@ -7,7 +7,12 @@ interface IDebtToken is IERC20 {
 
     function burn(address _account, uint256 _amount) external;
 
-    function getTotalBorrowed() external view returns (uint256);
+    function scaledBalanceOf(address _user) external view returns (uint256);
 
-    function setTotalBorrowed(uint256 _totalBorrowed) external;
+    function scaledTotalSupply() external view returns (uint256);
+
+    function getScaledUserBalanceAndSupply(address _user)
+        external
+        view
+        returns (uint256, uint256);
 }
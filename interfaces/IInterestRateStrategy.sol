@@ -0,0 +1,9 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.12;
+
+interface IInterestRateStrategy {
+    function calculateVariableBorrowRate(uint256 _utilizationRate)
+        external
+        view
+        returns (uint256);
+}
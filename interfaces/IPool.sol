@@ -0,0 +1,25 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.12;
+
+import {DataTypes} from "../contracts/libraries/DataTypes.sol";
+
+interface IPool {
+    function userConfigurations(address _user) external view returns (uint256);
+
+    function getReserveComponents(address _underlyingAsset)
+        external
+        view
+        returns (DataTypes.ReserveComponents memory);
+
+    function getReserveComponentsById(uint256 _reserveId)
+        external
+        view
+        returns (DataTypes.ReserveComponents memory);
+
+    function finalizeTransfer(
+        address _asset,
+        address _from,
+        address _to,
+        uint256 _amount
+    ) external;
+}
@@ -10,7 +10,12 @@ interface IXToken is IERC20 {
     function transferUnderlyingAssetTo(address _account, uint256 _amount)
         external;
 
-    function getTotalDeposited() external view returns (uint256);
+    function scaledBalanceOf(address _user) external view returns (uint256);
 
-    function setTotalDeposited(uint256 _totalDeposited) external;
+    function scaledTotalSupply() external view returns (uint256);
+
+    function getScaledUserBalanceAndSupply(address _user)
+        external
+        view
+        returns (uint256, uint256);
 }
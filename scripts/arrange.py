@@ -1,50 +1,36 @@
-from brownie import (
-    Pool,
-    config,
-    network,
-    PoolConfiguration,
-    PoolLogic,
-    ReservesManager,
-    MockDai,
-    Contract,
-)
-from web3 import Web3
-from scripts.utils import get_account
+from brownie import config, network
+from scripts.deploy_addresses_provider import deploy_addresses_provider
 from scripts.deploy_pool import deploy_pool
-from scripts.deploy_pool_configuration import (
-    deploy_pool_configuration,
-    add_dai_token,
-    add_link_token,
-)
+from scripts.deploy_pool_configuration import deploy_pool_configuration
 from scripts.deploy_pool_logic import deploy_pool_logic
 from scripts.deploy_reserves_manager import deploy_reserves_manager
 from scripts.deploy_mock_dai import deploy_mock_dai
+from scripts.list_reserves import list_reserves
 
 
 def main():
 
-    # account
-    account = get_account()
+    # deploy contracts, the protocol ones right after the registry and in its order : each of
+    # them reads the addresses of its peers from it
+    addresses_provider = deploy_addresses_provider()
+    check_address(deploy_pool(), addresses_provider.getPool())
+    check_address(
+        deploy_pool_configuration(), addresses_provider.getPoolConfiguration()
+    )
+    check_address(deploy_pool_logic(), addresses_provider.getPoolLogic())
+    check_address(deploy_reserves_manager(), addresses_provider.getReservesManager())
+    deploy_mock_dai()
 
-    # deploy contracts
-    pool = deploy_pool()
-    pool_configuration = deploy_pool_configuration()
-    pool_logic = deploy_pool_logic()
-    reserves_manager = deploy_reserves_manager()
-    mock_dai = deploy_mock_dai()
+    # add the tokens of the network manifest, their interest rate strategies are deployed with them
+    list_reserves(config["networks"][network.show_active()]["reserves"])
 
-    # set addresses
-    pool.setPoolConfigurationAddress(
-        pool_configuration, {"from": account, "priority_fee": "2 gwei"}
-    )
-    pool.setPoolLogicAddress(pool_logic, {"from": account, "priority_fee": "2 gwei"})
-    pool.setReservesManagerAddress(
-        reserves_manager, {"from": account, "priority_fee": "2 gwei"}
-    )
-    pool_configuration.setReserveManagerContract(
-        reserves_manager, {"from": account, "priority_fee": "2 gwei"}
-    )
 
-    # add tokens
-    add_dai_token()
-    add_link_token()
+def check_address(contract, registered_address):
+    """
+    stops the deployment when a contract is not at the address the registry predicted for it, e.g.
+    when another transaction of the account was mined in between
+    """
+    if contract.address != registered_address:
+        raise RuntimeError(
+            f"deployed at {contract.address} instead of {registered_address}"
+        )
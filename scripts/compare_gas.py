@@ -0,0 +1,61 @@
+"""
+Compares a gas report written by `tests/benchmarks` against a baseline one .
+
+    python scripts/compare_gas.py <baseline.json> [<report.json>] [--threshold <percent>]
+
+Exits with status 1 when any path uses more than `threshold` percent gas than in the baseline .
+"""
+import argparse
+import json
+import sys
+
+DEFAULT_REPORT_PATH = "reports/gas_benchmarks.json"
+DEFAULT_THRESHOLD = 2.0
+
+
+def load_report(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def compare(baseline, report, threshold=DEFAULT_THRESHOLD):
+    """
+    returns the (path, baseline gas, reported gas, change in percent) of every regressed path
+    """
+    regressions = []
+    for path, baseline_gas in sorted(baseline.items()):
+        if path not in report:
+            continue
+        change = (report[path] - baseline_gas) * 100 / baseline_gas
+        if change > threshold:
+            regressions.append((path, baseline_gas, report[path], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("report", nargs="?", default=DEFAULT_REPORT_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    baseline = load_report(args.baseline)
+    report = load_report(args.report)
+
+    for path in sorted(set(report) - set(baseline)):
+        print(f"new path {path} : {report[path]}")
+    for path in sorted(set(baseline) - set(report)):
+        print(f"missing path {path}")
+
+    regressions = compare(baseline, report, args.threshold)
+    for path, baseline_gas, gas, change in regressions:
+        print(f"{path} : {baseline_gas} -> {gas} (+{change:.2f}%)")
+    if regressions:
+        print(f"{len(regressions)} path(s) regressed by more than {args.threshold}%")
+        return 1
+    print("no gas regression")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
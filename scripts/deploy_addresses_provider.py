@@ -0,0 +1,28 @@
+from scripts.utils import get_account, get_contract_address
+from brownie import AddressesProvider, config, network
+
+account = get_account()
+
+
+def main():
+    deploy_addresses_provider()
+
+
+def deploy_addresses_provider():
+    """
+    deploys the registry with the addresses of the next four contracts deployed by the account, which
+    must be Pool, PoolConfiguration, PoolLogic and ReservesManager in this order
+    """
+    nonce = account.nonce
+    pool, pool_configuration, pool_logic, reserves_manager = [
+        get_contract_address(account, nonce + offset) for offset in range(1, 5)
+    ]
+    addresses_provider = AddressesProvider.deploy(
+        pool,
+        pool_configuration,
+        pool_logic,
+        reserves_manager,
+        {"from": account, "priority_fee": "2 gwei"},
+        publish_source=config["networks"][network.show_active()].get("verify"),
+    )
+    return addresses_provider
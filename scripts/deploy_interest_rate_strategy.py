@@ -0,0 +1,25 @@
+from scripts.utils import get_account
+from brownie import DefaultInterestRateStrategy, config, network
+from web3 import Web3
+
+account = get_account()
+
+
+def main():
+    deploy_interest_rate_strategy()
+
+
+def deploy_interest_rate_strategy():
+    optimal_utilization_rate = Web3.toWei(0.8, "ether")
+    base_variable_borrow_rate = Web3.toWei(0, "ether")
+    variable_rate_slope_1 = Web3.toWei(0.04, "ether")
+    variable_rate_slope_2 = Web3.toWei(0.75, "ether")
+    interest_rate_strategy = DefaultInterestRateStrategy.deploy(
+        optimal_utilization_rate,
+        base_variable_borrow_rate,
+        variable_rate_slope_1,
+        variable_rate_slope_2,
+        {"from": account, "priority_fee": "2 gwei"},
+        publish_source=config["networks"][network.show_active()].get("verify"),
+    )
+    return interest_rate_strategy
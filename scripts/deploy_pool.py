@@ -1,16 +1,18 @@
-from scripts.utils import get_account
+from scripts.utils import get_account, sign_permit
 from brownie import (
+    AddressesProvider,
     Pool,
     config,
     network,
-    PoolConfiguration,
-    PoolLogic,
-    ReservesManager,
     MockDai,
     Contract,
+    chain,
 )
 from web3 import Web3
 
+# validity of the permits signed for supply and repay, in seconds
+PERMIT_VALIDITY = 3600
+
 account = get_account()
 
 
@@ -20,6 +22,7 @@ def main():
 
 def deploy_pool():
     pool = Pool.deploy(
+        AddressesProvider[-1],
         {"from": account},
         publish_source=config["networks"][network.show_active()].get("verify"),
     )
@@ -27,40 +30,24 @@ def deploy_pool():
     return pool
 
 
-def set_pool_configuration_address():
-    pool_configuration = PoolConfiguration[-1]
-    pool = Pool[-1]
-    pool.setPoolConfigurationAddress(
-        pool_configuration, {"from": account, "priority_fee": "2 gwei"}
-    )
-
-
-def set_pool_logic_address():
-    pool_logic = PoolLogic[-1]
-    pool = Pool[-1]
-    pool.setPoolLogicAddress(pool_logic, {"from": account, "priority_fee": "2 gwei"})
-
-
-def set_reserves_manager_address():
-    reserves_manager = ReservesManager[-1]
-    pool = Pool[-1]
-    pool.setReservesManagerAddress(
-        reserves_manager, {"from": account, "priority_fee": "2 gwei"}
-    )
-
-
 def supply_dai():
-    account_1 = get_account()
-    account_2 = get_account(num=2)
     pool = Pool[-1]
     dai = MockDai[-1]
     amount_to_supply = Web3.toWei(1000, "ether")
-    dai.approve(pool, amount_to_supply, {"from": account, "priority_fee": "2 gwei"})
-    pool.supply(dai, amount_to_supply, {"from": account, "priority_fee": "2 gwei"})
+    deadline = chain.time() + PERMIT_VALIDITY
+    v, r, s = sign_permit(dai, account, pool, amount_to_supply, deadline)
+    pool.supplyWithPermit(
+        dai,
+        amount_to_supply,
+        deadline,
+        v,
+        r,
+        s,
+        {"from": account, "priority_fee": "2 gwei"},
+    )
 
 
 def supply_link():
-    account_1 = get_account()
     account_2 = get_account(num=2)
     pool = Pool[-1]
     link_address = config["networks"][network.show_active()].get("link_token")
@@ -75,22 +62,20 @@ def supply_link():
 
 
 def borrow():
-    account_1 = get_account()
     account_2 = get_account(num=2)
     pool = Pool[-1]
     dai = MockDai[-1]
-    link_address = config["networks"][network.show_active()].get("link_token")
-    link_contract = Contract.from_explorer(link_address)
     amount_to_borrow = Web3.toWei(10, "ether")
-    tx = pool.borrow(dai, amount_to_borrow, link_address, {"from": account_2})
+    pool.borrow(dai, amount_to_borrow, {"from": account_2})
 
 
 def repay():
     account_2 = get_account(num=2)
     pool = Pool[-1]
     dai = MockDai[-1]
-    link_address = config["networks"][network.show_active()].get("link_token")
-    link_contract = Contract.from_explorer(link_address)
     amount_to_repay = Web3.toWei(10, "ether")
-    dai.approve(pool, amount_to_repay, {"from": account_2, "priority_fee": "2 gwei"})
-    tx = pool.repay(dai, amount_to_repay, {"from": account_2})
+    deadline = chain.time() + PERMIT_VALIDITY
+    v, r, s = sign_permit(dai, account_2, pool, amount_to_repay, deadline)
+    pool.repayWithPermit(
+        dai, amount_to_repay, deadline, v, r, s, {"from": account_2}
+    )
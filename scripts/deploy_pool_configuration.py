@@ -1,6 +1,14 @@
 from scripts.utils import get_account
-from brownie import PoolConfiguration, Pool, config, network, ReservesManager, MockDai
-from web3 import Web3
+from brownie import (
+    AddressesProvider,
+    PoolConfiguration,
+    Pool,
+    config,
+    network,
+    ReservesManager,
+    MockDai,
+    DefaultInterestRateStrategy,
+)
 
 account = get_account()
 
@@ -10,23 +18,14 @@ def main():
 
 
 def deploy_pool_configuration():
-    pool = Pool[-1]
     pool_configuration = PoolConfiguration.deploy(
-        pool,
+        AddressesProvider[-1],
         {"from": account, "priority_fee": "2 gwei"},
         publish_source=config["networks"][network.show_active()].get("verify"),
     )
     return pool_configuration
 
 
-def set_reserves_manager_contract():
-    reserves_manager = ReservesManager[-1]
-    pool_configuration = PoolConfiguration[-1]
-    pool_configuration.setReserveManagerContract(
-        reserves_manager, {"from": account, "priority_fee": "2 gwei"}
-    )
-
-
 def add_dai_token():
     pool_configuration = PoolConfiguration[-1]
     name = "DAI"
@@ -36,16 +35,14 @@ def add_dai_token():
         "dai_usd_price_feed"
     )
     decimals = 18
-    base_variable_borrow_rate = Web3.toWei(0, "ether")
-    interest_rate_slope = Web3.toWei(5, "ether")
+    interest_rate_strategy = DefaultInterestRateStrategy[-1]
     pool_configuration.addToken(
         name,
         symbol,
         underlying_asset,
         price_feed_address,
         decimals,
-        base_variable_borrow_rate,
-        interest_rate_slope,
+        interest_rate_strategy,
         {"from": account, "priority_fee": "2 gwei"},
     )
 
@@ -59,15 +56,13 @@ def add_link_token():
         "link_usd_price_feed"
     )
     decimals = 18
-    base_variable_borrow_rate = Web3.toWei(0, "ether")
-    interest_rate_slope = Web3.toWei(5, "ether")
+    interest_rate_strategy = DefaultInterestRateStrategy[-1]
     pool_configuration.addToken(
         name,
         symbol,
         underlying_asset,
         price_feed_address,
         decimals,
-        base_variable_borrow_rate,
-        interest_rate_slope,
+        interest_rate_strategy,
         {"from": account, "priority_fee": "2 gwei"},
     )
@@ -1,5 +1,5 @@
 from scripts.utils import get_account
-from brownie import PoolConfiguration, PoolLogic, config, network, MockDai, Contract
+from brownie import AddressesProvider, PoolLogic, config, network, MockDai, Contract
 from web3 import Web3
 
 account = get_account()
@@ -11,9 +11,8 @@ def main():
 
 
 def deploy_pool_logic():
-    pool_configuration = PoolConfiguration[-1]
     pool_logic = PoolLogic.deploy(
-        pool_configuration,
+        AddressesProvider[-1],
         {"from": account, "priority_fee": "2 gwei"},
         publish_source=config["networks"][network.show_active()].get("verify"),
     )
@@ -23,10 +22,8 @@ def deploy_pool_logic():
 def validate_borrow():
     pool_logic = PoolLogic[-1]
     dai = MockDai[-1]
-    link_address = config["networks"][network.show_active()].get("link_token")
-    link_contract = Contract.from_explorer(link_address)
     amount = Web3.toWei(100, "ether")
-    pool_logic.validateBorrow(account_2, dai, amount, link_address)
+    print(pool_logic.validateBorrow(account_2, dai, amount))
 
 
 def get_user_balance_in_usd():
@@ -42,3 +39,15 @@ def get_amount_in_usd():
     link_address = config["networks"][network.show_active()].get("link_token")
     amount = Web3.toWei(10, "ether")
     print(pool_logic.getAmountInUSD(amount, link_address))
+
+
+def get_user_account_data():
+    pool_logic = PoolLogic[-1]
+    (
+        total_collateral_in_usd,
+        total_debt_in_usd,
+        available_borrows_in_usd,
+        health_factor,
+    ) = pool_logic.getUserAccountData(account_2)
+    print(total_collateral_in_usd, total_debt_in_usd)
+    print(available_borrows_in_usd, health_factor)
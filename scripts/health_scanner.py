@@ -0,0 +1,168 @@
+"""
+Scanner ranking the users liquidatable through `Pool.liquidationCall` .
+
+Positions are read in bulk from the SQLite store of `scripts/indexer.py` as scaled xToken and debt
+token balances, each price oracle and each index are queried once per scan, and the check of
+`PoolLogic.validateLiquidation` is evaluated for every user at once on NumPy object arrays : the
+balances and debts of a user are summed in USD over all its reserves, a user is liquidatable once
+its debts exceed its balances at the liquidation threshold, and the elements stay python ints so
+the amounts match the contract ones exactly .
+
+    brownie run scripts/health_scanner.py
+"""
+import sqlite3
+from collections import namedtuple
+
+from brownie import Contract, PoolConfiguration, PriceOracle, ReservesManager
+
+from scripts.indexer import DATABASE_PATH
+from scripts.reserve_math import HALF_WAD, WAD
+
+# `PoolLogic.liquidationThreshold`, in basis points
+LIQUIDATION_THRESHOLD = 8500
+
+Account = namedtuple(
+    "Account",
+    [
+        "user",
+        "collateral_in_usd",
+        "debt_in_usd",
+        "undercollateralized_amount_in_usd",
+    ],
+)
+
+
+def main():
+    connection = sqlite3.connect(DATABASE_PATH)
+    positions = load_positions(connection)
+    connection.close()
+
+    assets = set(positions["asset"])
+    reserves_manager = ReservesManager[-1]
+    for account in scan(
+        positions,
+        fetch_prices(PoolConfiguration[-1], assets),
+        fetch_supply_indexes(reserves_manager, assets),
+        fetch_variable_borrow_indexes(reserves_manager, assets),
+    ):
+        print(
+            f"{account.user} : {account.undercollateralized_amount_in_usd} USD undercollateralized"
+        )
+
+
+def load_positions(connection):
+    """
+    loads every open position from the indexer store as columns : the user, the asset, the scaled
+    xToken balance and the scaled debt token balance
+    """
+    rows = connection.execute(
+        "SELECT user, underlying_asset, scaled_x_balance, scaled_debt_balance "
+        "FROM positions WHERE scaled_x_balance != '0' OR scaled_debt_balance != '0'"
+    ).fetchall()
+    users, assets, balances, debts = zip(*rows) if rows else ((), (), (), ())
+    return {
+        "user": list(users),
+        "asset": list(assets),
+        "scaled_balance": [int(balance) for balance in balances],
+        "scaled_debt": [int(debt) for debt in debts],
+    }
+
+
+def fetch_prices(pool_configuration, assets):
+    """
+    reads the unit price of each asset once, as computed by `PoolLogic.getAssetPrice` : the price
+    of its oracle times the decimals scale of the token
+    """
+    prices = {}
+    for asset in assets:
+        price_oracle_address, decimals_scale = (
+            pool_configuration.getPriceOracleAndDecimalsScale(asset)
+        )
+        price_oracle = Contract.from_abi(
+            "PriceOracle", price_oracle_address, PriceOracle.abi
+        )
+        prices[asset] = price_oracle.getLatestPrice() * decimals_scale
+    return prices
+
+
+def fetch_supply_indexes(reserves_manager, assets):
+    """
+    reads the current supply index of each asset once, the xToken balance of a user is the scaled
+    balance multiplied by it
+    """
+    return {
+        asset: reserves_manager.getSupplyIndexSinceLastUpdate(asset) for asset in assets
+    }
+
+
+def fetch_variable_borrow_indexes(reserves_manager, assets):
+    """
+    reads the current variable borrow index of each asset once, the debt token balance of a user
+    is the scaled balance multiplied by it
+    """
+    return {
+        asset: reserves_manager.getVariableBorrowIndexSinceLastUpdate(asset)
+        for asset in assets
+    }
+
+
+def _object_array(values):
+    import numpy as np
+
+    array = np.empty(len(values), dtype=object)
+    array[:] = [int(value) for value in values]
+    return array
+
+
+def _wmul(x, y):
+    return (x * y + HALF_WAD) // WAD
+
+
+def scan(positions, prices, supply_indexes, variable_borrow_indexes):
+    """
+    returns the liquidatable users, the most undercollateralized first : the most debt in USD above
+    the liquidation threshold
+    """
+    import numpy as np
+
+    assets = positions["asset"]
+    asset_prices = _object_array([prices[asset] for asset in assets])
+
+    # XToken.balanceOf and DebtToken.balanceOf : wmul(scaled balance, index)
+    balances = _wmul(
+        _object_array(positions["scaled_balance"]),
+        _object_array([supply_indexes[asset] for asset in assets]),
+    )
+    debts = _wmul(
+        _object_array(positions["scaled_debt"]),
+        _object_array([variable_borrow_indexes[asset] for asset in assets]),
+    )
+
+    # each reserve is priced with wmul before the sum, as in PoolLogic.calculateAccountData
+    users, user_indexes = np.unique(
+        np.array(positions["user"], dtype=object), return_inverse=True
+    )
+    collateral_in_usd = _object_array([0] * len(users))
+    debt_in_usd = _object_array([0] * len(users))
+    np.add.at(collateral_in_usd, user_indexes, _wmul(balances, asset_prices))
+    np.add.at(debt_in_usd, user_indexes, _wmul(debts, asset_prices))
+
+    # PoolLogic.getLiquidationThresholdInUSD
+    liquidation_threshold_in_usd = collateral_in_usd // 10000 * LIQUIDATION_THRESHOLD
+    liquidatable = np.flatnonzero(debt_in_usd > liquidation_threshold_in_usd)
+    undercollateralized_in_usd = (
+        debt_in_usd[liquidatable] - liquidation_threshold_in_usd[liquidatable]
+    )
+
+    order = sorted(
+        range(len(liquidatable)), key=lambda i: undercollateralized_in_usd[i], reverse=True
+    )
+    return [
+        Account(
+            users[liquidatable[i]],
+            int(collateral_in_usd[liquidatable[i]]),
+            int(debt_in_usd[liquidatable[i]]),
+            int(undercollateralized_in_usd[i]),
+        )
+        for i in order
+    ]
@@ -0,0 +1,366 @@
+"""
+Event indexer materializing the protocol positions into a local SQLite store .
+
+Logs of the Pool, PoolConfiguration and ReservesManager contracts and the ERC20 Transfer logs of
+every listed xToken / debtToken are streamed in block-range chunks, decoded in batch and upserted
+into per-user, per-reserve rows . Each chunk is written in a single transaction together with the
+checkpoint, so an interrupted sync resumes from the last fully indexed block .
+
+    brownie run scripts/indexer.py
+
+uint256 values are stored as decimal TEXT to stay exact .
+"""
+import sqlite3
+
+from brownie import web3, Pool, PoolConfiguration, ReservesManager, XToken
+from web3 import Web3
+
+DATABASE_PATH = "positions.db"
+CHUNK_SIZE = 2000
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoint (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    block INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tokens (
+    address TEXT PRIMARY KEY,
+    underlying_asset TEXT NOT NULL,
+    kind TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reserves (
+    underlying_asset TEXT PRIMARY KEY,
+    x_token TEXT,
+    debt_token TEXT,
+    price_oracle TEXT,
+    utilization_rate TEXT NOT NULL DEFAULT '0',
+    liquidity_rate TEXT NOT NULL DEFAULT '0',
+    variable_borrow_rate TEXT NOT NULL DEFAULT '0',
+    supply_index TEXT NOT NULL DEFAULT '1000000000000000000',
+    variable_borrow_index TEXT NOT NULL DEFAULT '1000000000000000000',
+    updated_block INTEGER
+);
+CREATE TABLE IF NOT EXISTS positions (
+    user TEXT NOT NULL,
+    underlying_asset TEXT NOT NULL,
+    supplied TEXT NOT NULL DEFAULT '0',
+    scaled_x_balance TEXT NOT NULL DEFAULT '0',
+    scaled_debt_balance TEXT NOT NULL DEFAULT '0',
+    updated_block INTEGER,
+    PRIMARY KEY (user, underlying_asset)
+);
+CREATE TABLE IF NOT EXISTS actions (
+    block INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    user TEXT,
+    underlying_asset TEXT,
+    amount TEXT,
+    collateral TEXT,
+    PRIMARY KEY (block, log_index)
+);
+"""
+
+POSITION_COLUMNS = ("supplied", "scaled_x_balance", "scaled_debt_balance")
+RESERVE_COLUMNS = (
+    "x_token",
+    "debt_token",
+    "price_oracle",
+    "utilization_rate",
+    "liquidity_rate",
+    "variable_borrow_rate",
+    "supply_index",
+    "variable_borrow_index",
+)
+
+
+def main():
+    indexer = PositionIndexer(
+        DATABASE_PATH, Pool[-1], PoolConfiguration[-1], ReservesManager[-1]
+    )
+    indexer.sync()
+    print(f"indexed up to block {indexer.checkpoint()}")
+    indexer.close()
+
+
+def event_decoders(abi):
+    """
+    maps the topic of every event of an abi to a web3 event able to decode its logs
+    """
+    contract = web3.eth.contract(abi=abi)
+    decoders = {}
+    for entry in abi:
+        if entry["type"] != "event":
+            continue
+        signature = f"{entry['name']}({','.join(i['type'] for i in entry['inputs'])})"
+        decoders[Web3.keccak(text=signature).hex()] = contract.events[entry["name"]]()
+    return decoders
+
+
+class PositionIndexer:
+    def __init__(
+        self,
+        database_path,
+        pool,
+        pool_configuration,
+        reserves_manager,
+        chunk_size=CHUNK_SIZE,
+        start_block=0,
+    ):
+        self.connection = sqlite3.connect(database_path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+        self.pool = pool.address
+        self.pool_configuration = pool_configuration.address
+        self.reserves_manager = reserves_manager.address
+        self.chunk_size = chunk_size
+        self.start_block = start_block
+
+        self.decoders = {
+            self.pool: event_decoders(pool.abi),
+            self.pool_configuration: event_decoders(pool_configuration.abi),
+            self.reserves_manager: event_decoders(reserves_manager.abi),
+        }
+        self.token_decoders = event_decoders(XToken.abi)
+        self.tokens = dict(
+            (address, (underlying_asset, kind))
+            for address, underlying_asset, kind in self.connection.execute(
+                "SELECT address, underlying_asset, kind FROM tokens"
+            )
+        )
+
+    def close(self):
+        self.connection.close()
+
+    def checkpoint(self):
+        row = self.connection.execute(
+            "SELECT block FROM checkpoint WHERE id = 0"
+        ).fetchone()
+        return row[0] if row else None
+
+    def sync(self, to_block=None):
+        """
+        indexes every block from the checkpoint up to `to_block` (latest block by default)
+        """
+        if to_block is None:
+            to_block = web3.eth.block_number
+        checkpoint = self.checkpoint()
+        from_block = self.start_block if checkpoint is None else checkpoint + 1
+
+        while from_block <= to_block:
+            chunk_end = min(from_block + self.chunk_size - 1, to_block)
+            self.index_chunk(from_block, chunk_end)
+            from_block = chunk_end + 1
+
+    def get_logs(self, from_block, to_block, addresses):
+        return web3.eth.get_logs(
+            {"fromBlock": from_block, "toBlock": to_block, "address": addresses}
+        )
+
+    def index_chunk(self, from_block, to_block):
+        # tokens listed in this chunk must be known before querying their Transfer logs
+        new_tokens = {}
+        for log in self.get_logs(from_block, to_block, [self.pool_configuration]):
+            event = self.decode(log)
+            if event is not None and event.event == "TokenAdded":
+                underlying_asset = event.args.underlyingAsset
+                new_tokens[event.args.xToken] = (underlying_asset, "x")
+                new_tokens[event.args.debtToken] = (underlying_asset, "debt")
+        self.tokens.update(new_tokens)
+
+        logs = self.get_logs(
+            from_block,
+            to_block,
+            [self.pool, self.pool_configuration, self.reserves_manager]
+            + list(self.tokens),
+        )
+        events = [event for event in map(self.decode, logs) if event is not None]
+
+        positions = self.load_rows(
+            "positions",
+            ("user", "underlying_asset"),
+            POSITION_COLUMNS,
+            self.touched_positions(events),
+        )
+        reserves = self.load_rows(
+            "reserves",
+            ("underlying_asset",),
+            RESERVE_COLUMNS,
+            set(
+                (event.args.underlyingAsset,)
+                for event in events
+                if event.event in ("TokenAdded", "ReserveDataUpdated")
+            ),
+        )
+        actions = []
+
+        for event in events:
+            self.apply(event, positions, reserves, actions)
+
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO tokens (address, underlying_asset, kind) VALUES (?, ?, ?)",
+                [(address,) + token for address, token in new_tokens.items()],
+            )
+            self.connection.executemany(
+                "INSERT INTO positions (user, underlying_asset, supplied, scaled_x_balance, "
+                "scaled_debt_balance, updated_block) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (user, underlying_asset) DO UPDATE SET supplied = excluded.supplied, "
+                "scaled_x_balance = excluded.scaled_x_balance, "
+                "scaled_debt_balance = excluded.scaled_debt_balance, "
+                "updated_block = excluded.updated_block",
+                [
+                    key + self.serialize(row, POSITION_COLUMNS) + (row["updated_block"],)
+                    for key, row in positions.items()
+                    if "updated_block" in row
+                ],
+            )
+            self.connection.executemany(
+                "INSERT INTO reserves (underlying_asset, x_token, debt_token, price_oracle, "
+                "utilization_rate, liquidity_rate, variable_borrow_rate, supply_index, "
+                "variable_borrow_index, updated_block) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (underlying_asset) DO UPDATE SET x_token = excluded.x_token, "
+                "debt_token = excluded.debt_token, price_oracle = excluded.price_oracle, "
+                "utilization_rate = excluded.utilization_rate, "
+                "liquidity_rate = excluded.liquidity_rate, "
+                "variable_borrow_rate = excluded.variable_borrow_rate, "
+                "supply_index = excluded.supply_index, "
+                "variable_borrow_index = excluded.variable_borrow_index, "
+                "updated_block = excluded.updated_block",
+                [
+                    key + self.serialize(row, RESERVE_COLUMNS) + (row["updated_block"],)
+                    for key, row in reserves.items()
+                    if "updated_block" in row
+                ],
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO actions (block, log_index, event, user, "
+                "underlying_asset, amount, collateral) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                actions,
+            )
+            self.connection.execute(
+                "INSERT INTO checkpoint (id, block) VALUES (0, ?) "
+                "ON CONFLICT (id) DO UPDATE SET block = excluded.block",
+                (to_block,),
+            )
+
+    def decode(self, log):
+        topic = log["topics"][0].hex() if log["topics"] else None
+        if log["address"] in self.tokens:
+            decoder = self.token_decoders.get(topic)
+        else:
+            decoder = self.decoders.get(log["address"], {}).get(topic)
+        if decoder is None:
+            return None
+        return decoder.processLog(log)
+
+    def touched_positions(self, events):
+        keys = set()
+        for event in events:
+            if event.event == "Transfer":
+                underlying_asset = self.tokens[event.address][0]
+                keys.add((event.args["from"], underlying_asset))
+                keys.add((event.args["to"], underlying_asset))
+            elif event.event in ("Supply", "Withdraw"):
+                keys.add((event.args.user, event.args.asset))
+        return set(key for key in keys if key[0] != ZERO_ADDRESS)
+
+    def load_rows(self, table, key_columns, columns, keys):
+        """
+        loads the current rows of the touched keys, missing rows are created with default values
+        """
+        rows = {}
+        keys = list(keys)
+        where = " AND ".join(f"{column} = ?" for column in key_columns)
+        for key in keys:
+            row = self.connection.execute(
+                f"SELECT {', '.join(columns)} FROM {table} WHERE {where}", key
+            ).fetchone()
+            rows[key] = self.deserialize(row, columns)
+        return rows
+
+    def deserialize(self, row, columns):
+        values = {}
+        for i, column in enumerate(columns):
+            value = row[i] if row else None
+            if column in ("x_token", "debt_token", "price_oracle"):
+                values[column] = value
+            elif value is None:
+                values[column] = (
+                    10**18 if column.endswith("_index") else 0
+                )
+            else:
+                values[column] = int(value)
+        return values
+
+    def serialize(self, row, columns):
+        return tuple(
+            row[column] if isinstance(row[column], str) or row[column] is None
+            else str(row[column])
+            for column in columns
+        )
+
+    def apply(self, event, positions, reserves, actions):
+        args = event.args
+        block = event.blockNumber
+
+        if event.event == "Transfer":
+            underlying_asset, kind = self.tokens[event.address]
+            column = "scaled_x_balance" if kind == "x" else "scaled_debt_balance"
+            if args["from"] != ZERO_ADDRESS:
+                position = positions[(args["from"], underlying_asset)]
+                position[column] -= args.value
+                position["updated_block"] = block
+            if args["to"] != ZERO_ADDRESS:
+                position = positions[(args["to"], underlying_asset)]
+                position[column] += args.value
+                position["updated_block"] = block
+            return
+
+        if event.event == "TokenAdded":
+            reserve = reserves[(args.underlyingAsset,)]
+            reserve.update(
+                x_token=args.xToken,
+                debt_token=args.debtToken,
+                price_oracle=args.priceOracle,
+                updated_block=block,
+            )
+            return
+
+        if event.event == "ReserveDataUpdated":
+            reserve = reserves[(args.underlyingAsset,)]
+            reserve.update(
+                utilization_rate=args.utilizationRate,
+                liquidity_rate=args.liquidityRate,
+                variable_borrow_rate=args.variableBorrowRate,
+                supply_index=args.supplyIndex,
+                variable_borrow_index=args.variableBorrowIndex,
+                updated_block=block,
+            )
+            return
+
+        if event.event == "Supply":
+            position = positions[(args.user, args.asset)]
+            position["supplied"] += args.amount
+            position["updated_block"] = block
+        elif event.event == "Withdraw":
+            position = positions[(args.user, args.asset)]
+            position["supplied"] -= args.amount
+            position["updated_block"] = block
+        elif event.event not in ("Borrow", "Repay", "LiquidationCall"):
+            return
+
+        actions.append(
+            (
+                block,
+                event.logIndex,
+                event.event,
+                args.get("user"),
+                args.get("asset"),
+                str(args.amount),
+                args.get("collateral"),
+            )
+        )
@@ -0,0 +1,113 @@
+"""
+Lists the tokens of the `reserves` manifest of the active network in `brownie-config.yaml`, in as
+few `addTokens` transactions as the block gas limit allows .
+
+    brownie run scripts/list_reserves.py --network goerli
+"""
+from scripts.utils import get_account
+from brownie import (
+    DefaultInterestRateStrategy,
+    PoolConfiguration,
+    config,
+    network,
+    project,
+    web3,
+)
+from web3 import Web3
+
+# share of the block gas limit a transaction may use, the estimates can be a bit low
+BLOCK_GAS_LIMIT_SHARE = 0.9
+STRATEGY_PARAMETERS = [
+    "optimal_utilization_rate",
+    "base_variable_borrow_rate",
+    "variable_rate_slope_1",
+    "variable_rate_slope_2",
+]
+
+account = get_account()
+
+
+def main():
+    list_reserves(config["networks"][network.show_active()]["reserves"])
+
+
+def list_reserves(manifest, pool_configuration=None):
+    """
+    lists the tokens of `manifest` not listed yet, returns the transactions sent
+    """
+    pool_configuration = pool_configuration or PoolConfiguration[-1]
+    strategies = {}
+    reserve_configs = []
+    for reserve in manifest:
+        underlying_asset = resolve_address(reserve["underlying_asset"])
+        if pool_configuration.isAvailable(underlying_asset):
+            print(f"{reserve['symbol']} is already listed")
+            continue
+        reserve_configs.append(
+            to_reserve_config(reserve, underlying_asset, strategies)
+        )
+
+    gas_limit = int(web3.eth.get_block("latest").gasLimit * BLOCK_GAS_LIMIT_SHARE)
+    txs = []
+    for batch in split_by_gas(
+        reserve_configs,
+        lambda batch: pool_configuration.addTokens.estimate_gas(
+            batch, {"from": account}
+        ),
+        gas_limit,
+    ):
+        txs.append(
+            pool_configuration.addTokens(
+                batch, {"from": account, "priority_fee": "2 gwei"}
+            )
+        )
+        print(f"listed {', '.join(reserve_config[1] for reserve_config in batch)}")
+    return txs
+
+
+def to_reserve_config(reserve, underlying_asset, strategies):
+    """
+    the addTokens tuple of a manifest entry, the reserves with the same rates share a strategy
+    """
+    parameters = tuple(
+        Web3.toWei(str(reserve["interest_rate_strategy"][name]), "ether")
+        for name in STRATEGY_PARAMETERS
+    )
+    if parameters not in strategies:
+        strategies[parameters] = DefaultInterestRateStrategy.deploy(
+            *parameters,
+            {"from": account, "priority_fee": "2 gwei"},
+            publish_source=config["networks"][network.show_active()].get("verify"),
+        )
+    return (
+        reserve["name"],
+        reserve["symbol"],
+        underlying_asset,
+        reserve["price_feed"],
+        reserve["decimals"],
+        strategies[parameters].address,
+    )
+
+
+def resolve_address(value):
+    """
+    `value` when it is an address, else the last deployment of the project contract it names
+    """
+    if Web3.isAddress(value):
+        return Web3.toChecksumAddress(value)
+    return project.get_loaded_projects()[0][value][-1].address
+
+
+def split_by_gas(items, estimate_gas, gas_limit):
+    """
+    splits `items` in consecutive batches whose `estimate_gas(batch)` stays within `gas_limit`,
+    every batch is yielded before the next one is estimated so it can be sent in between
+    """
+    batch = []
+    for item in items:
+        if batch and estimate_gas(batch + [item]) > gas_limit:
+            yield batch
+            batch = []
+        batch.append(item)
+    if batch:
+        yield batch
@@ -0,0 +1,436 @@
+"""
+Off-chain mirror of the ReservesManager math .
+
+Every function reproduces the Solidity code it is named after bit for bit, including the DSMath
+`wmul` / `wdiv` rounding and the uint128 / uint40 bounds of the packed `DataTypes.Reserve`, so
+hypothetical reserve states can be evaluated without any RPC call .
+
+`update_state_batch` evaluates many states at once on NumPy object arrays : the elements stay
+python ints, so the batch results are exactly the same as the scalar ones .
+"""
+from collections import namedtuple
+
+WAD = 10**18
+HALF_WAD = WAD // 2
+RAY = 10**27
+HALF_RAY = RAY // 2
+WAD_RAY_RATIO = RAY // WAD
+SECONDS_PER_YEAR = 365 * 24 * 60 * 60
+MAX_UINT128 = 2**128 - 1
+MAX_UINT40 = 2**40 - 1
+# `ReservesManager.MAX_COMPOUNDING_STEP`
+MAX_COMPOUNDING_STEP = WAD // 8
+# `ReservesManager.MAX_COMPOUNDED_ACCRUAL`
+MAX_COMPOUNDED_ACCRUAL = 16 * WAD
+
+# same fields, same order as `DataTypes.Reserve` so that `Reserve(*reserves_manager.getReserve(asset))` works
+Reserve = namedtuple(
+    "Reserve",
+    [
+        "utilization_rate",
+        "variable_borrow_rate",
+        "interest_rate_strategy",
+        "variable_borrow_index",
+        "liquidity_rate",
+        "supply_index",
+        "last_update_time",
+        "x_token",
+        "debt_token",
+    ],
+)
+
+# the parameters of a `DefaultInterestRateStrategy`, in its constructor order
+InterestRateStrategy = namedtuple(
+    "InterestRateStrategy",
+    [
+        "optimal_utilization_rate",
+        "base_variable_borrow_rate",
+        "variable_rate_slope_1",
+        "variable_rate_slope_2",
+    ],
+)
+
+ADDRESS_FIELDS = ("interest_rate_strategy", "x_token", "debt_token")
+NUMERIC_FIELDS = tuple(field for field in Reserve._fields if field not in ADDRESS_FIELDS)
+
+UINT128_FIELDS = (
+    "utilization_rate",
+    "variable_borrow_rate",
+    "variable_borrow_index",
+    "liquidity_rate",
+    "supply_index",
+)
+
+
+def wmul(x, y):
+    return (x * y + HALF_WAD) // WAD
+
+
+def wdiv(x, y):
+    return (x * WAD + y // 2) // y
+
+
+def rmul(x, y):
+    return (x * y + HALF_RAY) // RAY
+
+
+def rpow(x, n):
+    z = x if n % 2 != 0 else RAY
+    n //= 2
+    while n != 0:
+        x = rmul(x, x)
+        if n % 2 != 0:
+            z = rmul(z, x)
+        n //= 2
+    return z
+
+
+def to_uint128(value):
+    if not 0 <= value <= MAX_UINT128:
+        raise OverflowError("SafeCast: value doesn't fit in 128 bits")
+    return value
+
+
+def to_uint40(value):
+    if not 0 <= value <= MAX_UINT40:
+        raise OverflowError("SafeCast: value doesn't fit in 40 bits")
+    return value
+
+
+def init_reserve(interest_rate_strategy, timestamp, x_token=None, debt_token=None):
+    return Reserve(
+        0,
+        0,
+        interest_rate_strategy,
+        WAD,
+        0,
+        WAD,
+        to_uint40(timestamp),
+        x_token,
+        debt_token,
+    )
+
+
+def update_utilization_rate(total_deposited, total_borrowed):
+    if total_deposited == 0:
+        return 0
+    return wdiv(total_borrowed, total_deposited)
+
+
+def calculate_variable_borrow_rate(strategy, utilization_rate):
+    """
+    `DefaultInterestRateStrategy.calculateVariableBorrowRate`, the slopes being divided by the
+    utilization ranges once as in its constructor
+    """
+    if utilization_rate <= strategy.optimal_utilization_rate:
+        return strategy.base_variable_borrow_rate + wmul(
+            utilization_rate,
+            wdiv(strategy.variable_rate_slope_1, strategy.optimal_utilization_rate),
+        )
+    return (
+        strategy.base_variable_borrow_rate
+        + strategy.variable_rate_slope_1
+        + wmul(
+            utilization_rate - strategy.optimal_utilization_rate,
+            wdiv(strategy.variable_rate_slope_2, WAD - strategy.optimal_utilization_rate),
+        )
+    )
+
+
+def update_index(latest_index, rate, seconds_since_last_update):
+    rate_per_second = rate // SECONDS_PER_YEAR
+    return wmul(latest_index, WAD + rate_per_second * seconds_since_last_update)
+
+
+def calculate_compounded_interest(rate_per_second, seconds):
+    """
+    `(1 + rate_per_second) ^ seconds` in ray, approximated by the first five terms of its binomial
+    expansion as `ReservesManager.calculateCompoundedInterest`
+    """
+    if seconds == 0:
+        return RAY
+
+    exp_minus_one = seconds - 1
+    exp_minus_two = seconds - 2 if seconds > 2 else 0
+    exp_minus_three = seconds - 3 if seconds > 3 else 0
+
+    first_term = rate_per_second * seconds
+    second_term = rmul(first_term, rate_per_second * exp_minus_one) // 2
+    third_term = rmul(second_term, rate_per_second * exp_minus_two) // 3
+    fourth_term = rmul(third_term, rate_per_second * exp_minus_three) // 4
+
+    return RAY + first_term + second_term + third_term + fourth_term
+
+
+def update_compounded_index(latest_index, rate, seconds_since_last_update):
+    """
+    `(1 + rate / year) ^ seconds` compounded in steps of at most `MAX_COMPOUNDING_STEP`, computed
+    in ray as `ReservesManager.updateCompoundedIndex` : the accrual is capped at
+    `MAX_COMPOUNDED_ACCRUAL` and the index saturates at the max uint128
+    """
+    if seconds_since_last_update == 0:
+        return latest_index
+
+    if rate * seconds_since_last_update > MAX_COMPOUNDED_ACCRUAL * SECONDS_PER_YEAR:
+        seconds_since_last_update = MAX_COMPOUNDED_ACCRUAL * SECONDS_PER_YEAR // rate
+
+    rate_per_second = rate * WAD_RAY_RATIO // SECONDS_PER_YEAR
+    steps = rate * seconds_since_last_update // (MAX_COMPOUNDING_STEP * SECONDS_PER_YEAR) + 1
+    seconds_per_step = seconds_since_last_update // steps
+
+    compounded_interest = rmul(
+        rpow(calculate_compounded_interest(rate_per_second, seconds_per_step), steps),
+        calculate_compounded_interest(
+            rate_per_second, seconds_since_last_update - seconds_per_step * steps
+        ),
+    )
+    return min(wmul(latest_index, compounded_interest // WAD_RAY_RATIO), MAX_UINT128)
+
+
+def update_state(reserve, strategy, available_liquidity, scaled_total_debt, timestamp):
+    """
+    returns the reserve written by `ReservesManager.updateState(asset)` when it is mined in a block
+    with the given timestamp, `strategy` being the `InterestRateStrategy` of the reserve,
+    `available_liquidity` the underlying balance of the xToken and `scaled_total_debt` the
+    debtToken scaled total supply at that time
+    """
+    seconds_since_last_update = timestamp - reserve.last_update_time
+    if seconds_since_last_update < 0:
+        raise ValueError("timestamp is before the last update of the reserve")
+
+    variable_borrow_index = update_compounded_index(
+        reserve.variable_borrow_index, reserve.variable_borrow_rate, seconds_since_last_update
+    )
+    supply_index = update_index(
+        reserve.supply_index, reserve.liquidity_rate, seconds_since_last_update
+    )
+
+    total_borrowed = wmul(scaled_total_debt, variable_borrow_index)
+    total_deposited = available_liquidity + total_borrowed
+
+    utilization_rate = update_utilization_rate(total_deposited, total_borrowed)
+    variable_borrow_rate = calculate_variable_borrow_rate(strategy, utilization_rate)
+    liquidity_rate = wmul(variable_borrow_rate, utilization_rate)
+
+    return reserve._replace(
+        utilization_rate=to_uint128(utilization_rate),
+        variable_borrow_rate=to_uint128(variable_borrow_rate),
+        variable_borrow_index=to_uint128(variable_borrow_index),
+        liquidity_rate=to_uint128(liquidity_rate),
+        supply_index=to_uint128(supply_index),
+        last_update_time=to_uint40(timestamp),
+    )
+
+
+def get_variable_borrow_index_since_last_update(reserve, timestamp):
+    return update_compounded_index(
+        reserve.variable_borrow_index,
+        reserve.variable_borrow_rate,
+        timestamp - reserve.last_update_time,
+    )
+
+
+def get_supply_index_since_last_update(reserve, timestamp):
+    return update_index(
+        reserve.supply_index,
+        reserve.liquidity_rate,
+        timestamp - reserve.last_update_time,
+    )
+
+
+# vectorized mode
+
+
+def _object_array(values):
+    import numpy as np
+
+    array = np.empty(len(values), dtype=object)
+    array[:] = [int(value) for value in values]
+    return array
+
+
+def reserves_to_columns(reserves):
+    """
+    turns a sequence of `Reserve` into a dict of NumPy object arrays, one per numeric field
+    """
+    return {
+        field: _object_array([getattr(reserve, field) for reserve in reserves])
+        for field in NUMERIC_FIELDS
+    }
+
+
+def columns_to_reserves(columns, x_tokens=None, debt_tokens=None, interest_rate_strategies=None):
+    size = len(columns["utilization_rate"])
+    addresses = {
+        "interest_rate_strategy": interest_rate_strategies,
+        "x_token": x_tokens,
+        "debt_token": debt_tokens,
+    }
+    return [
+        Reserve(
+            **{field: int(columns[field][i]) for field in NUMERIC_FIELDS},
+            **{
+                field: values[i] if values is not None else None
+                for field, values in addresses.items()
+            },
+        )
+        for i in range(size)
+    ]
+
+
+def _wmul_array(x, y):
+    return (x * y + HALF_WAD) // WAD
+
+
+def _wdiv_array(x, y):
+    import numpy as np
+
+    safe_y = np.where(y == 0, 1, y)
+    return (x * WAD + safe_y // 2) // safe_y
+
+
+def _rmul_array(x, y):
+    return (x * y + HALF_RAY) // RAY
+
+
+def _rpow_array(x, n):
+    import numpy as np
+
+    z = np.where(n % 2 != 0, x, RAY)
+    n = n // 2
+    while (n != 0).any():
+        # the exhausted exponents keep their base, squaring it further would only grow the ints
+        x = np.where(n != 0, _rmul_array(x, x), x)
+        z = np.where(n % 2 != 0, _rmul_array(z, x), z)
+        n = n // 2
+    return z
+
+
+def _calculate_compounded_interest_array(rate_per_second, seconds):
+    import numpy as np
+
+    exp_minus_one = np.where(seconds > 1, seconds - 1, 0)
+    exp_minus_two = np.where(seconds > 2, seconds - 2, 0)
+    exp_minus_three = np.where(seconds > 3, seconds - 3, 0)
+
+    # no time passed : every term is 0 and the factor is RAY
+    first_term = rate_per_second * seconds
+    second_term = _rmul_array(first_term, rate_per_second * exp_minus_one) // 2
+    third_term = _rmul_array(second_term, rate_per_second * exp_minus_two) // 3
+    fourth_term = _rmul_array(third_term, rate_per_second * exp_minus_three) // 4
+
+    return RAY + first_term + second_term + third_term + fourth_term
+
+
+def _update_compounded_index_array(latest_index, rate, seconds_since_last_update):
+    import numpy as np
+
+    seconds_since_last_update = np.where(
+        rate * seconds_since_last_update > MAX_COMPOUNDED_ACCRUAL * SECONDS_PER_YEAR,
+        MAX_COMPOUNDED_ACCRUAL * SECONDS_PER_YEAR // np.where(rate == 0, 1, rate),
+        seconds_since_last_update,
+    )
+    rate_per_second = rate * WAD_RAY_RATIO // SECONDS_PER_YEAR
+    steps = rate * seconds_since_last_update // (MAX_COMPOUNDING_STEP * SECONDS_PER_YEAR) + 1
+    seconds_per_step = seconds_since_last_update // steps
+
+    compounded_interest = _rmul_array(
+        _rpow_array(
+            _calculate_compounded_interest_array(rate_per_second, seconds_per_step), steps
+        ),
+        _calculate_compounded_interest_array(
+            rate_per_second, seconds_since_last_update - seconds_per_step * steps
+        ),
+    )
+    # no time passed : the index is returned as is, wmul(index, WAD) == index
+    index = _wmul_array(latest_index, compounded_interest // WAD_RAY_RATIO)
+    return np.where(index > MAX_UINT128, MAX_UINT128, index)
+
+
+def _calculate_variable_borrow_rate_array(strategies, utilization_rate):
+    import numpy as np
+
+    optimal_utilization_rate = strategies["optimal_utilization_rate"]
+    slope_1 = strategies["variable_rate_slope_1"]
+    slope_2 = strategies["variable_rate_slope_2"]
+
+    below_optimal = strategies["base_variable_borrow_rate"] + _wmul_array(
+        utilization_rate, _wdiv_array(slope_1, optimal_utilization_rate)
+    )
+    above_optimal = (
+        strategies["base_variable_borrow_rate"]
+        + slope_1
+        + _wmul_array(
+            utilization_rate - optimal_utilization_rate,
+            _wdiv_array(slope_2, WAD - optimal_utilization_rate),
+        )
+    )
+    return np.where(utilization_rate <= optimal_utilization_rate, below_optimal, above_optimal)
+
+
+def _check_range(columns, fields, max_value):
+    for field in fields:
+        column = columns[field]
+        if len(column) and ((column < 0) | (column > max_value)).any():
+            raise OverflowError(f"SafeCast: {field} doesn't fit in its storage width")
+
+
+def update_state_batch(columns, strategies, available_liquidities, scaled_total_debts, timestamps):
+    """
+    vectorized `update_state` : every argument is either a scalar or an array with one entry per
+    reserve state, `columns` comes from `reserves_to_columns` and `strategies` is one
+    `InterestRateStrategy` or a sequence of them . Returns a new dict of columns
+    """
+    import numpy as np
+
+    size = len(columns["utilization_rate"])
+    if isinstance(strategies, InterestRateStrategy):
+        strategies = [strategies] * size
+    strategies = {
+        field: _object_array([getattr(strategy, field) for strategy in strategies])
+        for field in InterestRateStrategy._fields
+    }
+    available_liquidities = _object_array(
+        np.broadcast_to(np.asarray(available_liquidities, dtype=object), (size,))
+    )
+    scaled_total_debts = _object_array(
+        np.broadcast_to(np.asarray(scaled_total_debts, dtype=object), (size,))
+    )
+    timestamps = _object_array(np.broadcast_to(np.asarray(timestamps, dtype=object), (size,)))
+
+    seconds_since_last_update = timestamps - columns["last_update_time"]
+    if len(seconds_since_last_update) and (seconds_since_last_update < 0).any():
+        raise ValueError("timestamp is before the last update of the reserve")
+
+    variable_borrow_index = _update_compounded_index_array(
+        columns["variable_borrow_index"],
+        columns["variable_borrow_rate"],
+        seconds_since_last_update,
+    )
+    supply_index = _wmul_array(
+        columns["supply_index"],
+        WAD + (columns["liquidity_rate"] // SECONDS_PER_YEAR) * seconds_since_last_update,
+    )
+
+    total_borrowed = _wmul_array(scaled_total_debts, variable_borrow_index)
+    total_deposited = available_liquidities + total_borrowed
+
+    utilization_rate = np.where(
+        total_deposited == 0, 0, _wdiv_array(total_borrowed, total_deposited)
+    )
+    variable_borrow_rate = _calculate_variable_borrow_rate_array(strategies, utilization_rate)
+    liquidity_rate = _wmul_array(variable_borrow_rate, utilization_rate)
+
+    updated_columns = dict(columns)
+    updated_columns.update(
+        utilization_rate=_object_array(utilization_rate),
+        variable_borrow_rate=_object_array(variable_borrow_rate),
+        variable_borrow_index=_object_array(variable_borrow_index),
+        liquidity_rate=_object_array(liquidity_rate),
+        supply_index=_object_array(supply_index),
+        last_update_time=timestamps,
+    )
+    _check_range(updated_columns, UINT128_FIELDS, MAX_UINT128)
+    _check_range(updated_columns, ("last_update_time",), MAX_UINT40)
+
+    return updated_columns
@@ -15,3 +15,87 @@ def get_account(index=None, id=None, num=None):
     if network.show_active() in config["networks"] and num == 2:
         return accounts.add(config["wallets"]["from_key_2"])
     return None
+
+
+def get_contract_address(deployer, nonce):
+    """
+    address of the contract created by `deployer` with its transaction of nonce `nonce`
+    """
+    import rlp
+    from eth_utils import keccak, to_bytes, to_checksum_address
+
+    return to_checksum_address(
+        keccak(rlp.encode([to_bytes(hexstr=str(deployer)), nonce]))[12:]
+    )
+
+
+def get_clone_address(deployer, implementation, salt):
+    """
+    address of the EIP-1167 clone of `implementation` created by `deployer` with CREATE2 and `salt`
+    """
+    from eth_utils import keccak, to_bytes, to_checksum_address
+
+    init_code = (
+        bytes.fromhex("3d602d80600a3d3981f3363d3d373d3d3d363d73")
+        + to_bytes(hexstr=str(implementation))
+        + bytes.fromhex("5af43d82803e903d91602b57fd5bf3")
+    )
+    return to_checksum_address(
+        keccak(
+            b"\xff" + to_bytes(hexstr=str(deployer)) + salt + keccak(init_code)
+        )[12:]
+    )
+
+
+def get_reserve_salt(underlying_asset):
+    """
+    salt of the clones of a reserve, the address of its underlying asset left padded to 32 bytes
+    """
+    from eth_utils import to_bytes
+
+    return to_bytes(hexstr=str(underlying_asset)).rjust(32, b"\0")
+
+
+def sign_permit(token, owner, spender, value, deadline):
+    """
+    EIP-2612 permit of `owner` allowing `spender` to spend `value` of `token` until `deadline`,
+    signed with the private key of `owner` and returned as (v, r, s)
+    """
+    from brownie import chain
+    from eth_account import Account
+    from eth_account.messages import encode_structured_data
+
+    permit = {
+        "types": {
+            "EIP712Domain": [
+                {"name": "name", "type": "string"},
+                {"name": "version", "type": "string"},
+                {"name": "chainId", "type": "uint256"},
+                {"name": "verifyingContract", "type": "address"},
+            ],
+            "Permit": [
+                {"name": "owner", "type": "address"},
+                {"name": "spender", "type": "address"},
+                {"name": "value", "type": "uint256"},
+                {"name": "nonce", "type": "uint256"},
+                {"name": "deadline", "type": "uint256"},
+            ],
+        },
+        "primaryType": "Permit",
+        "domain": {
+            "name": token.name(),
+            "version": "1",
+            "chainId": chain.id,
+            "verifyingContract": str(token),
+        },
+        "message": {
+            "owner": str(owner),
+            "spender": str(spender),
+            "value": value,
+            "nonce": token.nonces(owner),
+            "deadline": deadline,
+        },
+    }
+    signed = Account.sign_message(encode_structured_data(permit), owner.private_key)
+
+    return signed.v, signed.r.to_bytes(32, "big"), signed.s.to_bytes(32, "big")
@@ -0,0 +1,166 @@
+import pytest
+from web3 import Web3
+from conftest import list_reserve
+from scripts.utils import get_account
+
+SUPPLY_AMOUNT = Web3.toWei(100, "ether")
+AMOUNT = Web3.toWei(10, "ether")
+LISTINGS_COUNTS = [1, 10, 50]
+
+# "cold" is the first call of a path for a user and a reserve, "warm" the same call repeated
+# right after it, once the position storage slots are already set . Every path is checked against
+# the baseline report by `record_gas` when `GAS_BASELINE_PATH` is set
+
+
+def test_supply_gas(
+    listed_reserves, reserves_count, pool, account, record_gas, skip_live_testing
+):
+
+    # arrange
+    token = listed_reserves[0][0]
+    token.approve(pool, 2 * AMOUNT, {"from": account})
+
+    # act
+    cold_tx = pool.supply(token, AMOUNT, {"from": account})
+    warm_tx = pool.supply(token, AMOUNT, {"from": account})
+
+    # assert
+    record_gas("supply", "cold", reserves_count, cold_tx)
+    record_gas("supply", "warm", reserves_count, warm_tx)
+    assert warm_tx.gas_used < cold_tx.gas_used
+
+
+def test_borrow_gas(
+    listed_reserves, reserves_count, pool, account, record_gas, skip_live_testing
+):
+
+    # arrange
+    token = listed_reserves[0][0]
+    token.approve(pool, SUPPLY_AMOUNT, {"from": account})
+    pool.supply(token, SUPPLY_AMOUNT, {"from": account})
+
+    # act
+    cold_tx = pool.borrow(token, AMOUNT, {"from": account})
+    warm_tx = pool.borrow(token, AMOUNT, {"from": account})
+
+    # assert
+    record_gas("borrow", "cold", reserves_count, cold_tx)
+    record_gas("borrow", "warm", reserves_count, warm_tx)
+    assert "Borrow" in cold_tx.events and "Borrow" in warm_tx.events
+    # the first borrow sets the debt balance, the debt supply and the borrowing flag from zero
+    assert warm_tx.gas_used < cold_tx.gas_used
+
+
+def test_withdraw_gas(
+    listed_reserves, reserves_count, pool, account, record_gas, skip_live_testing
+):
+
+    # arrange
+    token = listed_reserves[0][0]
+    token.approve(pool, SUPPLY_AMOUNT, {"from": account})
+    pool.supply(token, SUPPLY_AMOUNT, {"from": account})
+
+    # act
+    cold_tx = pool.withdraw(token, AMOUNT, {"from": account})
+    warm_tx = pool.withdraw(token, AMOUNT, {"from": account})
+
+    # assert
+    record_gas("withdraw", "cold", reserves_count, cold_tx)
+    record_gas("withdraw", "warm", reserves_count, warm_tx)
+    assert "Withdraw" in cold_tx.events and "Withdraw" in warm_tx.events
+
+
+def test_repay_gas(
+    listed_reserves, reserves_count, pool, account, record_gas, skip_live_testing
+):
+
+    # arrange
+    token = listed_reserves[0][0]
+    token.approve(pool, SUPPLY_AMOUNT + 2 * AMOUNT, {"from": account})
+    pool.supply(token, SUPPLY_AMOUNT, {"from": account})
+    pool.borrow(token, 3 * AMOUNT, {"from": account})
+
+    # act
+    cold_tx = pool.repay(token, AMOUNT, {"from": account})
+    warm_tx = pool.repay(token, AMOUNT, {"from": account})
+
+    # assert
+    record_gas("repay", "cold", reserves_count, cold_tx)
+    record_gas("repay", "warm", reserves_count, warm_tx)
+    assert "Repay" in cold_tx.events and "Repay" in warm_tx.events
+
+
+def test_liquidation_call_gas(
+    listed_reserves, reserves_count, pool, account, record_gas, skip_live_testing
+):
+    if reserves_count < 2:
+        pytest.skip("a liquidation needs two distinct reserves")
+
+    # arrange
+    liquidator = get_account(index=1)
+    collateral = listed_reserves[0][0]
+    asset, asset_price_feed = listed_reserves[1]
+    asset.transfer(liquidator, 2 * SUPPLY_AMOUNT, {"from": account})
+
+    collateral.approve(pool, SUPPLY_AMOUNT, {"from": account})
+    pool.supply(collateral, SUPPLY_AMOUNT, {"from": account})
+    asset.approve(pool, SUPPLY_AMOUNT, {"from": liquidator})
+    pool.supply(asset, SUPPLY_AMOUNT, {"from": liquidator})
+    pool.borrow(asset, Web3.toWei(75, "ether"), {"from": account})
+    asset_price_feed.updateAnswer(Web3.toWei(20, "ether"))
+    asset.approve(pool, 2 * AMOUNT, {"from": liquidator})
+
+    # act
+    cold_tx = pool.liquidationCall(account, asset, AMOUNT, collateral, {"from": liquidator})
+    warm_tx = pool.liquidationCall(account, asset, AMOUNT, collateral, {"from": liquidator})
+
+    # assert
+    record_gas("liquidationCall", "cold", reserves_count, cold_tx)
+    record_gas("liquidationCall", "warm", reserves_count, warm_tx)
+    assert "LiquidationCall" in cold_tx.events and "LiquidationCall" in warm_tx.events
+
+
+def test_add_token_gas(
+    listed_reserves,
+    reserves_count,
+    pool_configuration,
+    interest_rate_strategy,
+    account,
+    record_gas,
+    skip_live_testing,
+):
+
+    # act
+    # every listing clones fresh token and oracle contracts, only the cold path exists
+    tx = list_reserve(
+        pool_configuration, interest_rate_strategy, account, reserves_count
+    )[2]
+
+    # assert
+    record_gas("addToken", "cold", reserves_count, tx)
+    assert "TokenAdded" in tx.events
+
+
+@pytest.mark.parametrize("listings_count", LISTINGS_COUNTS)
+def test_add_token_total_gas(
+    listings_count,
+    pool_configuration,
+    interest_rate_strategy,
+    account,
+    record_gas,
+    skip_live_testing,
+):
+
+    # act
+    txs = [
+        list_reserve(pool_configuration, interest_rate_strategy, account, index)[2]
+        for index in range(listings_count)
+    ]
+
+    # assert
+    # the whole cost of listing the reserves, the mock tokens and feeds they use are not counted
+    total_gas = record_gas("addToken", "total", listings_count, *txs)
+    assert all("TokenAdded" in tx.events for tx in txs)
+    # the listings do not get more expensive as the reserves accumulate, the first one also sets
+    # the length of the tokens array from zero
+    assert total_gas <= listings_count * txs[0].gas_used
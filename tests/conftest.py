@@ -1,7 +1,15 @@
+import glob
+import json
+import os
+
 import pytest
 from web3 import Web3
-from scripts.utils import get_account, LOCAL_BLOCKCHAIN_ENVIRONMENTS
+from scripts.utils import get_account, get_contract_address, LOCAL_BLOCKCHAIN_ENVIRONMENTS
+from scripts.compare_gas import DEFAULT_THRESHOLD, compare, load_report
 from brownie import (
+    AddressesProvider,
+    ClonesMock,
+    DefaultInterestRateStrategy,
     Pool,
     PoolConfigurationMock,
     MockDai,
@@ -9,93 +17,277 @@ from brownie import (
     LinkTokenMock,
     MockV3Aggregator,
     PoolLogicMock,
-    PriceOracleMock,
+    PriceOracle,
     ReservesManagerMock,
+    accounts,
     chain,
+    web3,
 )
 
 PRICE = 10
+FALLBACK_PRICE = 11
 SUPPLY_AMOUNT = Web3.toWei(100, "ether")
 BORROW_AMOUNT = Web3.toWei(75, "ether")
 WITHDRAW_AMOUNT = SUPPLY_AMOUNT
-INTEREST_RATE_SLOPE = Web3.toWei(5, "ether")
+OPTIMAL_UTILIZATION_RATE = Web3.toWei(0.8, "ether")
 BASE_VARIABLE_BORROW_RATE = Web3.toWei(0, "ether")
+VARIABLE_RATE_SLOPE_1 = Web3.toWei(0.04, "ether")
+VARIABLE_RATE_SLOPE_2 = Web3.toWei(0.75, "ether")
+RESERVE_COUNTS = [1, 5, 20]
+GAS_REPORT_PATH = os.environ.get("GAS_REPORT_PATH", "reports/gas_benchmarks.json")
+# a report of the base branch, every recorded path is checked against it when it is set
+GAS_BASELINE_PATH = os.environ.get("GAS_BASELINE_PATH")
+GAS_THRESHOLD = float(os.environ.get("GAS_THRESHOLD", DEFAULT_THRESHOLD))
+# set by pytest-xdist in its worker processes
+WORKER_ID = os.environ.get("PYTEST_XDIST_WORKER")
+
+
+# the protocol contracts are deployed once per session and the chain is snapshotted right after
+# them, every test is reverted to a snapshot when it ends . The states most tests start from are
+# layers snapshotted on top of it the first time a test builds them : a layer is the sequence of
+# layer fixtures the test ran from the deployment, with no other transaction in between
+SNAPSHOT_LAYERS = ("add_token", "supply", "borrow", "repay", "withdraw")
+# function scoped fixtures sending no transaction, the layers of a test can be restored across them
+STATELESS_FIXTURES = ("isolation", "record_gas", "reserves_count")
+
+
+def take_snapshot():
+    return web3.provider.make_request("evm_snapshot", [])["result"]
+
+
+def revert_to_snapshot(snapshot_id):
+    web3.provider.make_request("evm_revert", [snapshot_id])
+
+
+class ChainSnapshots:
+    """
+    a stack of snapshots : the deployment, then one per layer . Brownie's chain tracks a single
+    snapshot so they are taken through the RPC, where reverting to a snapshot also drops the ones
+    taken after it : the snapshot reverted to is taken again right away
+    """
+
+    def __init__(self):
+        # (layers, snapshot id, value returned by the last layer fixture)
+        self.stack = [((), take_snapshot(), None)]
+        self.planned_layers = ()
+        self.layers = ()
+
+    def revert(self, depth):
+        layers, snapshot_id, value = self.stack[depth]
+        revert_to_snapshot(snapshot_id)
+        del self.stack[depth:]
+        self.stack.append((layers, take_snapshot(), value))
+
+    def restore(self, planned_layers):
+        """
+        starts a test on the deepest snapshotted prefix of the layers it builds first
+        """
+        depth = 0
+        while (
+            depth + 1 < len(self.stack)
+            and self.stack[depth + 1][0] == planned_layers[: depth + 1]
+        ):
+            depth += 1
+        self.revert(depth)
+        self.planned_layers = planned_layers
+        self.layers = ()
+
+    def layer(self, name, build):
+        """
+        returns the value of a layer fixture, built by `build` unless the test was restored past it
+        """
+        self.layers = self.layers + (name,)
+        for layers, _, value in self.stack[1:]:
+            if layers == self.layers:
+                return value
+
+        value = build()
+        # only a planned layer built right on top of the last snapshot is the state its name says
+        if (
+            self.layers == self.planned_layers[: len(self.layers)]
+            and self.stack[-1][0] == self.layers[:-1]
+        ):
+            self.stack.append((self.layers, take_snapshot(), value))
+        return value
+
+    def teardown(self):
+        # every snapshotted layer stays usable for the next test
+        self.revert(len(self.stack) - 1)
+
+
+def function_fixtures_order(item):
+    """
+    the function scoped fixtures of a test in the order pytest sets them up : the closure order,
+    each fixture after the ones it requests
+    """
+    name2fixturedefs = item._fixtureinfo.name2fixturedefs
+    visited = set()
+    order = []
+
+    def visit(name):
+        if name in visited or name not in name2fixturedefs:
+            return
+        visited.add(name)
+        fixturedef = name2fixturedefs[name][-1]
+        for argname in fixturedef.argnames:
+            visit(argname)
+        if fixturedef.scope == "function":
+            order.append(name)
+
+    for name in item.fixturenames:
+        visit(name)
+    return order
+
+
+def planned_layers(item):
+    """
+    the layer fixtures a test sets up before any other fixture sends a transaction
+    """
+    layers = []
+    for name in function_fixtures_order(item):
+        if name in SNAPSHOT_LAYERS:
+            layers.append(name)
+        elif name not in STATELESS_FIXTURES:
+            break
+    return tuple(layers)
 
 
-@pytest.fixture()
+@pytest.fixture(scope="session")
+def chain_snapshots(
+    addresses_provider,
+    interest_rate_strategy,
+    dai,
+    account_initial_dai_balance,
+    link,
+    mock_v3_aggregator,
+    fallback_price_feed,
+    mock_v3_aggregator_link,
+    clones,
+    price_oracle_implementation,
+    price_oracle,
+):
+    # every session contract is deployed before the base snapshot, reverting never removes one
+    return ChainSnapshots()
+
+
+@pytest.fixture(autouse=True)
+def isolation(request):
+    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        yield
+        return
+
+    chain_snapshots = request.getfixturevalue("chain_snapshots")
+    chain_snapshots.restore(planned_layers(request.node))
+    yield
+    chain_snapshots.teardown()
+
+
+@pytest.fixture(scope="session")
 def skip_live_testing():
     if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
         pytest.skip("Only for local testing !")
 
 
-@pytest.fixture()
+@pytest.fixture(scope="session")
 def account():
     account = get_account()
 
     return account
 
 
-@pytest.fixture()
-def pool(account):
+@pytest.fixture(scope="session")
+def addresses_provider(account):
+    # the protocol contracts are deployed right after the registry, at the addresses it predicted
+    nonce = account.nonce
+    pool, pool_configuration, pool_logic, reserves_manager = [
+        get_contract_address(account, nonce + offset) for offset in range(1, 5)
+    ]
+    addresses_provider = AddressesProvider.deploy(
+        pool, pool_configuration, pool_logic, reserves_manager, {"from": account}
+    )
+
+    Pool.deploy(addresses_provider, {"from": account})
+    PoolConfigurationMock.deploy(addresses_provider, {"from": account})
+    PoolLogicMock.deploy(addresses_provider, {"from": account})
+    ReservesManagerMock.deploy(addresses_provider, {"from": account})
 
-    pool = Pool.deploy({"from": account})
+    return addresses_provider
+
+
+@pytest.fixture(scope="session")
+def pool(addresses_provider):
+    pool = Pool.at(addresses_provider.getPool())
 
     return pool
 
 
-@pytest.fixture()
-def pool_configuration(account, pool):
-    pool_configuration = PoolConfigurationMock.deploy(pool, {"from": account})
+@pytest.fixture(scope="session")
+def pool_configuration(addresses_provider):
+    pool_configuration = PoolConfigurationMock.at(
+        addresses_provider.getPoolConfiguration()
+    )
 
     return pool_configuration
 
 
-@pytest.fixture()
-def pool_configuration_set_reserves_manager_contract(
-    pool_configuration, reserves_manager, account
-):
-    pool_configuration.setReserveManagerContract(reserves_manager, {"from": account})
+@pytest.fixture(scope="session")
+def pool_logic(addresses_provider):
+    pool_logic = PoolLogicMock.at(addresses_provider.getPoolLogic())
 
+    return pool_logic
 
-@pytest.fixture()
-def pool_logic(account, pool_configuration):
-    pool_logic = PoolLogicMock.deploy(pool_configuration, {"from": account})
 
-    return pool_logic
+@pytest.fixture(scope="session")
+def reserves_manager(addresses_provider):
+    reserves_manager = ReservesManagerMock.at(addresses_provider.getReservesManager())
+
+    return reserves_manager
 
 
-@pytest.fixture()
-def reserves_manager(account, pool_configuration, pool):
-    reserves_manager = ReservesManagerMock.deploy(
-        pool_configuration,
-        pool,
+@pytest.fixture(scope="session")
+def interest_rate_strategy(account):
+    interest_rate_strategy = DefaultInterestRateStrategy.deploy(
+        OPTIMAL_UTILIZATION_RATE,
+        BASE_VARIABLE_BORROW_RATE,
+        VARIABLE_RATE_SLOPE_1,
+        VARIABLE_RATE_SLOPE_2,
         {"from": account},
     )
 
-    return reserves_manager
+    return interest_rate_strategy
 
 
-@pytest.fixture()
+@pytest.fixture(scope="session")
 def dai(account):
     dai = MockDai.deploy({"from": account})
 
     return dai
 
 
-@pytest.fixture()
+@pytest.fixture(scope="session")
 def account_initial_dai_balance(dai, account):
 
     return dai.balanceOf(account)
 
 
 @pytest.fixture()
+def permit_owner(dai, account):
+    # permits are signed off-chain, their owner is an account with a known private key
+    permit_owner = accounts.add()
+    account.transfer(permit_owner, Web3.toWei(1, "ether"))
+    dai.transfer(permit_owner, SUPPLY_AMOUNT, {"from": account})
+
+    return permit_owner
+
+
+@pytest.fixture(scope="session")
 def link():
     account = get_account(index=2)
     link = LinkTokenMock.deploy({"from": account})
     return link
 
 
-@pytest.fixture()
+@pytest.fixture(scope="session")
 def mock_v3_aggregator(account):
     decimals = 18
     initial_answer = Web3.toWei(PRICE, "ether")
@@ -106,7 +298,18 @@ def mock_v3_aggregator(account):
     return mock_v3_aggregator
 
 
-@pytest.fixture()
+@pytest.fixture(scope="session")
+def fallback_price_feed(account):
+    decimals = 8
+    initial_answer = FALLBACK_PRICE * 10**decimals
+    fallback_price_feed = MockV3Aggregator.deploy(
+        decimals, initial_answer, {"from": account}
+    )
+
+    return fallback_price_feed
+
+
+@pytest.fixture(scope="session")
 def mock_v3_aggregator_link(account):
     decimals = 18
     initial_answer = Web3.toWei(PRICE, "ether")
@@ -119,34 +322,35 @@ def mock_v3_aggregator_link(account):
 
 @pytest.fixture()
 def add_token(
+    chain_snapshots,
     account,
     dai,
     mock_v3_aggregator,
+    interest_rate_strategy,
     pool_configuration,
-    pool_configuration_set_reserves_manager_contract,
 ):
-    name = "DAI"
-    symbol = "DAI"
-    underlying_asset = dai
-    price_feed_address = mock_v3_aggregator
-    decimals = 18
-    base_variable_borrow_rate = BASE_VARIABLE_BORROW_RATE
-    interest_rate_slope = INTEREST_RATE_SLOPE
+    def build():
+        name = "DAI"
+        symbol = "DAI"
+        underlying_asset = dai
+        price_feed_address = mock_v3_aggregator
+        decimals = 18
 
-    add_token_tx = pool_configuration.addToken(
-        name,
-        symbol,
-        underlying_asset,
-        price_feed_address,
-        decimals,
-        base_variable_borrow_rate,
-        interest_rate_slope,
-        {"from": account},
-    )
+        add_token_tx = pool_configuration.addToken(
+            name,
+            symbol,
+            underlying_asset,
+            price_feed_address,
+            decimals,
+            interest_rate_strategy,
+            {"from": account},
+        )
 
-    x_token, debt_token, price_oracle = add_token_tx.return_value
+        x_token, debt_token, price_oracle = add_token_tx.return_value
 
-    return x_token, debt_token, price_oracle
+        return x_token, debt_token, price_oracle
+
+    return chain_snapshots.layer("add_token", build)
 
 
 @pytest.fixture()
@@ -154,16 +358,14 @@ def add_token_link(
     account,
     link,
     mock_v3_aggregator_link,
+    interest_rate_strategy,
     pool_configuration,
-    pool_configuration_set_reserves_manager_contract,
 ):
     name = "LINK"
     symbol = "LINK"
     underlying_asset = link
     price_feed_address = mock_v3_aggregator_link
     decimals = 18
-    base_variable_borrow_rate = BASE_VARIABLE_BORROW_RATE
-    interest_rate_slope = INTEREST_RATE_SLOPE
 
     add_token_tx = pool_configuration.addToken(
         name,
@@ -171,8 +373,7 @@ def add_token_link(
         underlying_asset,
         price_feed_address,
         decimals,
-        base_variable_borrow_rate,
-        interest_rate_slope,
+        interest_rate_strategy,
         {"from": account},
     )
 
@@ -181,82 +382,98 @@ def add_token_link(
     return x_token, debt_token, price_oracle
 
 
-@pytest.fixture()
-def set_pool_configuration_address(account, pool, pool_configuration):
-    pool.setPoolConfigurationAddress(pool_configuration, {"from": account})
-
-
-@pytest.fixture()
-def set_pool_logic_address(account, pool, pool_logic):
-    pool.setPoolLogicAddress(pool_logic, {"from": account})
-
-
-@pytest.fixture()
-def set_reserves_manager_address(account, pool, reserves_manager):
-    pool.setReservesManagerAddress(reserves_manager, {"from": account})
-
-
 @pytest.fixture()
 def supply(
+    chain_snapshots,
     add_token,
-    set_pool_configuration_address,
-    set_reserves_manager_address,
     pool,
     account,
     dai,
 ):
-    dai.approve(pool, SUPPLY_AMOUNT, {"from": account})
-    pool.supply(dai, SUPPLY_AMOUNT, {"from": account})
+    def build():
+        dai.approve(pool, SUPPLY_AMOUNT, {"from": account})
+        pool.supply(dai, SUPPLY_AMOUNT, {"from": account})
 
+    chain_snapshots.layer("supply", build)
 
-@pytest.fixture()
-def price_oracle(account, mock_v3_aggregator):
-    decimals = 18
-    price_oracle = PriceOracleMock.deploy(
-        mock_v3_aggregator, decimals, {"from": account}
+
+@pytest.fixture(scope="session")
+def clones(account):
+    clones = ClonesMock.deploy({"from": account})
+
+    return clones
+
+
+@pytest.fixture(scope="session")
+def price_oracle_implementation(account):
+    price_oracle_implementation = PriceOracle.deploy({"from": account})
+
+    return price_oracle_implementation
+
+
+def clone_price_oracle(clones, price_oracle_implementation, price_feed, account):
+    """
+    creates a clone of the price oracle implementation reading `price_feed`, owned by `account`
+    """
+    clone = clones.clone(price_oracle_implementation, {"from": account}).return_value
+    price_oracle = PriceOracle.at(clone)
+    price_oracle.initialize(price_feed, account, {"from": account})
+
+    return price_oracle
+
+
+@pytest.fixture(scope="session")
+def price_oracle(clones, price_oracle_implementation, mock_v3_aggregator, account):
+    price_oracle = clone_price_oracle(
+        clones, price_oracle_implementation, mock_v3_aggregator, account
     )
 
     return price_oracle
 
 
 @pytest.fixture()
-def borrow(
-    supply, dai, pool, set_pool_logic_address, set_reserves_manager_address, account
-):
-    pool.borrow(dai, BORROW_AMOUNT, dai, {"from": account})
+def borrow(chain_snapshots, supply, dai, pool, account):
+    def build():
+        pool.borrow(dai, BORROW_AMOUNT, {"from": account})
+
+    chain_snapshots.layer("borrow", build)
 
 
 @pytest.fixture()
-def withdraw(
-    supply, dai, pool, set_pool_logic_address, set_reserves_manager_address, account
-):
-    pool.withdraw(dai, WITHDRAW_AMOUNT, {"from": account})
+def withdraw(chain_snapshots, supply, dai, pool, account):
+    def build():
+        pool.withdraw(dai, WITHDRAW_AMOUNT, {"from": account})
+
+    chain_snapshots.layer("withdraw", build)
 
 
 @pytest.fixture()
 def repay(
+    chain_snapshots,
     supply,
     borrow,
     pool,
-    set_pool_logic_address,
-    set_reserves_manager_address,
     dai,
     account,
 ):
-    dai.approve(pool, BORROW_AMOUNT, {"from": account})
-    pool.repay(dai, BORROW_AMOUNT, {"from": account})
+    def build():
+        dai.approve(pool, BORROW_AMOUNT, {"from": account})
+        pool.repay(dai, BORROW_AMOUNT, {"from": account})
+
+    chain_snapshots.layer("repay", build)
 
 
 @pytest.fixture()
-def init_reserve(add_token, reserves_manager, dai, pool_configuration):
+def init_reserve(
+    add_token, reserves_manager, dai, pool_configuration, interest_rate_strategy
+):
 
     x_token = add_token[0]
     debt_token = add_token[1]
 
     reserves_manager.initReserve(
         dai,
-        BASE_VARIABLE_BORROW_RATE,
-        INTEREST_RATE_SLOPE,
+        interest_rate_strategy,
         x_token,
         debt_token,
         {"from": pool_configuration},
@@ -264,13 +481,9 @@ def init_reserve(add_token, reserves_manager, dai, pool_configuration):
 
 
 @pytest.fixture()
-def initial_reserve(add_token):
-    total_deposited = 0
-    total_borrowed = 0
+def initial_reserve(add_token, interest_rate_strategy):
     initial_utilization_rate = 0
     initial_variable_borrow_rate = 0
-    base_variable_borrow_rate = BASE_VARIABLE_BORROW_RATE
-    interest_rate_slope = INTEREST_RATE_SLOPE
     initial_variable_borrow_index = Web3.toWei(1, "ether")
     initial_liquidity_rate = 0
     initial_supply_index = Web3.toWei(1, "ether")
@@ -279,12 +492,9 @@ def initial_reserve(add_token):
     debt_token = add_token[1]
 
     return (
-        total_deposited,
-        total_borrowed,
         initial_utilization_rate,
         initial_variable_borrow_rate,
-        base_variable_borrow_rate,
-        interest_rate_slope,
+        interest_rate_strategy.address,
         initial_variable_borrow_index,
         initial_liquidity_rate,
         initial_supply_index,
@@ -299,7 +509,107 @@ def reserve(reserves_manager, init_reserve, add_token, dai):
     return reserves_manager.getReserve(dai)
 
 
+# gas benchmarks
+
+
 @pytest.fixture(scope="session")
-def skip_live_testing():
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-        pytest.skip("Only for local testing !")
+def gas_report():
+    report = {}
+
+    yield report
+
+    if report:
+        # every xdist worker writes its own part, merged by the controller at the end of the run
+        path = worker_gas_report_path(WORKER_ID) if WORKER_ID else GAS_REPORT_PATH
+        write_gas_report(path, report)
+
+
+def worker_gas_report_path(worker_id):
+    root, extension = os.path.splitext(GAS_REPORT_PATH)
+    return f"{root}.{worker_id}{extension}"
+
+
+def write_gas_report(path, report):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(dict(sorted(report.items())), file, indent=2)
+
+
+def pytest_sessionfinish(session):
+    # only the xdist controller merges the parts written by its workers
+    if WORKER_ID or not getattr(session.config.option, "numprocesses", None):
+        return
+
+    worker_paths = sorted(glob.glob(worker_gas_report_path("gw*")))
+    report = {}
+    for path in worker_paths:
+        with open(path) as file:
+            report.update(json.load(file))
+        os.remove(path)
+    if report:
+        write_gas_report(GAS_REPORT_PATH, report)
+
+
+@pytest.fixture(scope="session")
+def gas_baseline():
+    return load_report(GAS_BASELINE_PATH) if GAS_BASELINE_PATH else {}
+
+
+@pytest.fixture()
+def record_gas(gas_report, gas_baseline):
+    """
+    records the total gas used by one or several transactions under `<path>:<state>:<count>` and
+    returns it, the count is the number of listed reserves or of listings . Fails when the path uses
+    more than `GAS_THRESHOLD` percent gas than in the baseline report
+    """
+
+    def record(path, state, count, *txs):
+        key = f"{path}:{state}:{count}"
+        gas_used = sum(tx.gas_used for tx in txs)
+        gas_report[key] = gas_used
+        if key in gas_baseline:
+            assert not compare(
+                {key: gas_baseline[key]}, {key: gas_used}, GAS_THRESHOLD
+            ), f"{key} : {gas_baseline[key]} -> {gas_used}"
+        return gas_used
+
+    return record
+
+
+@pytest.fixture(params=RESERVE_COUNTS)
+def reserves_count(request):
+    return request.param
+
+
+def list_reserve(pool_configuration, interest_rate_strategy, account, index):
+    token = MockDai.deploy({"from": account})
+    price_feed = MockV3Aggregator.deploy(
+        18, Web3.toWei(PRICE, "ether"), {"from": account}
+    )
+    tx = pool_configuration.addToken(
+        f"TOKEN{index}",
+        f"TKN{index}",
+        token,
+        price_feed,
+        18,
+        interest_rate_strategy,
+        {"from": account},
+    )
+    return token, price_feed, tx
+
+
+@pytest.fixture()
+def listed_reserves(
+    pool, pool_configuration, interest_rate_strategy, account, reserves_count
+):
+    """
+    lists `reserves_count` reserves, returns their (token, price feed) pairs
+    """
+    reserves = []
+    for index in range(reserves_count):
+        token, price_feed, _ = list_reserve(
+            pool_configuration, interest_rate_strategy, account, index
+        )
+        reserves.append((token, price_feed))
+
+    return reserves
@@ -0,0 +1,30 @@
+from brownie import MockDai
+from scripts.utils import get_contract_address
+
+
+def test_addresses_provider_registers_the_protocol_contracts(
+    addresses_provider,
+    pool,
+    pool_configuration,
+    pool_logic,
+    reserves_manager,
+    skip_live_testing,
+):
+
+    # assert
+    assert addresses_provider.getPool() == pool
+    assert addresses_provider.getPoolConfiguration() == pool_configuration
+    assert addresses_provider.getPoolLogic() == pool_logic
+    assert addresses_provider.getReservesManager() == reserves_manager
+
+
+def test_get_contract_address_predicts_deployments(account, skip_live_testing):
+
+    # arrange
+    expected_address = get_contract_address(account, account.nonce)
+
+    # act
+    dai = MockDai.deploy({"from": account})
+
+    # assert
+    assert dai.address == expected_address
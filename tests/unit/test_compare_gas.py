@@ -0,0 +1,26 @@
+from scripts.compare_gas import compare
+
+
+def test_compare_reports_regressions_above_threshold():
+
+    # arrange
+    baseline = {"supply:cold:1": 100000, "borrow:cold:1": 200000, "repay:cold:1": 50000}
+    report = {"supply:cold:1": 101000, "borrow:cold:1": 210000, "repay:cold:1": 40000}
+
+    # act
+    regressions = compare(baseline, report, threshold=2)
+
+    # assert
+    assert regressions == [("borrow:cold:1", 200000, 210000, 5.0)]
+
+
+def test_compare_ignores_paths_missing_from_report():
+
+    # arrange
+    baseline = {"supply:cold:1": 100000}
+
+    # act
+    regressions = compare(baseline, {}, threshold=2)
+
+    # assert
+    assert regressions == []
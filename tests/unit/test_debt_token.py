@@ -4,27 +4,43 @@ from scripts.utils import get_account
 from conftest import BORROW_AMOUNT
 
 
-def test_debt_token_constructor(
-    account, dai, pool, reserves_manager, skip_live_testing
+def test_debt_token_constructor(account, pool, reserves_manager, skip_live_testing):
+
+    # act
+    debt_token = DebtToken.deploy(pool, reserves_manager, {"from": account})
+
+    # assert
+    assert debt_token.poolAddress() == pool
+    assert debt_token.reservesManager() == reserves_manager
+    with reverts("Initializable: contract is already initialized"):
+        debt_token.initialize("debtTEST", "debtTEST", pool, {"from": account})
+
+
+def test_debt_token_initialize(
+    add_token, dai, pool, reserves_manager, skip_live_testing
 ):
 
     # arrange
-    name = "debtTEST"
-    symbol = "debtTEST"
-    pool_address = pool
-
-    # act
-    debt_token = DebtToken.deploy(
-        name, symbol, dai, pool_address, reserves_manager, {"from": account}
-    )
+    debt_token = Contract.from_abi("DebtToken", add_token[1], DebtToken.abi)
 
     # assert
-    assert debt_token.name() == name
-    assert debt_token.symbol() == name
-    assert debt_token.poolAddress() == pool_address
+    assert debt_token.name() == "debtDAI"
+    assert debt_token.symbol() == "debtDAI"
+    assert debt_token.poolAddress() == pool
+    assert debt_token.underlyingAsset() == dai
     assert debt_token.reservesManager() == reserves_manager
 
 
+def test_debt_token_initialize_only_once(add_token, dai, account, skip_live_testing):
+
+    # arrange
+    debt_token = Contract.from_abi("DebtToken", add_token[1], DebtToken.abi)
+
+    # act / assert
+    with reverts("Initializable: contract is already initialized"):
+        debt_token.initialize("debtTEST", "debtTEST", dai, {"from": account})
+
+
 def test_mint_debt_token(
     add_token, account, pool, pool_configuration, dai, skip_live_testing
 ):
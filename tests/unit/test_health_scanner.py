@@ -0,0 +1,105 @@
+import sqlite3
+
+from scripts.health_scanner import (
+    fetch_prices,
+    fetch_supply_indexes,
+    fetch_variable_borrow_indexes,
+    LIQUIDATION_THRESHOLD,
+    load_positions,
+    scan,
+)
+from scripts.indexer import PositionIndexer
+from scripts.utils import get_account
+from conftest import SUPPLY_AMOUNT, BORROW_AMOUNT
+from web3 import Web3
+
+
+def test_scan_matches_get_user_account_data(
+    add_token_link,
+    supply,
+    pool_logic,
+    pool,
+    pool_configuration,
+    reserves_manager,
+    account,
+    dai,
+    link,
+    mock_v3_aggregator_link,
+    tmp_path,
+    skip_live_testing,
+):
+
+    # arrange
+    link.approve(pool, SUPPLY_AMOUNT, {"from": get_account(index=2)})
+    pool.supply(link, SUPPLY_AMOUNT, {"from": get_account(index=2)})
+    pool.borrow(link, BORROW_AMOUNT, {"from": account})
+    mock_v3_aggregator_link.updateAnswer(Web3.toWei(20, "ether"))
+
+    database_path = tmp_path / "positions.db"
+    indexer = PositionIndexer(database_path, pool, pool_configuration, reserves_manager)
+    indexer.sync()
+    indexer.close()
+
+    is_valid, _ = pool_logic.validateLiquidation(account, link, BORROW_AMOUNT, dai)
+    collateral_in_usd, debt_in_usd, _, _ = pool_logic.getUserAccountData(account)
+
+    # act
+    connection = sqlite3.connect(database_path)
+    positions = load_positions(connection)
+    connection.close()
+    liquidatable = scan(
+        positions,
+        fetch_prices(pool_configuration, [dai, link]),
+        fetch_supply_indexes(reserves_manager, [dai, link]),
+        fetch_variable_borrow_indexes(reserves_manager, [dai, link]),
+    )
+
+    # assert
+    # the supplier of LINK has no debt, only the borrower is liquidatable
+    assert is_valid
+    assert len(liquidatable) == 1
+    assert liquidatable[0].user == account
+    assert liquidatable[0].collateral_in_usd == collateral_in_usd
+    assert liquidatable[0].debt_in_usd == debt_in_usd
+    assert liquidatable[0].undercollateralized_amount_in_usd == (
+        debt_in_usd - collateral_in_usd // 10000 * LIQUIDATION_THRESHOLD
+    )
+
+
+def test_scan_sums_positions_of_each_user(skip_live_testing):
+
+    # arrange
+    # the LINK debt of carol is covered by 85% of her DAI and LINK supplies together, not by each alone
+    positions = {
+        "user": ["alice", "bob", "bob", "carol", "carol"],
+        "asset": ["link", "link", "dai", "link", "dai"],
+        "scaled_balance": [
+            0,
+            0,
+            Web3.toWei(50, "ether"),
+            Web3.toWei(15, "ether"),
+            Web3.toWei(30, "ether"),
+        ],
+        "scaled_debt": [
+            Web3.toWei(20, "ether"),
+            Web3.toWei(40, "ether"),
+            0,
+            Web3.toWei(20, "ether"),
+            0,
+        ],
+    }
+    prices = {"link": Web3.toWei(20, "ether"), "dai": Web3.toWei(10, "ether")}
+    indexes = {"link": 10**18, "dai": 10**18}
+
+    # act
+    liquidatable = scan(positions, prices, indexes, indexes)
+
+    # assert
+    assert [account.user for account in liquidatable] == ["alice", "bob"]
+    assert liquidatable[0].undercollateralized_amount_in_usd == Web3.toWei(
+        20 * 20, "ether"
+    )
+    # the debt of bob above 85% of the DAI supplied by bob
+    assert liquidatable[1].undercollateralized_amount_in_usd == Web3.toWei(
+        40 * 20 - 50 * 10 * 85 // 100, "ether"
+    )
@@ -0,0 +1,92 @@
+from brownie import Contract, XToken, DebtToken, chain
+from scripts.indexer import PositionIndexer
+from conftest import SUPPLY_AMOUNT, BORROW_AMOUNT
+
+
+def get_position(indexer, user, asset):
+    return indexer.connection.execute(
+        "SELECT supplied, scaled_x_balance, scaled_debt_balance "
+        "FROM positions WHERE user = ? AND underlying_asset = ?",
+        (str(user), str(asset)),
+    ).fetchone()
+
+
+def test_indexer_materializes_positions(
+    borrow,
+    pool,
+    pool_configuration,
+    reserves_manager,
+    dai,
+    account,
+    tmp_path,
+    skip_live_testing,
+):
+
+    # arrange
+    x_token = Contract.from_abi(
+        "XToken", pool_configuration.underlyingAssetToXtoken(dai), XToken.abi
+    )
+    debt_token = Contract.from_abi(
+        "DebtToken", pool_configuration.underlyingAssetToDebtToken(dai), DebtToken.abi
+    )
+    # a small chunk size exercises the chunked streaming
+    indexer = PositionIndexer(
+        tmp_path / "positions.db", pool, pool_configuration, reserves_manager, 3
+    )
+
+    # act
+    indexer.sync()
+
+    # assert
+    supplied, scaled_x_balance, scaled_debt_balance = get_position(
+        indexer, account, dai
+    )
+    assert int(supplied) == SUPPLY_AMOUNT
+    assert int(scaled_x_balance) == x_token.scaledBalanceOf(account)
+    assert int(scaled_debt_balance) == debt_token.scaledBalanceOf(account)
+    assert int(scaled_debt_balance) == BORROW_AMOUNT
+
+    reserve = indexer.connection.execute(
+        "SELECT x_token, debt_token, supply_index, variable_borrow_index "
+        "FROM reserves WHERE underlying_asset = ?",
+        (dai.address,),
+    ).fetchone()
+    assert reserve[0] == x_token.address
+    assert reserve[1] == debt_token.address
+    assert int(reserve[2]) == reserves_manager.getSupplyIndex(dai)
+    assert int(reserve[3]) == reserves_manager.getVariableBorrowIndex(dai)
+    assert indexer.checkpoint() == chain.height
+    indexer.close()
+
+
+def test_indexer_resumes_from_checkpoint(
+    supply,
+    pool,
+    pool_configuration,
+    reserves_manager,
+    dai,
+    account,
+    tmp_path,
+    skip_live_testing,
+):
+
+    # arrange
+    database_path = tmp_path / "positions.db"
+    indexer = PositionIndexer(database_path, pool, pool_configuration, reserves_manager)
+    indexer.sync()
+    indexer.close()
+    checkpoint = chain.height
+    dai.approve(pool, SUPPLY_AMOUNT, {"from": account})
+    pool.supply(dai, SUPPLY_AMOUNT, {"from": account})
+
+    # act
+    indexer = PositionIndexer(database_path, pool, pool_configuration, reserves_manager)
+    assert indexer.checkpoint() == checkpoint
+    indexer.sync()
+
+    # assert
+    supplied, scaled_x_balance, _ = get_position(indexer, account, dai)
+    assert int(supplied) == 2 * SUPPLY_AMOUNT
+    assert int(scaled_x_balance) == 2 * SUPPLY_AMOUNT
+    assert indexer.checkpoint() == chain.height
+    indexer.close()
@@ -0,0 +1,100 @@
+from brownie import DefaultInterestRateStrategy
+from scripts.list_reserves import list_reserves, split_by_gas
+from conftest import (
+    OPTIMAL_UTILIZATION_RATE,
+    BASE_VARIABLE_BORROW_RATE,
+    VARIABLE_RATE_SLOPE_1,
+    VARIABLE_RATE_SLOPE_2,
+)
+
+RATES = {
+    "optimal_utilization_rate": 0.8,
+    "base_variable_borrow_rate": 0,
+    "variable_rate_slope_1": 0.04,
+    "variable_rate_slope_2": 0.75,
+}
+
+
+def manifest_entry(symbol, underlying_asset, price_feed):
+    return {
+        "name": symbol,
+        "symbol": symbol,
+        "underlying_asset": underlying_asset.address,
+        "price_feed": price_feed.address,
+        "decimals": 18,
+        "interest_rate_strategy": RATES,
+    }
+
+
+def test_split_by_gas_fills_batches_up_to_the_limit():
+
+    # arrange
+    items = [10, 20, 30, 40, 5]
+
+    # act
+    batches = list(split_by_gas(items, sum, 50))
+
+    # assert
+    assert batches == [[10, 20], [30], [40, 5]]
+
+
+def test_split_by_gas_keeps_an_item_above_the_limit_alone():
+
+    # act
+    batches = list(split_by_gas([10, 80, 10], sum, 50))
+
+    # assert
+    assert batches == [[10], [80], [10]]
+
+
+def test_list_reserves(
+    pool_configuration,
+    dai,
+    link,
+    mock_v3_aggregator,
+    mock_v3_aggregator_link,
+    skip_live_testing,
+):
+
+    # arrange
+    manifest = [
+        manifest_entry("DAI", dai, mock_v3_aggregator),
+        manifest_entry("LINK", link, mock_v3_aggregator_link),
+    ]
+
+    # act
+    txs = list_reserves(manifest, pool_configuration)
+
+    # assert
+    # both tokens fit in a single transaction and share the strategy of their identical rates
+    assert len(txs) == 1
+    assert pool_configuration.getTokens() == [dai, link]
+    strategy = DefaultInterestRateStrategy[-1]
+    assert strategy.optimalUtilizationRate() == OPTIMAL_UTILIZATION_RATE
+    assert strategy.baseVariableBorrowRate() == BASE_VARIABLE_BORROW_RATE
+    assert strategy.variableRateSlope1() == VARIABLE_RATE_SLOPE_1
+    assert strategy.variableRateSlope2() == VARIABLE_RATE_SLOPE_2
+
+
+def test_list_reserves_skips_listed_tokens(
+    add_token,
+    pool_configuration,
+    dai,
+    link,
+    mock_v3_aggregator,
+    mock_v3_aggregator_link,
+    skip_live_testing,
+):
+
+    # arrange
+    manifest = [
+        manifest_entry("DAI", dai, mock_v3_aggregator),
+        manifest_entry("LINK", link, mock_v3_aggregator_link),
+    ]
+
+    # act
+    txs = list_reserves(manifest, pool_configuration)
+
+    # assert
+    assert [event["underlyingAsset"] for event in txs[0].events["TokenAdded"]] == [link]
+    assert pool_configuration.getTokens() == [dai, link]
@@ -1,85 +1,83 @@
-from scripts.utils import get_account
-from brownie import reverts, Contract, XToken, DebtToken, chain
+from scripts.utils import get_account, sign_permit
+from brownie import Pool, reverts, Contract, XToken, DebtToken, chain
 from web3 import Web3
 from conftest import (
     SUPPLY_AMOUNT,
     WITHDRAW_AMOUNT,
     BORROW_AMOUNT,
-    BASE_VARIABLE_BORROW_RATE,
-    INTEREST_RATE_SLOPE,
 )
 
+REBALANCE_DAI_AMOUNT = Web3.toWei(130, "ether")
 
-def test_set_pool_configuration_address(
-    set_pool_configuration_address, pool, pool_configuration, skip_live_testing
-):
-
-    # assert
-    assert pool.poolConfiguration() == pool_configuration
-
-
-def test_only_owner_can_set_pool_configuration_address(
-    pool, pool_configuration, skip_live_testing
-):
 
-    # arrange
-    non_owner = get_account(index=2)
-
-    # act / assert
-    with reverts():
-        pool.setPoolConfigurationAddress(pool_configuration, {"from": non_owner})
+def count_price_oracle_reads(tx):
+    return len(
+        [
+            subcall
+            for subcall in tx.subcalls
+            if subcall.get("function", "").startswith("getLatestPrice")
+        ]
+    )
 
 
-def test_set_pool_logic_address(
-    set_pool_logic_address, pool, pool_logic, skip_live_testing
+def test_pool_constructor(
+    addresses_provider,
+    pool,
+    pool_configuration,
+    pool_logic,
+    reserves_manager,
+    skip_live_testing,
 ):
 
     # assert
+    assert addresses_provider.getPool() == pool
+    assert pool.poolConfiguration() == pool_configuration
     assert pool.poolLogic() == pool_logic
+    assert pool.reservesManager() == reserves_manager
 
 
-def test_only_owner_can_set_pool_logic_address(pool, pool_logic, skip_live_testing):
-
-    # arrange
-    non_owner = get_account(index=2)
+def test_pool_unexpected_deployment_address(
+    addresses_provider, account, skip_live_testing
+):
 
     # act / assert
-    with reverts():
-        pool.setPoolConfigurationAddress(pool_logic, {"from": non_owner})
+    with reverts("unexpected deployment address"):
+        Pool.deploy(addresses_provider, {"from": account})
 
 
-def test_set_reserves_manager_address(
-    set_reserves_manager_address, pool, reserves_manager, skip_live_testing
-):
+def test_add_token_caches_reserve_components(add_token, pool, dai, skip_live_testing):
+
+    # arrange
+    x_token, debt_token, price_oracle = add_token
 
     # assert
-    assert pool.reservesManager() == reserves_manager
+    assert pool.underlyingAssetToReserveComponents(dai) == (
+        x_token,
+        True,
+        0,
+        debt_token,
+        1,
+        price_oracle,
+    )
 
 
-def test_only_owner_can_set_reserves_manager_address(
-    pool, reserves_manager, skip_live_testing
+def test_only_pool_configuration_can_init_reserve_components(
+    pool, dai, account, skip_live_testing
 ):
 
-    # arrange
-    non_owner = get_account(index=2)
-
     # act / assert
-    with reverts():
-        pool.setReservesManagerAddress(reserves_manager, {"from": non_owner})
+    with reverts("caller must be pool configuration"):
+        pool.initReserveComponents(dai, 0, dai, dai, 1, dai, {"from": account})
 
 
-def test_supply_null_amount(
-    set_pool_configuration_address, add_token, account, pool, dai, skip_live_testing
-):
+def test_supply_null_amount(add_token, account, pool, dai, skip_live_testing):
 
     # act / assert
     with reverts("insufficient amount"):
         pool.supply(dai, 0, {"from": account})
 
 
-def test_supply_non_available_token(
-    set_pool_configuration_address, add_token, account, pool, link, skip_live_testing
-):
+def test_supply_non_available_token(add_token, account, pool, link, skip_live_testing):
 
     # arrange
     amount = Web3.toWei(100, "ether")
@@ -119,14 +117,6 @@ def test_supply_mint_xtoken_to_supplier(
     assert x_token_contract.balanceOf(account) == SUPPLY_AMOUNT
 
 
-def test_supply_map_user_to_collateral_to_amount(
-    supply, account, dai, pool_configuration, pool, skip_live_testing
-):
-
-    # assert
-    assert pool.userToCollateralToAmount(account, dai) == SUPPLY_AMOUNT
-
-
 def test_borrow_transfer_funds_from_xtoken_to_borrower(
     borrow, pool_configuration, dai, skip_live_testing
 ):
@@ -139,27 +129,17 @@ def test_borrow_transfer_funds_from_xtoken_to_borrower(
     assert dai.balanceOf(x_token_address) == SUPPLY_AMOUNT - BORROW_AMOUNT
 
 
-def test_borrow_burn_amount_of_xtoken(
+def test_borrow_keeps_xtoken_of_borrower(
     borrow, pool_configuration, dai, account, skip_live_testing
 ):
 
     # arrange
     x_token_address = pool_configuration.underlyingAssetToXtoken(dai)
     x_token_contract = Contract.from_abi("XToken", x_token_address, XToken.abi)
-    expected = Web3.toWei(25, "ether")
-
-    # assert
-    assert int(x_token_contract.balanceOf(account) / (10**18)) == (
-        SUPPLY_AMOUNT - BORROW_AMOUNT
-    ) / (10**18)
-
-
-def test_borrow_map_user_asset_borrowed_to_collateral(
-    borrow, pool, account, dai, skip_live_testing
-):
 
     # assert
-    assert pool.userToBorrowedAssetToCollateral(account, dai) == dai
+    # the supplied balance backs the debt, it is not moved
+    assert x_token_contract.balanceOf(account) >= SUPPLY_AMOUNT
 
 
 def test_borrow_mint_debt_token(
@@ -176,25 +156,99 @@ def test_borrow_mint_debt_token(
     assert debt_token_contract.balanceOf(account) != 0
 
 
-def test_borrow_map_user_to_borrowed_asset_to_collateral(
-    borrow,
-    pool_configuration,
+def test_borrow_reads_each_price_oracle_once(
+    supply,
     dai,
-    account,
     pool,
-    add_token_link,
-    link,
+    account,
+    record_gas,
     skip_live_testing,
 ):
 
+    # act
+    tx = pool.borrow(dai, BORROW_AMOUNT, {"from": account})
+
+    # assert
+    record_gas("priceReads:borrow", "cold", 1, tx)
+    assert count_price_oracle_reads(tx) == 1
+
+
+def test_borrow_reads_reserve_components_from_pool(
+    supply, pool, pool_configuration, dai, account, skip_live_testing
+):
+
+    # act
+    tx = pool.borrow(dai, BORROW_AMOUNT, {"from": account})
+
+    # assert
+    # PoolLogic reads the components cached by the Pool, PoolConfiguration is not called
+    assert not [
+        subcall
+        for subcall in tx.subcalls
+        if subcall["to"] == pool_configuration.address
+    ]
+
+
+def test_borrow_against_whole_portfolio(
+    supply, add_token_link, pool, pool_configuration, dai, link, account, skip_live_testing
+):
+
     # arrange
-    debt_token_address = pool_configuration.underlyingAssetToDebtToken(dai)
-    debt_token_contract = Contract.from_abi(
-        "DebtToken", debt_token_address, DebtToken.abi
+    # 100 DAI alone allow to borrow 750 USD, 100 DAI and 100 LINK at 10 USD allow 1500 USD
+    link.transfer(account, SUPPLY_AMOUNT, {"from": get_account(index=2)})
+    link.approve(pool, SUPPLY_AMOUNT, {"from": account})
+    pool.supply(link, SUPPLY_AMOUNT, {"from": account})
+    debt_token = Contract.from_abi(
+        "DebtToken", pool_configuration.underlyingAssetToDebtToken(dai), DebtToken.abi
     )
 
+    # 950 USD, the DAI reserve is used up to its maximum utilization rate
+    amount = Web3.toWei(95, "ether")
+
+    # act
+    tx = pool.borrow(dai, amount, {"from": account})
+
+    # assert
+    # the debt is read at the borrow block, before the index compounds
+    assert tx.return_value == amount
+    assert debt_token.balanceOf(account, block_identifier=tx.block_number) == amount
+    assert pool.userConfigurations(account) == 0b11 | 0b10 << 2
+
+
+def test_borrow_above_portfolio_borrowing_power(
+    supply, add_token_link, pool, dai, link, account, skip_live_testing
+):
+
+    # arrange
+    link.transfer(account, SUPPLY_AMOUNT, {"from": get_account(index=2)})
+    link.approve(pool, SUPPLY_AMOUNT, {"from": account})
+    pool.supply(link, SUPPLY_AMOUNT, {"from": account})
+
+    # act
+    tx = pool.borrow(link, Web3.toWei(151, "ether"), {"from": account})
+
+    # assert
+    assert tx.return_value == 0
+    assert "Borrow" not in tx.events
+
+
+def test_borrow_above_max_utilization_rate(
+    supply, add_token_link, pool, dai, link, account, skip_live_testing
+):
+
+    # arrange
+    # the LINK collateral covers the borrow, only the DAI liquidity limits it
+    link.transfer(account, SUPPLY_AMOUNT, {"from": get_account(index=2)})
+    link.approve(pool, SUPPLY_AMOUNT, {"from": account})
+    pool.supply(link, SUPPLY_AMOUNT, {"from": account})
+
+    # act
+    tx = pool.borrow(dai, Web3.toWei(96, "ether"), {"from": account})
+
     # assert
-    assert pool.userToBorrowedAssetToCollateral(account, dai) == dai
+    # 96 of the 100 DAI deposited would be borrowed, above the 95% maximum utilization rate
+    assert tx.return_value == 0
+    assert "Borrow" not in tx.events
 
 
 def test_withdraw_transfer_funds_from_xtoken_to_withdrawer(
@@ -226,12 +280,144 @@ def test_withdraw_burn_amount_of_xtoken(
     assert x_token_contract.balanceOf(account) == 0
 
 
-def test_withdraw_decrease_user_to_callateral_to_amount(
-    withdraw, pool_configuration, dai, account, pool, skip_live_testing
+def test_withdraw_below_debt_coverage(borrow, pool, dai, account, skip_live_testing):
+
+    # act
+    # the 75 DAI debt needs the whole 100 DAI supply
+    tx = pool.withdraw(dai, Web3.toWei(1, "ether"), {"from": account})
+
+    # assert
+    assert tx.return_value == 0
+    assert "Withdraw" not in tx.events
+
+
+def test_supply_flags_reserve_as_supplied(supply, pool, account, skip_live_testing):
+
+    # assert
+    assert pool.userConfigurations(account) == 0b10
+
+
+def test_borrow_flags_reserve_as_borrowed(borrow, pool, account, skip_live_testing):
+
+    # assert
+    assert pool.userConfigurations(account) == 0b11
+
+
+def test_withdraw_whole_balance_clears_supplied_flag(
+    withdraw, pool, account, skip_live_testing
+):
+
+    # assert
+    assert pool.userConfigurations(account) == 0
+
+
+def test_repay_whole_debt_clears_borrowed_flag(
+    supply, pool, dai, account, skip_live_testing
+):
+
+    # arrange
+    # borrowed and repaid in the same block, the debt is repaid without interest
+    dai.approve(pool, BORROW_AMOUNT, {"from": account})
+    actions = [
+        pool.borrow.encode_input(dai, BORROW_AMOUNT),
+        pool.repay.encode_input(dai, BORROW_AMOUNT),
+    ]
+
+    # act
+    pool.multicall(actions, {"from": account})
+
+    # assert
+    assert pool.userConfigurations(account) == 0b10
+
+
+def test_xtoken_transfer_flags_reserve_of_recipient(
+    add_token, supply, pool, account, skip_live_testing
+):
+
+    # arrange
+    recipient = get_account(index=1)
+    x_token = Contract.from_abi("XToken", add_token[0], XToken.abi)
+
+    # act
+    x_token.transfer(recipient, Web3.toWei(10, "ether"), {"from": account})
+
+    # assert
+    assert pool.userConfigurations(recipient) == 0b10
+
+
+def test_xtoken_transfer_of_whole_balance_clears_supplied_flag_of_sender(
+    add_token, supply, pool, account, skip_live_testing
 ):
 
+    # arrange
+    # nothing is borrowed, the supply index stays at 1 and the balance is exactly SUPPLY_AMOUNT
+    recipient = get_account(index=1)
+    x_token = Contract.from_abi("XToken", add_token[0], XToken.abi)
+
+    # act
+    x_token.transfer(recipient, SUPPLY_AMOUNT, {"from": account})
+
     # assert
-    assert pool.userToCollateralToAmount(account, dai) == 0
+    assert pool.userConfigurations(account) == 0
+    assert pool.userConfigurations(recipient) == 0b10
+
+
+def test_xtoken_transfer_below_debt_coverage(
+    add_token, borrow, account, skip_live_testing
+):
+
+    # arrange
+    # 75 DAI borrowed against 100 DAI, 90 DAI left would only cover 67.5 DAI
+    recipient = get_account(index=1)
+    x_token = Contract.from_abi("XToken", add_token[0], XToken.abi)
+
+    # act / assert
+    with reverts("transfer would leave debt uncovered"):
+        x_token.transfer(recipient, Web3.toWei(10, "ether"), {"from": account})
+
+
+def test_xtoken_transfer_of_debt_free_holder(
+    add_token, borrow, pool, dai, account, skip_live_testing
+):
+
+    # arrange
+    # the reserve is borrowed from, only the debts of the sender are checked
+    holder = get_account(index=1)
+    recipient = get_account(index=2)
+    dai.transfer(holder, SUPPLY_AMOUNT, {"from": account})
+    dai.approve(pool, SUPPLY_AMOUNT, {"from": holder})
+    pool.supply(dai, SUPPLY_AMOUNT, {"from": holder})
+    x_token = Contract.from_abi("XToken", add_token[0], XToken.abi)
+
+    # act
+    x_token.transfer(recipient, BORROW_AMOUNT, {"from": holder})
+
+    # assert
+    assert x_token.scaledBalanceOf(recipient) > 0
+    assert pool.userConfigurations(holder) == 0b10
+    assert pool.userConfigurations(recipient) == 0b10
+
+
+def test_only_xtoken_can_finalize_transfer(
+    add_token, pool, dai, account, skip_live_testing
+):
+
+    # act / assert
+    with reverts("caller must be xToken"):
+        pool.finalizeTransfer(
+            dai, account, account, SUPPLY_AMOUNT, {"from": account}
+        )
+
+
+def test_reserve_ids_follow_listing_order(
+    add_token, add_token_link, pool, dai, link, skip_live_testing
+):
+
+    # assert
+    assert pool.underlyingAssetToReserveComponents(dai)[2] == 0
+    assert pool.underlyingAssetToReserveComponents(link)[2] == 1
+    assert pool.getReserveComponentsById(0) == pool.getReserveComponents(dai)
+    assert pool.getReserveComponentsById(1) == pool.getReserveComponents(link)
 
 
 def test_repay_invalid_insufficient_amount(
@@ -282,7 +468,7 @@ def test_repay_transfer_funds_from_user_account_to_xtoken(
     assert dai.balanceOf(x_token_address) == SUPPLY_AMOUNT
 
 
-def test_repay_mint_xtoken_to_user(
+def test_repay_keeps_xtoken_of_user(
     repay, account, pool, pool_configuration, dai, skip_live_testing
 ):
 
@@ -291,7 +477,7 @@ def test_repay_mint_xtoken_to_user(
     x_token_contract = Contract.from_abi("XToken", x_token_address, XToken.abi)
 
     # assert
-    assert x_token_contract.balanceOf(account) != 0
+    assert x_token_contract.balanceOf(account) >= SUPPLY_AMOUNT
 
 
 def test_repay_burn_debt_token(
@@ -305,20 +491,23 @@ def test_repay_burn_debt_token(
     )
 
     # assert
-    assert debt_token_contract.balanceOf(account) == 0
+    # only the interest accrued between the borrow and the repay blocks is left
+    assert debt_token_contract.balanceOf(account) < Web3.toWei(0.0001, "ether")
 
 
 def test_update_state_on_supply(
-    supply, add_token, reserves_manager, dai, skip_live_testing
+    supply,
+    add_token,
+    interest_rate_strategy,
+    reserves_manager,
+    dai,
+    skip_live_testing,
 ):
 
     # arrange
-    total_deposited = SUPPLY_AMOUNT
-    total_borrowed = 0
     utilization_rate = Web3.toWei(0, "ether")
     variable_borrow_rate = Web3.toWei(0, "ether")
-    base_variable_borrow_rate = BASE_VARIABLE_BORROW_RATE
-    interest_rate_slope = INTEREST_RATE_SLOPE
+    interest_rate_strategy_address = interest_rate_strategy.address
     variable_borrow_index = Web3.toWei(1, "ether")
     liquidity_rate = Web3.toWei(0, "ether")
     supply_index = Web3.toWei(1, "ether")
@@ -327,12 +516,9 @@ def test_update_state_on_supply(
     debt_token = add_token[1]
 
     expected_updated_reserve = (
-        total_deposited,
-        total_borrowed,
         utilization_rate,
         variable_borrow_rate,
-        base_variable_borrow_rate,
-        interest_rate_slope,
+        interest_rate_strategy_address,
         variable_borrow_index,
         liquidity_rate,
         supply_index,
@@ -346,44 +532,31 @@ def test_update_state_on_supply(
 
 
 def test_update_state_on_borrow(
-    borrow, add_token, reserves_manager, dai, skip_live_testing
+    borrow,
+    add_token,
+    interest_rate_strategy,
+    reserves_manager,
+    dai,
+    skip_live_testing,
 ):
 
     # arrange
-    total_deposited = SUPPLY_AMOUNT
-    total_borrowed = BORROW_AMOUNT
     utilization_rate = Web3.toWei(0.75, "ether")
-    variable_borrow_rate = Web3.toWei(3.75, "ether")
-    base_variable_borrow_rate = BASE_VARIABLE_BORROW_RATE
-    interest_rate_slope = INTEREST_RATE_SLOPE
-    variable_borrow_index = Web3.toWei(
-        1 * (1 + (Web3.fromWei(variable_borrow_rate, "ether") / 31536000) * 1),
-        "ether",
-    )
-    variable_borrow_index_2 = Web3.toWei(
-        1 * (1 + (Web3.fromWei(variable_borrow_rate, "ether") / 31536000) * 2),
-        "ether",
-    )
-    liquidity_rate = Web3.toWei(3.75 * 0.75, "ether")
-    supply_index = Web3.toWei(
-        1 * (1 + (Web3.fromWei(liquidity_rate, "ether") / 31536000) * 1),
-        "ether",
-    )
-    supply_index_2 = Web3.toWei(
-        1 * (1 + (Web3.fromWei(liquidity_rate, "ether") / 31536000) * 2),
-        "ether",
-    )
+    variable_borrow_rate = Web3.toWei(0.0375, "ether")
+    interest_rate_strategy_address = interest_rate_strategy.address
+    # the indexes accrue at the rates in effect before the borrow, which were null
+    variable_borrow_index = Web3.toWei(1, "ether")
+    # the variable borrow rate times the utilization rate, 0.0375 * 0.75
+    liquidity_rate = Web3.toWei(0.028125, "ether")
+    supply_index = Web3.toWei(1, "ether")
     last_update_time = chain[-1].timestamp
     x_token = add_token[0]
     debt_token = add_token[1]
 
     expected_updated_reserve = (
-        total_deposited,
-        total_borrowed,
         utilization_rate,
         variable_borrow_rate,
-        base_variable_borrow_rate,
-        interest_rate_slope,
+        interest_rate_strategy_address,
         variable_borrow_index,
         liquidity_rate,
         supply_index,
@@ -392,42 +565,23 @@ def test_update_state_on_borrow(
         debt_token,
     )
 
-    expected_updated_reserve_2 = (
-        total_deposited,
-        total_borrowed,
-        utilization_rate,
-        variable_borrow_index,
-        base_variable_borrow_rate,
-        interest_rate_slope,
-        variable_borrow_index_2,
-        liquidity_rate,
-        supply_index_2,
-        last_update_time,
-        x_token,
-        debt_token,
-    )
-
-    print(len(reserves_manager.getReserve(dai)))
-    print(len(expected_updated_reserve))
-
     # assert
-    assert (
-        reserves_manager.getReserve(dai) == expected_updated_reserve
-        or expected_updated_reserve_2
-    )
+    assert reserves_manager.getReserve(dai) == expected_updated_reserve
 
 
 def test_update_state_on_withdraw(
-    withdraw, add_token, reserves_manager, dai, skip_live_testing
+    withdraw,
+    add_token,
+    interest_rate_strategy,
+    reserves_manager,
+    dai,
+    skip_live_testing,
 ):
 
     # arrange
-    total_deposited = 0
-    total_borrowed = 0
     utilization_rate = Web3.toWei(0, "ether")
     variable_borrow_rate = Web3.toWei(0, "ether")
-    base_variable_borrow_rate = BASE_VARIABLE_BORROW_RATE
-    interest_rate_slope = INTEREST_RATE_SLOPE
+    interest_rate_strategy_address = interest_rate_strategy.address
     variable_borrow_index = Web3.toWei(
         1,
         "ether",
@@ -439,12 +593,9 @@ def test_update_state_on_withdraw(
     debt_token = add_token[1]
 
     expected_updated_reserve = (
-        total_deposited,
-        total_borrowed,
         utilization_rate,
         variable_borrow_rate,
-        base_variable_borrow_rate,
-        interest_rate_slope,
+        interest_rate_strategy_address,
         variable_borrow_index,
         liquidity_rate,
         supply_index,
@@ -458,32 +609,31 @@ def test_update_state_on_withdraw(
 
 
 def test_update_state_on_repay(
-    repay, add_token, reserves_manager, dai, skip_live_testing
+    repay,
+    add_token,
+    interest_rate_strategy,
+    reserves_manager,
+    dai,
+    skip_live_testing,
 ):
 
     # arrange
-    total_deposited = SUPPLY_AMOUNT
-    total_borrowed = 0
     utilization_rate = Web3.toWei(0, "ether")
     variable_borrow_rate = Web3.toWei(0, "ether")
-    base_variable_borrow_rate = BASE_VARIABLE_BORROW_RATE
-    interest_rate_slope = INTEREST_RATE_SLOPE
-    variable_borrow_index = Web3.toWei(1 * (1 + 3.75 / 31536000) * 1, "ether")
-    variable_borrow_index_2 = Web3.toWei(1 * (1 + 3.75 / 31536000) * 2, "ether")
+    interest_rate_strategy_address = interest_rate_strategy.address
+    variable_borrow_index = Web3.toWei(1 * (1 + 0.0375 / 31536000) * 1, "ether")
+    variable_borrow_index_2 = Web3.toWei(1 * (1 + 0.0375 / 31536000) * 2, "ether")
     liquidity_rate = Web3.toWei(0, "ether")
-    supply_index = Web3.toWei(1 * (1 + (3.75 * 0.75) / 31536000) * 1, "ether")
-    supply_index_2 = Web3.toWei(1 * (1 + (3.75 * 0.75) / 31536000) * 2, "ether")
+    supply_index = Web3.toWei(1 * (1 + (0.0375 * 0.75) / 31536000) * 1, "ether")
+    supply_index_2 = Web3.toWei(1 * (1 + (0.0375 * 0.75) / 31536000) * 2, "ether")
     last_update_time = chain[-1].timestamp
     x_token = add_token[0]
     debt_token = add_token[1]
 
     expected_updated_reserve = (
-        total_deposited,
-        total_borrowed,
         utilization_rate,
         variable_borrow_rate,
-        base_variable_borrow_rate,
-        interest_rate_slope,
+        interest_rate_strategy_address,
         variable_borrow_index,
         liquidity_rate,
         supply_index,
@@ -493,12 +643,9 @@ def test_update_state_on_repay(
     )
 
     expected_updated_reserve_2 = (
-        total_deposited,
-        total_borrowed,
         utilization_rate,
         variable_borrow_rate,
-        base_variable_borrow_rate,
-        interest_rate_slope,
+        interest_rate_strategy_address,
         variable_borrow_index_2,
         liquidity_rate,
         supply_index_2,
@@ -518,9 +665,6 @@ def test_liquidation_call_nul_amount(
     add_token_link,
     supply,
     add_token,
-    set_pool_configuration_address,
-    set_reserves_manager_address,
-    set_pool_logic_address,
     pool_logic,
     pool,
     account,
@@ -533,7 +677,7 @@ def test_liquidation_call_nul_amount(
     # arrange
     link.approve(pool, SUPPLY_AMOUNT, {"from": get_account(index=2)})
     pool.supply(link, SUPPLY_AMOUNT, {"from": get_account(index=2)})
-    pool.borrow(link, BORROW_AMOUNT, dai, {"from": account})
+    pool.borrow(link, BORROW_AMOUNT, {"from": account})
 
     new_price = Web3.toWei(20, "ether")
 
@@ -551,9 +695,6 @@ def test_liquidation_call_big_amount(
     add_token_link,
     supply,
     add_token,
-    set_pool_configuration_address,
-    set_reserves_manager_address,
-    set_pool_logic_address,
     pool_logic,
     pool,
     account,
@@ -566,17 +707,45 @@ def test_liquidation_call_big_amount(
     # arrange
     link.approve(pool, SUPPLY_AMOUNT, {"from": get_account(index=2)})
     pool.supply(link, SUPPLY_AMOUNT, {"from": get_account(index=2)})
-    pool.borrow(link, BORROW_AMOUNT, dai, {"from": account})
+    pool.borrow(link, BORROW_AMOUNT, {"from": account})
 
     new_price = Web3.toWei(20, "ether")
 
     mock_v3_aggregator_link.updateAnswer(new_price)
 
     # act / assert
-    link.approve(pool, Web3.toWei(51, "ether"), {"from": get_account(index=2)})
-    with reverts("amount exceeds undercollateralized amount"):
+    link.approve(pool, Web3.toWei(76, "ether"), {"from": get_account(index=2)})
+    with reverts("amount exceeds debt"):
+        pool.liquidationCall.call(
+            account, link, Web3.toWei(76, "ether"), dai, {"from": get_account(index=2)}
+        )
+
+
+def test_liquidation_call_amount_exceeds_collateral(
+    add_token_link,
+    supply,
+    add_token,
+    pool,
+    account,
+    dai,
+    link,
+    mock_v3_aggregator_link,
+    skip_live_testing,
+):
+
+    # arrange
+    link.approve(pool, SUPPLY_AMOUNT, {"from": get_account(index=2)})
+    pool.supply(link, SUPPLY_AMOUNT, {"from": get_account(index=2)})
+    pool.borrow(link, BORROW_AMOUNT, {"from": account})
+    mock_v3_aggregator_link.updateAnswer(Web3.toWei(20, "ether"))
+
+    # act / assert
+    # 48 LINK at 20 USD are worth 96 DAI, 100.8 with the 5% liquidation bonus, the user only
+    # supplied 100
+    link.approve(pool, Web3.toWei(48, "ether"), {"from": get_account(index=2)})
+    with reverts("amount exceeds collateral"):
         pool.liquidationCall.call(
-            account, link, Web3.toWei(51, "ether"), dai, {"from": get_account(index=2)}
+            account, link, Web3.toWei(48, "ether"), dai, {"from": get_account(index=2)}
         )
 
 
@@ -584,9 +753,6 @@ def test_liquidation_transform_asset_from_liquidator_to_xtoken_contract(
     add_token_link,
     supply,
     add_token,
-    set_pool_configuration_address,
-    set_reserves_manager_address,
-    set_pool_logic_address,
     pool_logic,
     pool,
     pool_configuration,
@@ -600,14 +766,14 @@ def test_liquidation_transform_asset_from_liquidator_to_xtoken_contract(
     # arrange
     link.approve(pool, SUPPLY_AMOUNT, {"from": get_account(index=2)})
     pool.supply(link, SUPPLY_AMOUNT, {"from": get_account(index=2)})
-    pool.borrow(link, BORROW_AMOUNT, dai, {"from": account})
+    pool.borrow(link, BORROW_AMOUNT, {"from": account})
 
     x_token_address = pool_configuration.underlyingAssetToXtoken(link)
     new_price = Web3.toWei(20, "ether")
 
     mock_v3_aggregator_link.updateAnswer(new_price)
 
-    liquidation_call_amount = Web3.toWei(50, "ether")
+    liquidation_call_amount = Web3.toWei(40, "ether")
 
     # act
     link.approve(pool, liquidation_call_amount, {"from": get_account(index=2)})
@@ -622,13 +788,10 @@ def test_liquidation_transform_asset_from_liquidator_to_xtoken_contract(
     )
 
 
-def test_liquidation_mint_collateral_xtoken_to_liquidator(
+def test_liquidation_transfer_collateral_to_liquidator(
     add_token_link,
     supply,
     add_token,
-    set_pool_configuration_address,
-    set_reserves_manager_address,
-    set_pool_logic_address,
     pool_logic,
     pool,
     pool_configuration,
@@ -642,15 +805,16 @@ def test_liquidation_mint_collateral_xtoken_to_liquidator(
     # arrange
     link.approve(pool, SUPPLY_AMOUNT, {"from": get_account(index=2)})
     pool.supply(link, SUPPLY_AMOUNT, {"from": get_account(index=2)})
-    pool.borrow(link, BORROW_AMOUNT, dai, {"from": account})
+    pool.borrow(link, BORROW_AMOUNT, {"from": account})
 
     x_token_address = pool_configuration.underlyingAssetToXtoken(dai)
     x_token_contract = Contract.from_abi("XToken", x_token_address, XToken.abi)
+    liquidator_initial_dai_balance = dai.balanceOf(get_account(index=2))
     new_price = Web3.toWei(20, "ether")
 
     mock_v3_aggregator_link.updateAnswer(new_price)
 
-    liquidation_call_amount = Web3.toWei(50, "ether")
+    liquidation_call_amount = Web3.toWei(40, "ether")
 
     # act
     link.approve(pool, liquidation_call_amount, {"from": get_account(index=2)})
@@ -659,16 +823,54 @@ def test_liquidation_mint_collateral_xtoken_to_liquidator(
     )
 
     # assert
-    assert x_token_contract.balanceOf(get_account(index=2)) == liquidation_call_amount
+    # 40 LINK at 20 USD are paid with 80 DAI at 10 USD plus the 5% liquidation bonus, taken from
+    # the user supply
+    assert dai.balanceOf(get_account(index=2)) == (
+        liquidator_initial_dai_balance + Web3.toWei(84, "ether")
+    )
+    assert x_token_contract.balanceOf(account) == Web3.toWei(16, "ether")
+    assert pool.userConfigurations(account) & 0b10 != 0
+
+
+def test_liquidation_of_whole_collateral_clears_supplied_flag(
+    add_token_link,
+    supply,
+    add_token,
+    pool,
+    pool_configuration,
+    account,
+    dai,
+    link,
+    mock_v3_aggregator_link,
+    skip_live_testing,
+):
+
+    # arrange
+    link.approve(pool, SUPPLY_AMOUNT, {"from": get_account(index=2)})
+    pool.supply(link, SUPPLY_AMOUNT, {"from": get_account(index=2)})
+    pool.borrow(link, BORROW_AMOUNT, {"from": account})
+    x_token_contract = Contract.from_abi(
+        "XToken", pool_configuration.underlyingAssetToXtoken(dai), XToken.abi
+    )
+    mock_v3_aggregator_link.updateAnswer(Web3.toWei(20, "ether"))
+    # ~47.62 LINK, worth ~95.24 DAI : the 5% liquidation bonus rounds down to the 100 DAI supplied
+    liquidation_call_amount = 47619047619047619048
+
+    # act
+    link.approve(pool, liquidation_call_amount, {"from": get_account(index=2)})
+    pool.liquidationCall(
+        account, link, liquidation_call_amount, dai, {"from": get_account(index=2)}
+    )
+
+    # assert
+    assert x_token_contract.balanceOf(account) == 0
+    assert pool.userConfigurations(account) & 0b10 == 0
 
 
-def test_liquidation_mint_debt_token_to_user(
+def test_liquidation_burn_debt_of_user(
     add_token_link,
     supply,
     add_token,
-    set_pool_configuration_address,
-    set_reserves_manager_address,
-    set_pool_logic_address,
     pool_logic,
     pool,
     pool_configuration,
@@ -682,9 +884,9 @@ def test_liquidation_mint_debt_token_to_user(
     # arrange
     link.approve(pool, SUPPLY_AMOUNT, {"from": get_account(index=2)})
     pool.supply(link, SUPPLY_AMOUNT, {"from": get_account(index=2)})
-    pool.borrow(link, BORROW_AMOUNT, dai, {"from": account})
+    pool.borrow(link, BORROW_AMOUNT, {"from": account})
 
-    debt_token_address = pool_configuration.underlyingAssetToDebtToken(dai)
+    debt_token_address = pool_configuration.underlyingAssetToDebtToken(link)
     debt_token_contract = Contract.from_abi(
         "DebtToken", debt_token_address, DebtToken.abi
     )
@@ -692,7 +894,7 @@ def test_liquidation_mint_debt_token_to_user(
 
     mock_v3_aggregator_link.updateAnswer(new_price)
 
-    liquidation_call_amount = Web3.toWei(50, "ether")
+    liquidation_call_amount = Web3.toWei(40, "ether")
 
     # act
     link.approve(pool, liquidation_call_amount, {"from": get_account(index=2)})
@@ -701,16 +903,14 @@ def test_liquidation_mint_debt_token_to_user(
     )
 
     # assert
-    assert debt_token_contract.balanceOf(account) == liquidation_call_amount
+    # only the interest accrued since the borrow is left on top of the 35 LINK
+    assert int(debt_token_contract.balanceOf(account) / (10**18)) == 35
 
 
 def test_liquidation_call_returns_true(
     add_token_link,
     supply,
     add_token,
-    set_pool_configuration_address,
-    set_reserves_manager_address,
-    set_pool_logic_address,
     pool_logic,
     pool,
     pool_configuration,
@@ -724,7 +924,7 @@ def test_liquidation_call_returns_true(
     # arrange
     link.approve(pool, SUPPLY_AMOUNT, {"from": get_account(index=2)})
     pool.supply(link, SUPPLY_AMOUNT, {"from": get_account(index=2)})
-    pool.borrow(link, BORROW_AMOUNT, dai, {"from": account})
+    pool.borrow(link, BORROW_AMOUNT, {"from": account})
 
     x_token_address = pool_configuration.underlyingAssetToXtoken(dai)
     x_token_contract = Contract.from_abi("XToken", x_token_address, XToken.abi)
@@ -732,7 +932,7 @@ def test_liquidation_call_returns_true(
 
     mock_v3_aggregator_link.updateAnswer(new_price)
 
-    liquidation_call_amount = Web3.toWei(50, "ether")
+    liquidation_call_amount = Web3.toWei(40, "ether")
 
     # act
     link.approve(pool, liquidation_call_amount, {"from": get_account(index=2)})
@@ -748,9 +948,6 @@ def test_liquidation_call_returns_false(
     add_token_link,
     supply,
     add_token,
-    set_pool_configuration_address,
-    set_reserves_manager_address,
-    set_pool_logic_address,
     pool_logic,
     pool,
     pool_configuration,
@@ -764,12 +961,12 @@ def test_liquidation_call_returns_false(
     # arrange
     link.approve(pool, SUPPLY_AMOUNT, {"from": get_account(index=2)})
     pool.supply(link, SUPPLY_AMOUNT, {"from": get_account(index=2)})
-    pool.borrow(link, BORROW_AMOUNT, dai, {"from": account})
+    pool.borrow(link, BORROW_AMOUNT, {"from": account})
 
     x_token_address = pool_configuration.underlyingAssetToXtoken(dai)
     x_token_contract = Contract.from_abi("XToken", x_token_address, XToken.abi)
 
-    liquidation_call_amount = Web3.toWei(50, "ether")
+    liquidation_call_amount = Web3.toWei(40, "ether")
 
     # act
     link.approve(pool, liquidation_call_amount, {"from": get_account(index=2)})
@@ -779,3 +976,339 @@ def test_liquidation_call_returns_false(
 
     # assert
     assert tx.return_value == False
+
+
+def test_liquidation_call_reads_each_price_oracle_once(
+    add_token_link,
+    supply,
+    add_token,
+    pool,
+    account,
+    dai,
+    link,
+    mock_v3_aggregator_link,
+    record_gas,
+    skip_live_testing,
+):
+
+    # arrange
+    link.approve(pool, SUPPLY_AMOUNT, {"from": get_account(index=2)})
+    pool.supply(link, SUPPLY_AMOUNT, {"from": get_account(index=2)})
+    pool.borrow(link, BORROW_AMOUNT, {"from": account})
+
+    mock_v3_aggregator_link.updateAnswer(Web3.toWei(20, "ether"))
+
+    liquidation_call_amount = Web3.toWei(40, "ether")
+    link.approve(pool, liquidation_call_amount, {"from": get_account(index=2)})
+
+    # act
+    tx = pool.liquidationCall(
+        account, link, liquidation_call_amount, dai, {"from": get_account(index=2)}
+    )
+
+    # assert
+    record_gas("priceReads:liquidationCall", "cold", 2, tx)
+    assert count_price_oracle_reads(tx) == 2
+
+
+def rebalance_actions(pool, dai):
+    return [
+        pool.supply.encode_input(dai, SUPPLY_AMOUNT),
+        pool.borrow.encode_input(dai, Web3.toWei(30, "ether")),
+        pool.repay.encode_input(dai, Web3.toWei(10, "ether")),
+        pool.withdraw.encode_input(dai, Web3.toWei(10, "ether")),
+        pool.supply.encode_input(dai, Web3.toWei(20, "ether")),
+    ]
+
+
+def test_multicall_runs_actions_in_order(
+    add_token,
+    pool,
+    pool_configuration,
+    dai,
+    account,
+    skip_live_testing,
+):
+
+    # arrange
+    dai.approve(pool, REBALANCE_DAI_AMOUNT, {"from": account})
+
+    # act
+    pool.multicall(rebalance_actions(pool, dai), {"from": account})
+
+    # assert
+    x_token = Contract.from_abi(
+        "XToken", pool_configuration.underlyingAssetToXtoken(dai), XToken.abi
+    )
+    debt_token = Contract.from_abi(
+        "DebtToken", pool_configuration.underlyingAssetToDebtToken(dai), DebtToken.abi
+    )
+    assert x_token.balanceOf(account) == Web3.toWei(110, "ether")
+    assert debt_token.balanceOf(account) == Web3.toWei(20, "ether")
+    assert pool.userConfigurations(account) == 0b11
+
+
+def test_multicall_reverts_all_actions_if_one_fails(
+    add_token,
+    pool,
+    dai,
+    account,
+    skip_live_testing,
+):
+
+    # arrange
+    dai.approve(pool, SUPPLY_AMOUNT, {"from": account})
+    actions = [
+        pool.supply.encode_input(dai, SUPPLY_AMOUNT),
+        pool.supply.encode_input(dai, 0),
+    ]
+
+    # act / assert
+    with reverts("insufficient amount"):
+        pool.multicall(actions, {"from": account})
+    assert pool.userConfigurations(account) == 0
+    assert dai.balanceOf(add_token[0]) == 0
+
+
+def test_multicall_rebalance_costs_less_gas_than_sequential_actions(
+    supply,
+    pool,
+    dai,
+    account,
+    record_gas,
+    skip_live_testing,
+):
+
+    # arrange
+    # an outstanding borrow makes every reserve slot non zero before both rebalances
+    pool.borrow(dai, Web3.toWei(10, "ether"), {"from": account})
+    sequential_user = get_account(index=1)
+    batched_user = get_account(index=3)
+    for user in (sequential_user, batched_user):
+        dai.transfer(user, REBALANCE_DAI_AMOUNT, {"from": account})
+        dai.approve(pool, REBALANCE_DAI_AMOUNT, {"from": user})
+
+    # act
+    sequential_txs = [
+        pool.supply(dai, SUPPLY_AMOUNT, {"from": sequential_user}),
+        pool.borrow(dai, Web3.toWei(30, "ether"), {"from": sequential_user}),
+        pool.repay(dai, Web3.toWei(10, "ether"), {"from": sequential_user}),
+        pool.withdraw(dai, Web3.toWei(10, "ether"), {"from": sequential_user}),
+        pool.supply(dai, Web3.toWei(20, "ether"), {"from": sequential_user}),
+    ]
+
+    batched_tx = pool.multicall(rebalance_actions(pool, dai), {"from": batched_user})
+
+    # assert
+    sequential_gas = record_gas("rebalance", "sequential", 1, *sequential_txs)
+    batched_gas = record_gas("rebalance", "batched", 1, batched_tx)
+    assert pool.userConfigurations(batched_user) == pool.userConfigurations(
+        sequential_user
+    )
+    assert batched_gas < sequential_gas
+
+
+def test_supply_emits_supply_event(
+    add_token,
+    pool,
+    dai,
+    account,
+    skip_live_testing,
+):
+
+    # arrange
+    dai.approve(pool, SUPPLY_AMOUNT, {"from": account})
+
+    # act
+    tx = pool.supply(dai, SUPPLY_AMOUNT, {"from": account})
+
+    # assert
+    assert tx.events["Supply"]["user"] == account
+    assert tx.events["Supply"]["asset"] == dai
+    assert tx.events["Supply"]["amount"] == SUPPLY_AMOUNT
+
+
+def test_supply_emits_reserve_data_updated_event(
+    add_token,
+    pool,
+    reserves_manager,
+    dai,
+    account,
+    skip_live_testing,
+):
+
+    # arrange
+    dai.approve(pool, SUPPLY_AMOUNT, {"from": account})
+
+    # act
+    tx = pool.supply(dai, SUPPLY_AMOUNT, {"from": account})
+
+    # assert
+    event = tx.events["ReserveDataUpdated"]
+    assert event["underlyingAsset"] == dai
+    assert event["utilizationRate"] == reserves_manager.getUtilizationRate(dai)
+    assert event["liquidityRate"] == reserves_manager.getLiquidityRate(dai)
+    assert event["variableBorrowRate"] == reserves_manager.getVariableBorrowRate(dai)
+    assert event["supplyIndex"] == reserves_manager.getSupplyIndex(dai)
+    assert event["variableBorrowIndex"] == reserves_manager.getVariableBorrowIndex(
+        dai
+    )
+
+
+def test_borrow_emits_borrow_event(supply, pool, dai, account, skip_live_testing):
+
+    # act
+    tx = pool.borrow(dai, BORROW_AMOUNT, {"from": account})
+
+    # assert
+    assert tx.events["Borrow"]["user"] == account
+    assert tx.events["Borrow"]["asset"] == dai
+    assert tx.events["Borrow"]["amount"] == BORROW_AMOUNT
+
+
+def test_invalid_borrow_does_not_emit_borrow_event(
+    supply, pool, dai, account, skip_live_testing
+):
+
+    # act
+    tx = pool.borrow(dai, SUPPLY_AMOUNT, {"from": account})
+
+    # assert
+    assert "Borrow" not in tx.events
+
+
+def test_withdraw_emits_withdraw_event(supply, pool, dai, account, skip_live_testing):
+
+    # act
+    tx = pool.withdraw(dai, WITHDRAW_AMOUNT, {"from": account})
+
+    # assert
+    assert tx.events["Withdraw"]["user"] == account
+    assert tx.events["Withdraw"]["asset"] == dai
+    assert tx.events["Withdraw"]["amount"] == WITHDRAW_AMOUNT
+
+
+def test_repay_emits_repay_event(borrow, pool, dai, account, skip_live_testing):
+
+    # arrange
+    dai.approve(pool, BORROW_AMOUNT, {"from": account})
+
+    # act
+    tx = pool.repay(dai, BORROW_AMOUNT, {"from": account})
+
+    # assert
+    assert tx.events["Repay"]["user"] == account
+    assert tx.events["Repay"]["asset"] == dai
+    assert tx.events["Repay"]["amount"] == BORROW_AMOUNT
+
+
+def test_liquidation_call_emits_liquidation_call_event(
+    add_token_link,
+    supply,
+    add_token,
+    pool,
+    account,
+    dai,
+    link,
+    mock_v3_aggregator_link,
+    skip_live_testing,
+):
+
+    # arrange
+    liquidator = get_account(index=2)
+    link.approve(pool, SUPPLY_AMOUNT, {"from": liquidator})
+    pool.supply(link, SUPPLY_AMOUNT, {"from": liquidator})
+    pool.borrow(link, BORROW_AMOUNT, {"from": account})
+    mock_v3_aggregator_link.updateAnswer(Web3.toWei(20, "ether"))
+    liquidation_call_amount = Web3.toWei(40, "ether")
+    link.approve(pool, liquidation_call_amount, {"from": liquidator})
+
+    # act
+    tx = pool.liquidationCall(
+        account, link, liquidation_call_amount, dai, {"from": liquidator}
+    )
+
+    # assert
+    event = tx.events["LiquidationCall"]
+    assert event["liquidator"] == liquidator
+    assert event["user"] == account
+    assert event["asset"] == link
+    assert event["amount"] == liquidation_call_amount
+    assert event["collateral"] == dai
+
+
+def test_supply_with_permit(add_token, permit_owner, pool, dai, skip_live_testing):
+
+    # arrange
+    deadline = chain.time() + 3600
+    v, r, s = sign_permit(dai, permit_owner, pool, SUPPLY_AMOUNT, deadline)
+    x_token = Contract.from_abi("XToken", add_token[0], XToken.abi)
+
+    # act
+    tx = pool.supplyWithPermit(
+        dai, SUPPLY_AMOUNT, deadline, v, r, s, {"from": permit_owner}
+    )
+
+    # assert
+    assert x_token.balanceOf(permit_owner) == SUPPLY_AMOUNT
+    assert dai.allowance(permit_owner, pool) == 0
+    assert dai.nonces(permit_owner) == 1
+    assert tx.events["Supply"]["user"] == permit_owner
+
+
+def test_supply_with_permit_already_submitted(
+    add_token, permit_owner, pool, dai, skip_live_testing
+):
+
+    # arrange
+    # the permit is copied from the mempool and submitted first by someone else
+    deadline = chain.time() + 3600
+    v, r, s = sign_permit(dai, permit_owner, pool, SUPPLY_AMOUNT, deadline)
+    dai.permit(
+        permit_owner, pool, SUPPLY_AMOUNT, deadline, v, r, s, {"from": get_account(index=1)}
+    )
+
+    # act
+    tx = pool.supplyWithPermit(
+        dai, SUPPLY_AMOUNT, deadline, v, r, s, {"from": permit_owner}
+    )
+
+    # assert
+    assert tx.events["Supply"]["amount"] == SUPPLY_AMOUNT
+
+
+def test_supply_with_permit_of_another_amount(
+    add_token, permit_owner, pool, dai, skip_live_testing
+):
+
+    # arrange
+    deadline = chain.time() + 3600
+    v, r, s = sign_permit(dai, permit_owner, pool, BORROW_AMOUNT, deadline)
+
+    # act / assert
+    with reverts("ERC20: insufficient allowance"):
+        pool.supplyWithPermit(
+            dai, SUPPLY_AMOUNT, deadline, v, r, s, {"from": permit_owner}
+        )
+
+
+def test_repay_with_permit(add_token, permit_owner, pool, dai, skip_live_testing):
+
+    # arrange
+    deadline = chain.time() + 3600
+    v, r, s = sign_permit(dai, permit_owner, pool, SUPPLY_AMOUNT, deadline)
+    pool.supplyWithPermit(
+        dai, SUPPLY_AMOUNT, deadline, v, r, s, {"from": permit_owner}
+    )
+    pool.borrow(dai, BORROW_AMOUNT, {"from": permit_owner})
+    v, r, s = sign_permit(dai, permit_owner, pool, BORROW_AMOUNT, deadline)
+
+    # act
+    tx = pool.repayWithPermit(
+        dai, BORROW_AMOUNT, deadline, v, r, s, {"from": permit_owner}
+    )
+
+    # assert
+    assert tx.events["Repay"]["user"] == permit_owner
+    assert tx.events["Repay"]["amount"] == BORROW_AMOUNT
+    assert dai.allowance(permit_owner, pool) == 0
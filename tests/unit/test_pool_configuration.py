@@ -1,42 +1,38 @@
-from brownie import Contract, XToken, PriceOracleMock, reverts, DebtToken, chain
-from scripts.utils import get_account
-from conftest import BASE_VARIABLE_BORROW_RATE, INTEREST_RATE_SLOPE
+from brownie import Contract, PoolConfiguration, XToken, PriceOracle, reverts, DebtToken, chain
+from scripts.utils import get_account, get_clone_address, get_reserve_salt
 from web3 import Web3
 
 
-def test_pool_configuration_constructor(pool_configuration, pool, skip_live_testing):
-
-    # assert
-    assert pool_configuration.poolAddress() == pool.address
-
-
-def test_set_reserve_manager_contract(
-    pool_configuration, reserves_manager, account, skip_live_testing
+def test_pool_configuration_constructor(
+    pool_configuration, pool, reserves_manager, skip_live_testing
 ):
 
-    # act
-    pool_configuration.setReserveManagerContract(reserves_manager, {"from": account})
+    # arrange
+    x_token_implementation = XToken.at(pool_configuration.xTokenImplementation())
+    debt_token_implementation = DebtToken.at(
+        pool_configuration.debtTokenImplementation()
+    )
 
     # assert
+    assert pool_configuration.poolAddress() == pool.address
     assert pool_configuration.reservesManager() == reserves_manager
+    assert x_token_implementation.poolAddress() == pool
+    assert x_token_implementation.reservesManager() == reserves_manager
+    assert debt_token_implementation.poolAddress() == pool
+    assert debt_token_implementation.reservesManager() == reserves_manager
 
 
-def test_only_owner_can_set_reserve_manager_contract(
-    pool_configuration, reserves_manager, skip_live_testing
+def test_pool_configuration_unexpected_deployment_address(
+    addresses_provider, account, skip_live_testing
 ):
 
-    # arrange
-    non_owner = get_account(index=2)
-
     # act / assert
-    with reverts("Ownable: caller is not the owner"):
-        pool_configuration.setReserveManagerContract(
-            reserves_manager, {"from": non_owner}
-        )
+    with reverts("unexpected deployment address"):
+        PoolConfiguration.deploy(addresses_provider, {"from": account})
 
 
 def test_only_owner_can_add_token(
-    dai, mock_v3_aggregator, pool_configuration, skip_live_testing
+    dai, mock_v3_aggregator, interest_rate_strategy, pool_configuration, skip_live_testing
 ):
 
     # arrange
@@ -46,8 +42,6 @@ def test_only_owner_can_add_token(
     underlying_asset = dai
     price_feed_address = mock_v3_aggregator
     decimals = 18
-    base_variable_borrow_rate = BASE_VARIABLE_BORROW_RATE
-    interest_rate_slope = INTEREST_RATE_SLOPE
 
     # act / assert
     with reverts():
@@ -57,33 +51,32 @@ def test_only_owner_can_add_token(
             underlying_asset,
             price_feed_address,
             decimals,
-            base_variable_borrow_rate,
-            interest_rate_slope,
+            interest_rate_strategy,
             {"from": non_owner},
         )
 
 
 def test_add_token_creates_new_xtoken_instance(
-    pool_configuration, add_token, skip_live_testing
+    pool_configuration, add_token, dai, skip_live_testing
 ):
 
     # arrange
     x_token_contract = Contract.from_abi("XToken", add_token[0], XToken.abi)
 
     # assert
-    assert add_token[0] == pool_configuration.getXToken.call()
+    assert add_token[0] == pool_configuration.predictReserveAddresses(dai)[0]
     assert x_token_contract.name() == "xDAI"
 
 
 def test_add_token_creates_new_debt_token_instance(
-    pool_configuration, add_token, skip_live_testing
+    pool_configuration, add_token, dai, skip_live_testing
 ):
 
     # arrange
     debt_token_contract = Contract.from_abi("DebtToken", add_token[1], DebtToken.abi)
 
     # assert
-    assert add_token[1] == pool_configuration.getDebtToken.call()
+    assert add_token[1] == pool_configuration.predictReserveAddresses(dai)[1]
     assert debt_token_contract.name() == "debtDAI"
 
 
@@ -112,16 +105,16 @@ def test_add_token_map_underlying_asset_to_is_available(
 
 
 def test_add_token_creates_new_price_oracle_instance(
-    pool_configuration, add_token, mock_v3_aggregator, skip_live_testing
+    pool_configuration, add_token, dai, mock_v3_aggregator, skip_live_testing
 ):
 
     # arrange
     price_oracle_contract = Contract.from_abi(
-        "PriceOracleMock", add_token[2], PriceOracleMock.abi
+        "PriceOracle", add_token[2], PriceOracle.abi
     )
 
     # assert
-    assert add_token[2] == pool_configuration.getPriceOracle.call()
+    assert add_token[2] == pool_configuration.predictReserveAddresses(dai)[2]
     assert price_oracle_contract.priceFeed() == mock_v3_aggregator
 
 
@@ -133,6 +126,83 @@ def test_add_token_map_underlying_asset_price_oracle(
     assert pool_configuration.underlyingAssetToPriceOracle(dai) == add_token[2]
 
 
+def test_add_token_records_decimals_scale(
+    add_token, pool_configuration, dai, skip_live_testing
+):
+
+    # assert
+    assert pool_configuration.underlyingAssetToDecimalsScale(dai) == 1
+    assert pool_configuration.getPriceOracleAndDecimalsScale(dai) == (add_token[2], 1)
+
+
+def test_add_token_decimals_above_18(
+    account,
+    dai,
+    mock_v3_aggregator,
+    interest_rate_strategy,
+    pool_configuration,
+    skip_live_testing,
+):
+
+    # act / assert
+    with reverts("token decimals above 18"):
+        pool_configuration.addToken(
+            "DAI",
+            "DAI",
+            dai,
+            mock_v3_aggregator,
+            19,
+            interest_rate_strategy,
+            {"from": account},
+        )
+
+
+def test_add_token_twice(
+    add_token,
+    account,
+    dai,
+    mock_v3_aggregator,
+    interest_rate_strategy,
+    pool_configuration,
+    skip_live_testing,
+):
+
+    # act / assert
+    with reverts("token already added"):
+        pool_configuration.addToken(
+            "DAI",
+            "DAI",
+            dai,
+            mock_v3_aggregator,
+            18,
+            interest_rate_strategy,
+            {"from": account},
+        )
+
+
+def test_predict_reserve_addresses_before_listing(
+    pool_configuration, dai, skip_live_testing
+):
+
+    # arrange
+    salt = get_reserve_salt(dai)
+
+    # act
+    x_token, debt_token, price_oracle = pool_configuration.predictReserveAddresses(dai)
+
+    # assert
+    # off-chain tooling computes the same addresses from the implementations alone
+    assert x_token == get_clone_address(
+        pool_configuration, pool_configuration.xTokenImplementation(), salt
+    )
+    assert debt_token == get_clone_address(
+        pool_configuration, pool_configuration.debtTokenImplementation(), salt
+    )
+    assert price_oracle == get_clone_address(
+        pool_configuration, pool_configuration.priceOracleImplementation(), salt
+    )
+
+
 def test_add_token_init_new_reserve(
     add_token,
     pool_configuration,
@@ -154,3 +224,104 @@ def test_add_token_pushes_underlying_assset_tokens_array(
     assert pool_configuration.tokens(0) == dai
     with reverts():
         pool_configuration.tokens(1)
+
+
+def test_add_token_emits_token_added_event(
+    account,
+    dai,
+    mock_v3_aggregator,
+    interest_rate_strategy,
+    pool_configuration,
+    skip_live_testing,
+):
+
+    # act
+    tx = pool_configuration.addToken(
+        "DAI",
+        "DAI",
+        dai,
+        mock_v3_aggregator,
+        18,
+        interest_rate_strategy,
+        {"from": account},
+    )
+
+    # assert
+    x_token, debt_token, price_oracle = tx.return_value
+    assert tx.events["TokenAdded"]["underlyingAsset"] == dai
+    assert tx.events["TokenAdded"]["xToken"] == x_token
+    assert tx.events["TokenAdded"]["debtToken"] == debt_token
+    assert tx.events["TokenAdded"]["priceOracle"] == price_oracle
+
+
+def test_add_tokens(
+    account,
+    dai,
+    link,
+    mock_v3_aggregator,
+    mock_v3_aggregator_link,
+    interest_rate_strategy,
+    pool_configuration,
+    pool,
+    skip_live_testing,
+):
+
+    # arrange
+    reserve_configs = [
+        ("DAI", "DAI", dai, mock_v3_aggregator, 18, interest_rate_strategy),
+        ("LINK", "LINK", link, mock_v3_aggregator_link, 18, interest_rate_strategy),
+    ]
+
+    # act
+    tx = pool_configuration.addTokens(reserve_configs, {"from": account})
+
+    # assert
+    assert pool_configuration.getTokens() == [dai, link]
+    for event, asset in zip(tx.events["TokenAdded"], [dai, link]):
+        x_token, debt_token, price_oracle = pool_configuration.predictReserveAddresses(
+            asset
+        )
+        assert event["underlyingAsset"] == asset
+        assert event["xToken"] == x_token
+        assert event["debtToken"] == debt_token
+        assert event["priceOracle"] == price_oracle
+        assert pool_configuration.isAvailable(asset)
+    assert Contract.from_abi(
+        "XToken", tx.events["TokenAdded"][1]["xToken"], XToken.abi
+    ).name() == "xLINK"
+
+
+def test_only_owner_can_add_tokens(
+    dai, mock_v3_aggregator, interest_rate_strategy, pool_configuration, skip_live_testing
+):
+
+    # arrange
+    reserve_configs = [("DAI", "DAI", dai, mock_v3_aggregator, 18, interest_rate_strategy)]
+
+    # act / assert
+    with reverts("Ownable: caller is not the owner"):
+        pool_configuration.addTokens(reserve_configs, {"from": get_account(index=2)})
+
+
+def test_add_tokens_reverts_whole_batch(
+    add_token,
+    account,
+    dai,
+    link,
+    mock_v3_aggregator,
+    mock_v3_aggregator_link,
+    interest_rate_strategy,
+    pool_configuration,
+    skip_live_testing,
+):
+
+    # arrange
+    reserve_configs = [
+        ("LINK", "LINK", link, mock_v3_aggregator_link, 18, interest_rate_strategy),
+        ("DAI", "DAI", dai, mock_v3_aggregator, 18, interest_rate_strategy),
+    ]
+
+    # act / assert
+    with reverts("token already added"):
+        pool_configuration.addTokens(reserve_configs, {"from": account})
+    assert not pool_configuration.isAvailable(link)
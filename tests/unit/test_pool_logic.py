@@ -1,13 +1,31 @@
-from conftest import PRICE, SUPPLY_AMOUNT, BORROW_AMOUNT, get_account
+from conftest import PRICE, SUPPLY_AMOUNT, BORROW_AMOUNT, get_account, list_reserve
 from web3 import Web3
-from brownie import reverts, Contract, XToken, PriceOracle, DebtToken
+from brownie import (
+    reverts,
+    Contract,
+    XToken,
+    PriceOracle,
+    PoolLogic,
+    DebtToken,
+    MockUSDC,
+    MockV3Aggregator,
+)
 import pytest
 
 
-def test_pool_logic_constructor(pool_logic, pool_configuration, skip_live_testing):
+def test_pool_logic_constructor(pool_logic, pool, skip_live_testing):
 
     # assert
-    assert pool_logic.poolConfiguration() == pool_configuration
+    assert pool_logic.pool() == pool
+
+
+def test_pool_logic_unexpected_deployment_address(
+    addresses_provider, account, skip_live_testing
+):
+
+    # act / assert
+    with reverts("unexpected deployment address"):
+        PoolLogic.deploy(addresses_provider, {"from": account})
 
 
 def test_get_user_balance_in_usd(pool_logic, supply, account, dai, skip_live_testing):
@@ -31,7 +49,7 @@ def test_validate_borrow_null_amount(
 
     # act / assert
     with reverts("Amount must be greater than 0"):
-        pool_logic.validateBorrow(account, dai, 0, dai, {"from": account})
+        pool_logic.validateBorrow(account, dai, 0, {"from": account})
 
 
 def test_validate_borrow_non_available_token(
@@ -43,7 +61,7 @@ def test_validate_borrow_non_available_token(
 
     # act / assert
     with reverts("token not available"):
-        pool_logic.validateBorrow(account, link, amount, link, {"from": account})
+        pool_logic.validateBorrow(account, link, amount, {"from": account})
 
 
 def test_validate_borrow_amount_greater_than_max_amount_in_usd(
@@ -54,9 +72,7 @@ def test_validate_borrow_amount_greater_than_max_amount_in_usd(
     amount = Web3.toWei(76, "ether")
 
     # act / assert
-    assert pool_logic.validateBorrow.call(
-        account, dai, amount, dai, {"from": account}
-    ) == (False, 0)
+    assert pool_logic.validateBorrow.call(account, dai, amount, {"from": account}) == False
 
 
 def test_validate_borrow_correct_amount(
@@ -67,9 +83,7 @@ def test_validate_borrow_correct_amount(
     amount = Web3.toWei(75, "ether")
 
     # act / assert
-    assert pool_logic.validateBorrow.call(
-        account, dai, amount, dai, {"from": account}
-    ) == (True, amount)
+    assert pool_logic.validateBorrow.call(account, dai, amount, {"from": account}) == True
 
 
 def test_validate_withdraw_null_amount(
@@ -118,6 +132,35 @@ def test_validate_withdraw_correct_amount(
     )
 
 
+def test_validate_withdraw_keeps_debt_covered(
+    account, borrow, pool_logic, dai, skip_live_testing
+):
+
+    # act / assert
+    # 75 DAI of debt need 100 DAI supplied, nothing can be withdrawn
+    assert (
+        pool_logic.validateWithdraw.call(
+            account, dai, Web3.toWei(1, "ether"), {"from": account}
+        )
+        == False
+    )
+
+
+def test_validate_borrow_counts_every_supplied_reserve(
+    account, supply, add_token_link, pool, pool_logic, dai, link, skip_live_testing
+):
+
+    # arrange
+    link.transfer(account, SUPPLY_AMOUNT, {"from": get_account(index=2)})
+    link.approve(pool, SUPPLY_AMOUNT, {"from": account})
+    pool.supply(link, SUPPLY_AMOUNT, {"from": account})
+
+    # act / assert
+    # 100 DAI and 100 LINK at 10 USD allow to borrow 1500 USD
+    assert pool_logic.validateBorrow.call(account, dai, Web3.toWei(150, "ether")) == True
+    assert pool_logic.validateBorrow.call(account, dai, Web3.toWei(151, "ether")) == False
+
+
 def test_get_user_debt_in_usd(pool_logic, borrow, account, dai, skip_live_testing):
 
     # act /assert
@@ -126,24 +169,42 @@ def test_get_user_debt_in_usd(pool_logic, borrow, account, dai, skip_live_testin
     ) == BORROW_AMOUNT * PRICE / (10**18)
 
 
-def test_get_collateral_amount_to_mint(add_token, pool_logic, dai, skip_live_testing):
+def test_amounts_in_usd_with_mixed_decimals(
+    add_token,
+    pool_configuration,
+    interest_rate_strategy,
+    pool_logic,
+    account,
+    dai,
+    skip_live_testing,
+):
 
     # arrange
-    amount = Web3.toWei(100, "ether")
+    # a 6 decimals token priced by an 8 decimals feed at 1 USD
+    usdc = MockUSDC.deploy({"from": account})
+    usdc_price_feed = MockV3Aggregator.deploy(8, 10**8, {"from": account})
+    pool_configuration.addToken(
+        "USDC",
+        "USDC",
+        usdc,
+        usdc_price_feed,
+        6,
+        interest_rate_strategy,
+        {"from": account},
+    )
 
     # act / assert
-    assert pool_logic.getCollateralAmountToMint(dai, amount, dai) == Web3.toWei(
-        100, "ether"
-    )
+    assert pool_configuration.underlyingAssetToDecimalsScale(usdc) == 10**12
+    assert pool_logic._getAmountInUSD(100 * 10**6, usdc) == Web3.toWei(100, "ether")
+    assert pool_logic._getAmountInUSD(
+        Web3.toWei(100, "ether"), dai
+    ) == Web3.toWei(100 * PRICE, "ether")
 
 
 def test_validate_liquidation_non_undercollateralized(
     add_token_link,
     supply,
     add_token,
-    set_pool_configuration_address,
-    set_reserves_manager_address,
-    set_pool_logic_address,
     pool_logic,
     pool,
     account,
@@ -155,10 +216,10 @@ def test_validate_liquidation_non_undercollateralized(
     # arrange
     link.approve(pool, SUPPLY_AMOUNT, {"from": get_account(index=2)})
     pool.supply(link, SUPPLY_AMOUNT, {"from": get_account(index=2)})
-    pool.borrow(link, BORROW_AMOUNT, dai, {"from": account})
+    pool.borrow(link, BORROW_AMOUNT, {"from": account})
 
     # act
-    assert pool_logic.validateLiquidation(account, link, dai, SUPPLY_AMOUNT) == (
+    assert pool_logic.validateLiquidation(account, link, BORROW_AMOUNT, dai) == (
         False,
         0,
     )
@@ -168,9 +229,6 @@ def test_validate_liquidation_undercollateralized(
     add_token_link,
     supply,
     add_token,
-    set_pool_configuration_address,
-    set_reserves_manager_address,
-    set_pool_logic_address,
     pool_logic,
     pool,
     account,
@@ -183,14 +241,127 @@ def test_validate_liquidation_undercollateralized(
     # arrange
     link.approve(pool, SUPPLY_AMOUNT, {"from": get_account(index=2)})
     pool.supply(link, SUPPLY_AMOUNT, {"from": get_account(index=2)})
-    pool.borrow(link, BORROW_AMOUNT, dai, {"from": account})
+    pool.borrow(link, BORROW_AMOUNT, {"from": account})
 
     new_price = Web3.toWei(20, "ether")
 
     mock_v3_aggregator_link.updateAnswer(new_price)
 
     # act / assert
-    isValid, undercollateralized_amount = pool_logic.validateLiquidation(
-        account, link, dai, SUPPLY_AMOUNT
+    is_valid, collateral_amount = pool_logic.validateLiquidation(
+        account, link, Web3.toWei(10, "ether"), dai
+    )
+    # 10 LINK at 20 USD are worth 20 DAI at 10 USD, 21 with the 5% liquidation bonus
+    assert is_valid
+    assert collateral_amount == Web3.toWei(21, "ether")
+
+
+def test_validate_liquidation_above_liquidation_threshold(
+    add_token_link,
+    supply,
+    add_token,
+    pool_logic,
+    pool,
+    account,
+    dai,
+    link,
+    mock_v3_aggregator_link,
+    skip_live_testing,
+):
+
+    # arrange
+    link.approve(pool, SUPPLY_AMOUNT, {"from": get_account(index=2)})
+    pool.supply(link, SUPPLY_AMOUNT, {"from": get_account(index=2)})
+    pool.borrow(link, BORROW_AMOUNT, {"from": account})
+    # the 900 USD of debt are still covered by the 1000 USD supplied, but above their 85%
+    mock_v3_aggregator_link.updateAnswer(Web3.toWei(12, "ether"))
+
+    # act / assert
+    is_valid, collateral_amount = pool_logic.validateLiquidation(
+        account, link, Web3.toWei(10, "ether"), dai
+    )
+    # 10 LINK at 12 USD are worth 12 DAI at 10 USD, 12.6 with the 5% liquidation bonus
+    assert is_valid
+    assert collateral_amount == Web3.toWei(12.6, "ether")
+
+
+def test_get_user_account_data_without_position(
+    add_token, pool_logic, account, skip_live_testing
+):
+
+    # act / assert
+    assert pool_logic.getUserAccountData(account) == (0, 0, 0, 2**256 - 1)
+
+
+def test_get_user_account_data_on_supply(
+    pool_logic, supply, account, skip_live_testing
+):
+
+    # arrange
+    total_collateral_in_usd = SUPPLY_AMOUNT * PRICE
+    available_borrows_in_usd = total_collateral_in_usd // 10000 * 7500
+
+    # act / assert
+    assert pool_logic.getUserAccountData(account) == (
+        total_collateral_in_usd,
+        0,
+        available_borrows_in_usd,
+        2**256 - 1,
+    )
+
+
+def test_get_user_account_data_on_borrow(
+    pool_logic, borrow, account, dai, skip_live_testing
+):
+
+    # arrange
+    total_collateral_in_usd = pool_logic._getUserBalanceInUSD(account, dai)
+    total_debt_in_usd = pool_logic._getUserDebtInUSD(account, dai)
+
+    # act
+    (
+        collateral_in_usd,
+        debt_in_usd,
+        available_borrows_in_usd,
+        health_factor,
+    ) = pool_logic.getUserAccountData(account)
+
+    # assert
+    assert int(collateral_in_usd / (10**18)) == int(total_collateral_in_usd / (10**18))
+    assert int(debt_in_usd / (10**18)) == int(total_debt_in_usd / (10**18))
+    assert available_borrows_in_usd == 0
+    # the collateral is counted at the 85% liquidation threshold
+    assert int(health_factor / (10**15)) == int(
+        total_collateral_in_usd * 850 / total_debt_in_usd
+    )
+
+
+def test_get_user_account_data_reads_flagged_reserves_only(
+    add_token,
+    pool_logic,
+    pool,
+    pool_configuration,
+    interest_rate_strategy,
+    account,
+    skip_live_testing,
+):
+
+    # arrange
+    # the supplied reserves are the second and the last of 6, the others are never read
+    reserves = [
+        list_reserve(pool_configuration, interest_rate_strategy, account, index)[0]
+        for index in range(5)
+    ]
+    for token in (reserves[0], reserves[4]):
+        token.approve(pool, SUPPLY_AMOUNT, {"from": account})
+        pool.supply(token, SUPPLY_AMOUNT, {"from": account})
+    total_collateral_in_usd = 2 * SUPPLY_AMOUNT * PRICE
+
+    # act / assert
+    assert pool.userConfigurations(account) == 0b10 << 2 | 0b10 << 10
+    assert pool_logic.getUserAccountData(account) == (
+        total_collateral_in_usd,
+        0,
+        total_collateral_in_usd // 10000 * 7500,
+        2**256 - 1,
     )
-    assert isValid, int(undercollateralized_amount / (10**18)) == (True, 50)
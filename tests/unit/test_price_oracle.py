@@ -1,13 +1,254 @@
-from conftest import PRICE
+from brownie import (
+    Contract,
+    MockV3Aggregator,
+    PriceOracle,
+    RevertingAggregatorMock,
+    chain,
+    reverts,
+)
+from conftest import PRICE, FALLBACK_PRICE, clone_price_oracle
+from scripts.utils import get_account
+from web3 import Web3
 
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
 
-def test_price_oracle_constructor(price_oracle, mock_v3_aggregator, skip_live_testing):
+
+def stale_round(price_feed, answer, age):
+    """
+    publishes a new round of `price_feed` last updated `age` seconds before the latest block, the
+    ages used by the tests keep a margin with the heartbeat for the time elapsed until the call
+    """
+    updated_at = chain[-1].timestamp - age
+    price_feed.updateRoundData(
+        price_feed.latestRound() + 1,
+        answer,
+        updated_at,
+        updated_at,
+        {"from": get_account()},
+    )
+
+
+def test_price_oracle_initialize(
+    price_oracle, mock_v3_aggregator, account, skip_live_testing
+):
 
     # assert
     assert price_oracle.priceFeed() == mock_v3_aggregator
+    assert price_oracle.priceFeedDecimals() == 18
+    assert price_oracle.priceScale() == 1
+    assert price_oracle.owner() == account
+
+
+def test_price_oracle_initialize_only_once(
+    price_oracle, mock_v3_aggregator, account, skip_live_testing
+):
+
+    # act / assert
+    with reverts("Initializable: contract is already initialized"):
+        price_oracle.initialize(mock_v3_aggregator, account, {"from": account})
+
+
+def test_price_oracle_implementation_can_not_be_initialized(
+    price_oracle_implementation, mock_v3_aggregator, account, skip_live_testing
+):
+
+    # act / assert
+    with reverts("Initializable: contract is already initialized"):
+        price_oracle_implementation.initialize(
+            mock_v3_aggregator, account, {"from": account}
+        )
 
 
 def test_get_latest_price(price_oracle, skip_live_testing):
 
     # assert
-    assert price_oracle.getLatestPrice.call() == PRICE
+    assert price_oracle.getLatestPrice.call() == Web3.toWei(PRICE, "ether")
+
+
+def test_get_latest_price_normalizes_8_decimals_feed(
+    clones, price_oracle_implementation, account, skip_live_testing
+):
+
+    # arrange
+    price_feed = MockV3Aggregator.deploy(8, PRICE * 10**8, {"from": account})
+
+    # act
+    price_oracle = clone_price_oracle(
+        clones, price_oracle_implementation, price_feed, account
+    )
+
+    # assert
+    assert price_oracle.priceScale() == 10**10
+    assert price_oracle.getLatestPrice() == Web3.toWei(PRICE, "ether")
+
+
+def test_price_feed_decimals_above_18(
+    clones, price_oracle_implementation, account, skip_live_testing
+):
+
+    # arrange
+    price_feed = MockV3Aggregator.deploy(19, PRICE * 10**19, {"from": account})
+
+    # act / assert
+    with reverts("price feed decimals above 18"):
+        clone_price_oracle(clones, price_oracle_implementation, price_feed, account)
+
+
+def test_price_oracle_default_heartbeat(price_oracle, account, skip_live_testing):
+
+    # assert
+    assert price_oracle.owner() == account
+    assert price_oracle.heartbeat() == price_oracle.DEFAULT_HEARTBEAT()
+    assert price_oracle.fallbackPriceFeed() == ZERO_ADDRESS
+
+
+def test_set_heartbeat(price_oracle, account, skip_live_testing):
+
+    # act
+    tx = price_oracle.setHeartbeat(3600, {"from": account})
+
+    # assert
+    assert price_oracle.heartbeat() == 3600
+    assert tx.events["HeartbeatUpdated"]["heartbeat"] == 3600
+
+
+def test_only_owner_can_set_heartbeat(price_oracle, skip_live_testing):
+
+    # act / assert
+    with reverts("Ownable: caller is not the owner"):
+        price_oracle.setHeartbeat(3600, {"from": get_account(index=2)})
+
+
+def test_only_owner_can_set_fallback_price_feed(
+    price_oracle, fallback_price_feed, skip_live_testing
+):
+
+    # act / assert
+    with reverts("Ownable: caller is not the owner"):
+        price_oracle.setFallbackPriceFeed(
+            fallback_price_feed, 3600, {"from": get_account(index=2)}
+        )
+
+
+def test_stale_price_without_fallback(
+    price_oracle, mock_v3_aggregator, skip_live_testing
+):
+
+    # arrange
+    price_oracle.setHeartbeat(3600, {"from": price_oracle.owner()})
+    stale_round(mock_v3_aggregator, Web3.toWei(PRICE, "ether"), 3700)
+
+    # act / assert
+    with reverts("no valid price"):
+        price_oracle.getLatestPrice()
+
+
+def test_stale_price_reads_fallback(
+    price_oracle, mock_v3_aggregator, fallback_price_feed, account, skip_live_testing
+):
+
+    # arrange
+    price_oracle.setHeartbeat(3600, {"from": account})
+    price_oracle.setFallbackPriceFeed(fallback_price_feed, 3600, {"from": account})
+    stale_round(mock_v3_aggregator, Web3.toWei(PRICE, "ether"), 3700)
+
+    # act / assert
+    assert price_oracle.fallbackPriceScale() == 10**10
+    assert price_oracle.getLatestPrice() == Web3.toWei(FALLBACK_PRICE, "ether")
+
+
+def test_fresh_price_ignores_fallback(
+    price_oracle, mock_v3_aggregator, fallback_price_feed, account, skip_live_testing
+):
+
+    # arrange
+    price_oracle.setHeartbeat(3600, {"from": account})
+    price_oracle.setFallbackPriceFeed(fallback_price_feed, 3600, {"from": account})
+    stale_round(mock_v3_aggregator, Web3.toWei(PRICE, "ether"), 3000)
+
+    # act / assert
+    assert price_oracle.getLatestPrice() == Web3.toWei(PRICE, "ether")
+
+
+def test_non_positive_price_reads_fallback(
+    price_oracle, mock_v3_aggregator, fallback_price_feed, account, skip_live_testing
+):
+
+    # arrange
+    price_oracle.setFallbackPriceFeed(fallback_price_feed, 3600, {"from": account})
+    mock_v3_aggregator.updateAnswer(0, {"from": account})
+
+    # act / assert
+    assert price_oracle.getLatestPrice() == Web3.toWei(FALLBACK_PRICE, "ether")
+
+
+def test_stale_price_and_stale_fallback(
+    price_oracle, mock_v3_aggregator, fallback_price_feed, account, skip_live_testing
+):
+
+    # arrange
+    price_oracle.setHeartbeat(3600, {"from": account})
+    price_oracle.setFallbackPriceFeed(fallback_price_feed, 3600, {"from": account})
+    stale_round(mock_v3_aggregator, Web3.toWei(PRICE, "ether"), 3700)
+    stale_round(fallback_price_feed, FALLBACK_PRICE * 10**8, 3700)
+
+    # act / assert
+    with reverts("no valid price"):
+        price_oracle.getLatestPrice()
+
+
+def test_reverting_price_feed_reads_fallback(
+    clones, price_oracle_implementation, fallback_price_feed, account, skip_live_testing
+):
+
+    # arrange
+    price_feed = RevertingAggregatorMock.deploy({"from": account})
+    price_oracle = clone_price_oracle(
+        clones, price_oracle_implementation, price_feed, account
+    )
+    price_oracle.setFallbackPriceFeed(fallback_price_feed, 3600, {"from": account})
+
+    # act / assert
+    assert price_oracle.getLatestPrice() == Web3.toWei(FALLBACK_PRICE, "ether")
+
+
+def test_reverting_price_feed_and_reverting_fallback(
+    clones, price_oracle_implementation, account, skip_live_testing
+):
+
+    # arrange
+    price_feed = RevertingAggregatorMock.deploy({"from": account})
+    price_oracle = clone_price_oracle(
+        clones, price_oracle_implementation, price_feed, account
+    )
+    price_oracle.setFallbackPriceFeed(price_feed, 3600, {"from": account})
+
+    # act / assert
+    with reverts("no valid price"):
+        price_oracle.getLatestPrice()
+
+
+def test_remove_fallback_price_feed(
+    price_oracle, fallback_price_feed, account, skip_live_testing
+):
+
+    # arrange
+    price_oracle.setFallbackPriceFeed(fallback_price_feed, 3600, {"from": account})
+
+    # act
+    price_oracle.setFallbackPriceFeed(ZERO_ADDRESS, 0, {"from": account})
+
+    # assert
+    assert price_oracle.fallbackPriceFeed() == ZERO_ADDRESS
+    assert price_oracle.fallbackPriceScale() == 0
+
+
+def test_add_token_transfers_price_oracle_ownership(
+    add_token, account, skip_live_testing
+):
+
+    # arrange
+    price_oracle = Contract.from_abi("PriceOracle", add_token[2], PriceOracle.abi)
+
+    # act / assert
+    assert price_oracle.owner() == account
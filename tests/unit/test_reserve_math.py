@@ -0,0 +1,261 @@
+from brownie import Contract, DebtToken, chain
+from web3 import Web3
+from conftest import (
+    SUPPLY_AMOUNT,
+    BORROW_AMOUNT,
+    OPTIMAL_UTILIZATION_RATE,
+    BASE_VARIABLE_BORROW_RATE,
+    VARIABLE_RATE_SLOPE_1,
+    VARIABLE_RATE_SLOPE_2,
+)
+from scripts import reserve_math
+from scripts.reserve_math import InterestRateStrategy, Reserve
+import pytest
+from decimal import Decimal, localcontext
+
+UTILIZATION_RATES = [
+    0,
+    1,
+    Web3.toWei(0.333, "ether"),
+    Web3.toWei(0.75, "ether"),
+    OPTIMAL_UTILIZATION_RATE,
+    OPTIMAL_UTILIZATION_RATE + 1,
+    Web3.toWei(0.999, "ether"),
+    10**18,
+]
+STRATEGY = InterestRateStrategy(
+    OPTIMAL_UTILIZATION_RATE,
+    BASE_VARIABLE_BORROW_RATE,
+    VARIABLE_RATE_SLOPE_1,
+    VARIABLE_RATE_SLOPE_2,
+)
+RATES = [0, 1, 31536000, Web3.toWei(0.05, "ether"), Web3.toWei(3.75, "ether")]
+SECONDS = [0, 1, 2, 3, 13, 3600, 31536000]
+# 1 hour, 1 day, 1 week, 30 days and 1 year
+COMPOUNDING_GAPS = [3600, 86400, 604800, 2592000, 31536000]
+# the rate of a fully utilized reserve
+MAX_VARIABLE_BORROW_RATE = (
+    BASE_VARIABLE_BORROW_RATE + VARIABLE_RATE_SLOPE_1 + VARIABLE_RATE_SLOPE_2
+)
+# accruals above `MAX_COMPOUNDED_ACCRUAL` : a year at 79 and 10 years at 1000 per year, the latest
+# index being 1 or close to the max uint128
+SATURATED_ACCRUALS = [
+    (10**18, Web3.toWei(79, "ether"), 31536000),
+    (10**18, Web3.toWei(1000, "ether"), 315360000),
+    (2**128 - 10**18, Web3.toWei(79, "ether"), 31536000),
+]
+
+
+def test_update_utilization_rate_matches_contract(reserves_manager, skip_live_testing):
+
+    # arrange
+    totals = [(0, 0), (0, 5), (3, 1), (SUPPLY_AMOUNT, BORROW_AMOUNT), (7, 7)]
+
+    # act / assert
+    for total_deposited, total_borrowed in totals:
+        assert reserve_math.update_utilization_rate(
+            total_deposited, total_borrowed
+        ) == reserves_manager._updateUtilizationRate(total_deposited, total_borrowed)
+
+
+def test_calculate_variable_borrow_rate_matches_contract(
+    interest_rate_strategy, skip_live_testing
+):
+
+    # act / assert
+    for utilization_rate in UTILIZATION_RATES:
+        assert reserve_math.calculate_variable_borrow_rate(
+            STRATEGY, utilization_rate
+        ) == interest_rate_strategy.calculateVariableBorrowRate(utilization_rate)
+
+
+def test_update_index_matches_contract(reserves_manager, skip_live_testing):
+
+    # act / assert
+    for latest_index in [10**18, 10**18 + 123456789]:
+        for rate in RATES:
+            for seconds in SECONDS:
+                assert reserve_math.update_index(
+                    latest_index, rate, seconds
+                ) == reserves_manager._updateIndex(latest_index, rate, seconds)
+
+
+def test_update_compounded_index_matches_contract(reserves_manager, skip_live_testing):
+
+    # act / assert
+    for latest_index in [10**18, 10**18 + 123456789]:
+        for rate in RATES:
+            for seconds in SECONDS:
+                assert reserve_math.update_compounded_index(
+                    latest_index, rate, seconds
+                ) == reserves_manager._updateCompoundedIndex(latest_index, rate, seconds)
+
+
+def test_update_compounded_index_at_max_rate_matches_contract(
+    reserves_manager, skip_live_testing
+):
+
+    # act / assert
+    # the long gaps are compounded in several steps
+    for seconds in COMPOUNDING_GAPS:
+        assert reserve_math.update_compounded_index(
+            10**18, MAX_VARIABLE_BORROW_RATE, seconds
+        ) == reserves_manager._updateCompoundedIndex(
+            10**18, MAX_VARIABLE_BORROW_RATE, seconds
+        )
+
+
+def test_update_compounded_index_saturates_as_contract(
+    reserves_manager, skip_live_testing
+):
+
+    # act / assert
+    # the accrual is capped and the index saturates instead of reverting
+    for latest_index, rate, seconds in SATURATED_ACCRUALS:
+        assert reserve_math.update_compounded_index(
+            latest_index, rate, seconds
+        ) == reserves_manager._updateCompoundedIndex(latest_index, rate, seconds)
+
+
+def test_update_compounded_index_is_capped(skip_live_testing):
+
+    # arrange
+    rate = Web3.toWei(79, "ether")
+    capped_seconds = (
+        reserve_math.MAX_COMPOUNDED_ACCRUAL * reserve_math.SECONDS_PER_YEAR // rate
+    )
+
+    # act
+    index = reserve_math.update_compounded_index(10**18, rate, 31536000)
+    saturated_index = reserve_math.update_compounded_index(
+        2**128 - 10**18, rate, 31536000
+    )
+
+    # assert
+    assert index == reserve_math.update_compounded_index(10**18, rate, capped_seconds)
+    assert saturated_index == reserve_math.MAX_UINT128
+
+
+@pytest.mark.parametrize(
+    "rate",
+    [
+        Web3.toWei(0.01, "ether"),
+        Web3.toWei(0.05, "ether"),
+        Web3.toWei(0.2, "ether"),
+        VARIABLE_RATE_SLOPE_1,
+        MAX_VARIABLE_BORROW_RATE,
+    ],
+)
+def test_compounded_index_accuracy(rate, skip_live_testing):
+
+    # arrange
+    with localcontext() as context:
+        context.prec = 60
+        # the per second rate as truncated by the contract, only the approximation error is measured
+        rate_per_second = Decimal(
+            rate * reserve_math.WAD_RAY_RATIO // reserve_math.SECONDS_PER_YEAR
+        ) / reserve_math.RAY
+
+        for seconds in COMPOUNDING_GAPS:
+            exact_index = (1 + rate_per_second) ** seconds * reserve_math.WAD
+
+            # act
+            compounded_index = reserve_math.update_compounded_index(
+                reserve_math.WAD, rate, seconds
+            )
+            linear_index = reserve_math.update_index(reserve_math.WAD, rate, seconds)
+
+            # assert
+            compounded_error = abs(compounded_index - exact_index) / exact_index
+            linear_error = abs(linear_index - exact_index) / exact_index
+            assert compounded_error < Decimal("1e-4")
+            assert compounded_error <= linear_error
+
+
+def test_update_state_matches_contract(
+    supply,
+    reserves_manager,
+    pool,
+    pool_configuration,
+    dai,
+    account,
+    skip_live_testing,
+):
+
+    # arrange
+    reserve = Reserve(*reserves_manager.getReserve(dai))
+    debt_token = Contract.from_abi(
+        "DebtToken", pool_configuration.underlyingAssetToDebtToken(dai), DebtToken.abi
+    )
+    chain.sleep(10)
+
+    # act
+    # updateState is the last call of the borrow, the token balances it reads are the final ones
+    tx = pool.borrow(dai, BORROW_AMOUNT, {"from": account})
+    expected_reserve = reserve_math.update_state(
+        reserve,
+        STRATEGY,
+        dai.balanceOf(pool_configuration.underlyingAssetToXtoken(dai)),
+        debt_token.scaledTotalSupply(),
+        chain[tx.block_number].timestamp,
+    )
+
+    # assert
+    assert Reserve(*reserves_manager.getReserve(dai)) == expected_reserve
+
+
+def test_indexes_since_last_update_match_contract(
+    borrow, reserves_manager, dai, skip_live_testing
+):
+
+    # arrange
+    chain.sleep(100)
+    chain.mine(1)
+    reserve = Reserve(*reserves_manager.getReserve(dai))
+    timestamp = chain[-1].timestamp
+
+    # act / assert
+    assert reserve_math.get_variable_borrow_index_since_last_update(
+        reserve, timestamp
+    ) == reserves_manager.getVariableBorrowIndexSinceLastUpdate(
+        dai, block_identifier=chain.height
+    )
+    assert reserve_math.get_supply_index_since_last_update(
+        reserve, timestamp
+    ) == reserves_manager.getSupplyIndexSinceLastUpdate(
+        dai, block_identifier=chain.height
+    )
+
+
+def test_update_state_batch_matches_scalar_update_state(skip_live_testing):
+
+    # arrange
+    pytest.importorskip("numpy")
+    reserve = reserve_math.init_reserve(None, 1000)
+    reserve = reserve_math.update_state(reserve, STRATEGY, SUPPLY_AMOUNT, 0, 1010)
+    reserve = reserve_math.update_state(
+        reserve, STRATEGY, SUPPLY_AMOUNT - BORROW_AMOUNT, BORROW_AMOUNT, 1010
+    )
+    reserves = [reserve] * 4
+    available_liquidities = [SUPPLY_AMOUNT, Web3.toWei(5, "ether"), Web3.toWei(1, "ether"), 0]
+    scaled_total_debts = [BORROW_AMOUNT, Web3.toWei(95, "ether"), 0, 5]
+    timestamps = [1010, 1020, 4610, 31537010]
+
+    # act
+    columns = reserve_math.update_state_batch(
+        reserve_math.reserves_to_columns(reserves),
+        STRATEGY,
+        available_liquidities,
+        scaled_total_debts,
+        timestamps,
+    )
+
+    # assert
+    assert reserve_math.columns_to_reserves(columns) == [
+        reserve_math.update_state(
+            reserve, STRATEGY, available_liquidity, scaled_total_debt, timestamp
+        )
+        for reserve, available_liquidity, scaled_total_debt, timestamp in zip(
+            reserves, available_liquidities, scaled_total_debts, timestamps
+        )
+    ]
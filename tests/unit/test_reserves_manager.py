@@ -1,9 +1,19 @@
-from brownie import ReservesManager, reverts, XToken, Contract, DebtToken, chain
+from brownie import (
+    DefaultInterestRateStrategy,
+    ReservesManager,
+    reverts,
+    XToken,
+    Contract,
+    DebtToken,
+    chain,
+)
 from conftest import (
     SUPPLY_AMOUNT,
     BORROW_AMOUNT,
-    INTEREST_RATE_SLOPE,
+    OPTIMAL_UTILIZATION_RATE,
     BASE_VARIABLE_BORROW_RATE,
+    VARIABLE_RATE_SLOPE_1,
+    VARIABLE_RATE_SLOPE_2,
 )
 from web3 import Web3
 import time
@@ -11,21 +21,23 @@ import pytest
 
 
 def test_reserves_manager_constructor(
-    account, supply, pool, pool_configuration, skip_live_testing
+    reserves_manager, pool, pool_configuration, skip_live_testing
 ):
 
-    # act
-    reserves_manager = ReservesManager.deploy(
-        pool_configuration,
-        pool,
-        {"from": account},
-    )
-
     # assert
     assert reserves_manager.poolConfigurationAddress() == pool_configuration
     assert reserves_manager.poolAddress() == pool
 
 
+def test_reserves_manager_unexpected_deployment_address(
+    addresses_provider, account, skip_live_testing
+):
+
+    # act / assert
+    with reverts("unexpected deployment address"):
+        ReservesManager.deploy(addresses_provider, {"from": account})
+
+
 def test_get_reserve(
     dai, reserves_manager, init_reserve, initial_reserve, skip_live_testing
 ):
@@ -51,24 +63,59 @@ def test_update_utilization_rate(reserves_manager, skip_live_testing):
     assert utilization_rate / 10**18 == expexted_utilization_rate
 
 
-def test_update_variable_borrow_rate(reserves_manager, skip_live_testing):
-
-    # arrange
-    utilization_rate = Web3.toWei(0.75, "ether")
-    base_variable_borrow_rate = BASE_VARIABLE_BORROW_RATE
-    interest_rate_slope = INTEREST_RATE_SLOPE
-
-    expected_variable_borrow_rate = 3.75
+@pytest.mark.parametrize(
+    "utilization_rate, expected_variable_borrow_rate",
+    [
+        (0, 0),
+        (0.4, 0.02),
+        (0.75, 0.0375),
+        # the kink : slope1 is fully applied at the optimal utilization rate
+        (0.8, 0.04),
+        # slope1 and half of slope2
+        (0.9, 0.415),
+        # slope1 and slope2
+        (1, 0.79),
+    ],
+)
+def test_calculate_variable_borrow_rate(
+    interest_rate_strategy,
+    utilization_rate,
+    expected_variable_borrow_rate,
+    skip_live_testing,
+):
 
     # act
-    variable_borrow_rate = reserves_manager._updateVariableBorrowRate(
-        utilization_rate,
-        base_variable_borrow_rate,
-        interest_rate_slope,
+    variable_borrow_rate = interest_rate_strategy.calculateVariableBorrowRate(
+        Web3.toWei(utilization_rate, "ether")
     )
 
     # assert
-    assert variable_borrow_rate / 10**18 == expected_variable_borrow_rate
+    assert variable_borrow_rate == Web3.toWei(expected_variable_borrow_rate, "ether")
+
+
+def test_interest_rate_strategy_parameters(interest_rate_strategy, skip_live_testing):
+
+    # act / assert
+    assert interest_rate_strategy.optimalUtilizationRate() == OPTIMAL_UTILIZATION_RATE
+    assert interest_rate_strategy.baseVariableBorrowRate() == BASE_VARIABLE_BORROW_RATE
+    assert interest_rate_strategy.variableRateSlope1() == VARIABLE_RATE_SLOPE_1
+    assert interest_rate_strategy.variableRateSlope2() == VARIABLE_RATE_SLOPE_2
+
+
+def test_interest_rate_strategy_rejects_invalid_optimal_utilization_rate(
+    account, skip_live_testing
+):
+
+    # act / assert
+    for optimal_utilization_rate in [0, Web3.toWei(1, "ether")]:
+        with reverts("invalid optimal utilization rate"):
+            DefaultInterestRateStrategy.deploy(
+                optimal_utilization_rate,
+                BASE_VARIABLE_BORROW_RATE,
+                VARIABLE_RATE_SLOPE_1,
+                VARIABLE_RATE_SLOPE_2,
+                {"from": account},
+            )
 
 
 def test_update_index(
@@ -112,7 +159,7 @@ def test_init_reserve(
 
 
 def test_only_pool_configuration_can_init_reserve(
-    add_token, reserves_manager, dai, account, skip_live_testing
+    add_token, interest_rate_strategy, reserves_manager, dai, account, skip_live_testing
 ):
 
     x_token = add_token[0]
@@ -121,8 +168,7 @@ def test_only_pool_configuration_can_init_reserve(
     with reverts("caller must be pool configuration"):
         reserves_manager.initReserve(
             dai,
-            BASE_VARIABLE_BORROW_RATE,
-            INTEREST_RATE_SLOPE,
+            interest_rate_strategy,
             x_token,
             debt_token,
             {"from": account},
@@ -139,57 +185,88 @@ def test_get_reserve(
 
 
 def test_update_state(
-    add_token, init_reserve, reserves_manager, pool, dai, skip_live_testing
+    add_token,
+    init_reserve,
+    interest_rate_strategy,
+    reserves_manager,
+    pool,
+    dai,
+    skip_live_testing,
 ):
 
     # arrange
-    amount = SUPPLY_AMOUNT
-    operation = 0  # supply
-
-    total_deposited = amount
-    total_borrowed = 0
     utilization_rate = 0
     variable_borrow_rate = 0
-    base_variable_borrow_rate = BASE_VARIABLE_BORROW_RATE
-    interest_rate_slope = INTEREST_RATE_SLOPE
+    interest_rate_strategy_address = interest_rate_strategy.address
     variable_borrow_index = Web3.toWei(1, "ether")
-    last_update_time = chain[-1].timestamp + 10
+    liquidity_rate = 0
+    supply_index = Web3.toWei(1, "ether")
     x_token = add_token[0]
     debt_token = add_token[1]
 
-    expected_reserve = (
-        total_deposited,
-        total_borrowed,
+    # act
+    chain.sleep(10)
+    chain.mine(1)
+    tx = reserves_manager.updateState(dai, {"from": pool})
+
+    # assert
+    assert reserves_manager.getReserve(dai) == (
         utilization_rate,
         variable_borrow_rate,
-        base_variable_borrow_rate,
-        interest_rate_slope,
+        interest_rate_strategy_address,
         variable_borrow_index,
-        last_update_time,
+        liquidity_rate,
+        supply_index,
+        chain[tx.block_number].timestamp,
         x_token,
         debt_token,
     )
 
-    expected_reserve_2 = (
-        total_deposited,
-        total_borrowed,
-        utilization_rate,
-        variable_borrow_rate,
-        base_variable_borrow_rate,
-        interest_rate_slope,
-        variable_borrow_index,
-        last_update_time + 1,
-        x_token,
-        debt_token,
+
+def test_update_state_reads_totals_from_tokens(
+    borrow, reserves_manager, pool_configuration, dai, skip_live_testing
+):
+
+    # arrange
+    x_token = pool_configuration.underlyingAssetToXtoken(dai)
+    debt_token = Contract.from_abi(
+        "DebtToken", pool_configuration.underlyingAssetToDebtToken(dai), DebtToken.abi
     )
 
-    # act
+    # assert
+    assert reserves_manager.getTotalBorrowed(dai) == debt_token.totalSupply()
+    assert reserves_manager.getTotalDeposited(dai) == dai.balanceOf(
+        x_token
+    ) + debt_token.totalSupply()
+    assert reserves_manager.getUtilizationRate(dai) == Web3.toWei(0.75, "ether")
+
+
+def test_update_state_gas_with_packed_reserve(
+    add_token,
+    init_reserve,
+    reserves_manager,
+    pool,
+    dai,
+    record_gas,
+    skip_live_testing,
+):
+
+    # arrange
+    # the reserve is also kept in the former unpacked layout, both are updated once before measuring
+    reserves_manager._initUnpackedReserve(dai)
+    reserves_manager.updateState(dai, {"from": pool})
+    reserves_manager._updateStateUnpacked(dai, {"from": pool})
     chain.sleep(10)
     chain.mine(1)
-    reserves_manager.updateState(dai, amount, operation, {"from": pool})
+
+    # act
+    packed_tx = reserves_manager.updateState(dai, {"from": pool})
+    unpacked_tx = reserves_manager._updateStateUnpacked(dai, {"from": pool})
 
     # assert
-    assert reserves_manager.getReserve(dai) == expected_reserve or expected_reserve_2
+    record_gas("updateState", "packed", 1, packed_tx)
+    record_gas("updateState", "unpacked", 1, unpacked_tx)
+    assert packed_tx.gas_used < unpacked_tx.gas_used
 
 
 def test_get_variable_borrow_index_since_last_update(
@@ -201,7 +278,7 @@ def test_get_variable_borrow_index_since_last_update(
     chain.mine(1)
 
     expected_variable_borrow_index = 1 * (
-        1 + (3.75 / 31536000) * 13
+        1 + (0.0375 / 31536000) * 13
     )  # 13 seconds (chain.sleep(10) + 3 of the test) .
 
     print(reserves_manager.getVariableBorrowIndexSinceLastUpdate(dai) / (10**18))
@@ -221,7 +298,7 @@ def test_get_supply_index_since_last_update(
     chain.mine(1)
 
     expected_supply_index = 1 * (
-        1 + ((3.75 * 0.75) / 31536000) * 13
+        1 + ((0.0375 * 0.75) / 31536000) * 13
     )  # 18 seconds (chain.sleep(15) + 3 of the test) .
 
     # act / assert
@@ -230,6 +307,46 @@ def test_get_supply_index_since_last_update(
     )
 
 
+def test_update_state_within_the_same_block_keeps_the_indexes(
+    borrow, reserves_manager, pool, dai, skip_live_testing
+):
+
+    # arrange
+    chain.sleep(10)
+    chain.mine(1)
+
+    # act
+    tx = reserves_manager._updateStateTwice(dai, {"from": pool})
+    first_update, second_update = tx.events["ReserveDataUpdated"]
+
+    # assert
+    # the first update accrues the interests of the 10 seconds, the second one nothing
+    assert first_update["variableBorrowIndex"] > Web3.toWei(1, "ether")
+    assert second_update["variableBorrowIndex"] == first_update["variableBorrowIndex"]
+    assert second_update["supplyIndex"] == first_update["supplyIndex"]
+    assert second_update["variableBorrowRate"] == first_update["variableBorrowRate"]
+    assert reserves_manager.getVariableBorrowIndex(dai) == first_update[
+        "variableBorrowIndex"
+    ]
+    assert reserves_manager.getSupplyIndex(dai) == first_update["supplyIndex"]
+
+
+def test_indexes_since_last_update_within_the_same_block(
+    borrow, reserves_manager, dai, skip_live_testing
+):
+
+    # arrange
+    update_block = chain.height
+
+    # act / assert
+    assert reserves_manager.getVariableBorrowIndexSinceLastUpdate(
+        dai, block_identifier=update_block
+    ) == reserves_manager.getVariableBorrowIndex(dai, block_identifier=update_block)
+    assert reserves_manager.getSupplyIndexSinceLastUpdate(
+        dai, block_identifier=update_block
+    ) == reserves_manager.getSupplyIndex(dai, block_identifier=update_block)
+
+
 def test_get_total_deposited(init_reserve, reserves_manager, dai, skip_live_testing):
 
     # act / assertt
@@ -256,20 +373,12 @@ def test_get_variable_borrow_rate(
     assert reserves_manager.getVariableBorrowRate(dai) == 0
 
 
-def test_get_base_variable_borrow_rate(
-    init_reserve, reserves_manager, dai, skip_live_testing
-):
-
-    # act / assert
-    assert reserves_manager.getBaseVariableBorrowRate(dai) == 0
-
-
-def test_get_interest_rate_slope(
-    init_reserve, reserves_manager, dai, skip_live_testing
+def test_get_interest_rate_strategy(
+    init_reserve, interest_rate_strategy, reserves_manager, dai, skip_live_testing
 ):
 
     # act / assert
-    assert reserves_manager.getInterestRateSlope(dai) == Web3.toWei(5, "ether")
+    assert reserves_manager.getInterestRateStrategy(dai) == interest_rate_strategy
 
 
 def test_get_variable_borrow_index(
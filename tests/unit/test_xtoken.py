@@ -1,32 +1,43 @@
-from brownie import XToken, Contract, reverts, chain
+from brownie import XToken, XTokenHolderMock, Contract, reverts, chain
+from scripts.utils import get_account
 from web3 import Web3
-from conftest import SUPPLY_AMOUNT, BORROW_AMOUNT
+from conftest import SUPPLY_AMOUNT
+from scripts.reserve_math import wmul
 
 
-def test_xtoken_constructor(account, dai, pool, reserves_manager, skip_live_testing):
-
-    # arrange
-    name = "TEST"
-    symbol = "TEST"
-    underlying_asset = dai
-    pool_address = pool
+def test_xtoken_constructor(account, pool, reserves_manager, skip_live_testing):
 
     # act
-    x_token = XToken.deploy(
-        name,
-        symbol,
-        underlying_asset,
-        pool_address,
-        reserves_manager,
-        {"from": account},
-    )
+    x_token = XToken.deploy(pool, reserves_manager, {"from": account})
 
     # assert
-    assert x_token.name() == name
-    assert x_token.symbol() == symbol
-    assert x_token.poolAddress() == pool_address
-    assert x_token.underlyingAsset() == underlying_asset
+    assert x_token.poolAddress() == pool
     assert x_token.reservesManager() == reserves_manager
+    with reverts("Initializable: contract is already initialized"):
+        x_token.initialize("TEST", "TEST", pool, {"from": account})
+
+
+def test_xtoken_initialize(add_token, dai, pool, reserves_manager, skip_live_testing):
+
+    # arrange
+    x_token = Contract.from_abi("XToken", add_token[0], XToken.abi)
+
+    # assert
+    assert x_token.name() == "xDAI"
+    assert x_token.symbol() == "xDAI"
+    assert x_token.poolAddress() == pool
+    assert x_token.underlyingAsset() == dai
+    assert x_token.reservesManager() == reserves_manager
+
+
+def test_xtoken_initialize_only_once(add_token, dai, account, skip_live_testing):
+
+    # arrange
+    x_token = Contract.from_abi("XToken", add_token[0], XToken.abi)
+
+    # act / assert
+    with reverts("Initializable: contract is already initialized"):
+        x_token.initialize("TEST", "TEST", dai, {"from": account})
 
 
 def test_mint_xtoken(
@@ -76,6 +87,29 @@ def test_burn_xtoken(
     assert x_token_contract.balanceOf(account) == 0
 
 
+def test_transfer_whole_balance_after_interest_accrued(
+    borrow, account, pool, pool_configuration, dai, skip_live_testing
+):
+
+    # arrange
+    x_token_address = pool_configuration.underlyingAssetToXtoken(dai)
+    x_token_contract = Contract.from_abi("XToken", x_token_address, XToken.abi)
+    holder = XTokenHolderMock.deploy({"from": account})
+    recipient = get_account(index=1)
+    x_token_contract.mint(holder, Web3.toWei(33, "ether"), {"from": pool})
+    scaled_amount = x_token_contract.scaledBalanceOf(holder)
+    chain.sleep(1000)
+    chain.mine(1)
+
+    # act
+    holder.transferWholeBalance(x_token_contract, recipient, {"from": account})
+
+    # assert
+    # the rounding excess of the scaled amount is clamped, no dust is left behind
+    assert x_token_contract.scaledBalanceOf(holder) == 0
+    assert x_token_contract.scaledBalanceOf(recipient) == scaled_amount
+
+
 def test_only_pool_can_burn_xtoken(
     add_token, account, pool, pool_configuration, dai, skip_live_testing
 ):
@@ -145,11 +179,10 @@ def test_xtoken_balance_of(
 
     chain.sleep(10)
     chain.mine(1)
-    expected_xtoken_balance = Web3.fromWei(
-        SUPPLY_AMOUNT - BORROW_AMOUNT, "ether"
-    ) * reserves_manager.getSupplyIndexSinceLastUpdate(dai)
-
-    print(reserves_manager.getSupplyIndexSinceLastUpdate(dai) / (10**18))
+    # supplied at an index of 1, the borrow leaves the xTokens untouched : the whole supply accrues
+    expected_xtoken_balance = wmul(
+        SUPPLY_AMOUNT, reserves_manager.getSupplyIndexSinceLastUpdate(dai)
+    )
 
     # assert
     assert x_token_contract.balanceOf(account) == expected_xtoken_balance